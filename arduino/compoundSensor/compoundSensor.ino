@@ -13,7 +13,7 @@ LICENSE?
 Byte 0:  Firmware version major
 Byte 1:  Firmware version minor
 Byte 2:  Status register
-Byte 3:  Rain sensor count MSB (Rain data is a 32 bit counter)
+Byte 3:  Rain sensor count MSB (Rain data is a 32 bit counter that runs from power up, and wraps around)
 ...
 Byte 6:  Rain sensor count LSB
 Byte 7:  Wind speed avg MSB
@@ -21,6 +21,8 @@ Byte 8:  Wind speed avg LSB
 Byte 9:  Wind speed max MSB
 Byte 10: Wind speed max LSB
 Byte 11: Ambient light brightness
+Byte 12: Wind speed now MSB (average of the last subsample, about one second)
+Byte 13: Wind speed now LSB
 */
 
 
@@ -65,9 +67,11 @@ Byte 11: Ambient light brightness
 #define i2c_windMaxMSB     9
 #define i2c_windMaxLSB     10
 #define i2c_lightAvg       11
+#define i2c_windNowMSB     12
+#define i2c_windNowLSB     13
 
 // I2C buffer config
-#define i2cBuffSize        12 // Number of bytes we'll store.
+#define i2cBuffSize        14 // Number of bytes we'll store.
 
 // I2C status register flags
 #define i2cStatus_initpoll 0x01 // We are initially polling
@@ -78,7 +82,7 @@ Byte 11: Ambient light brightness
 
 // Version numbers
 #define versionMajor       0x00
-#define versionMinor       0x04
+#define versionMinor       0x06
 
 // How long should we sample?
 #define sampleTime          60  // 1 minute (60 seconds)
@@ -281,6 +285,9 @@ void loop() {
   // Use this to keep track of the fastest wind speed we read.
   int windMax = 0;
   
+  // Use this to keep track of the last subsample's wind speed.
+  unsigned int windNow = 0;
+  
   // Use this to keep track of the ambient light value we read.
   int lightVal = 0;
   
@@ -291,8 +298,9 @@ void loop() {
   // calibrated laser brightness and the last reading from the CdS cell.
   int offsetVal = 0;
   
-  // Keep track of hits per minute (roughly)
-  int hits = 0;
+  // Keep track of hits since we started. This is never reset so the collector can
+  // compute deltas without losing or double counting hits between polls.
+  unsigned long hits = 0;
 
   // Accumulate values between subsamples.
   unsigned long windAvgSubSample = 0;
@@ -343,6 +351,13 @@ void loop() {
         // Average wind values into subsample
         windAvg += round(windAvgSubSample / subSampleSize);
         
+        #ifdef hasWind
+          // Publish the subsample average right away so the collector can look for gusts.
+          windNow = round(windAvgSubSample / subSampleSize);
+          i2cBuff[i2c_windNowMSB] = (windNow & 0xff00) >> 8;
+          i2cBuff[i2c_windNowLSB] = windNow & 0x00ff;
+        #endif
+        
         // Average light values into subsample
         lightAvg += round(lightAvgSubSample / subSampleSize);
         
@@ -467,7 +482,7 @@ void loop() {
     setI2CStat(i2cStatus_data);
     
     // Debug print
-    Serial.print("Rain CPM:  ");
+    Serial.print("Rain count: ");
     Serial.println(rainSample);
     Serial.print("Wind Avg:  ");
     Serial.println(windSample);
@@ -479,7 +494,6 @@ void loop() {
     Serial.println();
     
     // Reset our sample-taking vars.
-    hits = 0;
     windAvg = 0;
     windMax = 0;
     lightAvg = 0;
@@ -6,6 +6,14 @@ from subprocess import call
 
 apiURL = 'http://weatherstn'
 
+# Spoken names for units, and spoken names to use for fields no matter what their unit is.
+spokenUnits = {"C": "celsius", "F": "fahrenheit", "K": "kelvin", "kph": "kilometers per hour", "mph": "miles per hour", "m/s": "meters per second", "kt": "knots", \
+    "kPa": "kilopascals", "hPa": "hectopascals", "inHg": "inches of mercury", "mmHg": "millimeters of mercury", "mm/h": "millimeters per hour", "in/h": "inches per hour"}
+spokenFields = {"humid": "percent"}
+
+# Spoken names for compass points.
+spokenPoints = {"N": "north", "S": "south", "E": "east", "W": "west", "b": "by"}
+
 def wordify(sourceDict):
     """
     wordify(sourceDict)
@@ -17,34 +25,18 @@ def wordify(sourceDict):
     for point in sourceDict:
         # Don't try to handle the timestamp here.
         if point != 'dts':
-            # Handle values in C
-            if sourceDict[point]['unit'] == "C":
-                sourceDict[point]['unit'] = "celsius"
-                sourceDict[point]['value'] = str(round(sourceDict[point]['value'], 0)).replace('.0', '')
-           
-            # Handle values in F
-            if sourceDict[point]['unit'] == "F":
-                sourceDict[point]['unit'] = "fahrenheit"
-                sourceDict[point]['value'] = str(round(sourceDict[point]['value'], 0)).replace('.0', '')
-               
-            # Handle values in kph
-            if sourceDict[point]['unit'] == "kph":
-                sourceDict[point]['unit'] = "kilometers per hour"
-                sourceDict[point]['value'] = str(round(sourceDict[point]['value'], 0)).replace('.0', '')
+            # Look up how to say the unit.
+            spoken = spokenFields.get(point, spokenUnits.get(sourceDict[point]['unit']))
            
-            # Handle values in mph
-            if sourceDict[point]['unit'] == "mph":
-                sourceDict[point]['unit'] = "miles per hour"
-                sourceDict[point]['value'] = str(round(sourceDict[point]['value'], 0)).replace('.0', '')
+            if spoken is not None:
+                sourceDict[point]['unit'] = spoken
                
-            # Handle humidity
-            if point == "humid":
-                sourceDict[point]['unit'] = "percent"
-                sourceDict[point]['value'] = str(round(sourceDict[point]['value'], 0)).replace('.0', '')
+                if sourceDict[point]['value'] is not None:
+                    sourceDict[point]['value'] = str(round(sourceDict[point]['value'], 0)).replace('.0', '')
                
             # Handle wind direction
-            if point == "windDirCrd":
-                sourceDict[point]['value'] = sourceDict[point]['value'].replace('N', 'north ').replace('S', 'south ').replace('E', 'east ').replace('W', 'west ')
+            if (point == "windDirCrd") and (sourceDict[point]['value'] is not None):
+                sourceDict[point]['value'] = ' '.join([spokenPoints.get(letter, letter) for letter in sourceDict[point]['value']])
    
     return sourceDict
 
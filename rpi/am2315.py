@@ -5,8 +5,7 @@
 # Imports #
 ###########
 
-import time
-import quick2wire.i2c as qI2c
+from owsI2c import owsI2c
 
 ################
 # am2315 class #
@@ -24,8 +23,8 @@ class am2315:
     
     def __init__(self, am2315Addr = 0x5c):
         # Set up I2C libraries
-        self.__i2c = qI2c
-        self.__i2cMaster = qI2c.I2CMaster()
+        self.__i2cMaster = owsI2c("am2315")
+        self.__i2c = self.__i2cMaster
         
         # Set global address var
         self.__addr = am2315Addr
@@ -102,7 +101,7 @@ class am2315:
                 self.__i2cMaster.transaction(self.__i2c.writing_bytes(self.__addr, self.cmdReadReg, *thCmd))
                 
                 # Wait for the sensor to supply data to read.
-                time.sleep(0.1)
+                self.__i2cMaster.sleep(0.1)
                 
                 # Now read 8 bytes from the AM2315.
                 rawTH = self.__i2cMaster.transaction(self.__i2c.reading(self.__addr, 8))
@@ -0,0 +1,313 @@
+# OpenWeatherStn central service by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import io
+import json
+import sys
+import datetime
+import zlib
+from owsCentral import owsCentral
+from owsEncoder import owsEncoder
+from owsMetrics import registry
+from owsTrace import tracer
+from urllib.parse import parse_qs
+
+# Stations can send zstd compressed batches if we have zstd.
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+########################
+# centralService class #
+########################
+
+class centralService:
+    """
+    HTTP service that collects records from many stations and answers queries across them. Stations POST batches of records to /ingest, and clients GET /latest, /stations, and /history.
+    """
+    
+    def __init__(self, dbFile = "db/central.db"):
+        self.central = owsCentral(dbFile) # Central data layer
+        
+        # Response encoder for JSON, MessagePack, and CBOR.
+        self.encoder = owsEncoder()
+        
+        # Largest ingest body we read, and the most history we return in one request.
+        self.maxIngestBytes = 16 * 1024 * 1024
+        self.maxHistoryHours = 24.0 * 31
+        
+        registry.describe("ows_http_request_seconds", "histogram", "HTTP request time in seconds by route.")
+    
+    def __getRecordDict(self, record):
+        """
+        __getRecordDict(record)
+        
+        Turn a record tuple from the central data layer into a dict of column name to value. Returns a dict.
+        """
+        
+        return dict([(self.central.columns[i], record[i]) for i in range(len(record))])
+    
+    def __decompress(self, body, encoding):
+        """
+        __decompress(body, encoding)
+        
+        Undo a batch's Content-Encoding ("gzip", "zstd", or "identity"), refusing to make more than maxIngestBytes of it. Raises ValueError if the batch is too big or isn't what it says it is.
+        Raises KeyError for encodings we don't support. Returns bytes.
+        """
+        
+        if encoding in ("", "identity"):
+            return body
+        
+        if encoding == "gzip":
+            try:
+                decoder = zlib.decompressobj(zlib.MAX_WBITS | 16)
+                retVal = decoder.decompress(body, self.maxIngestBytes)
+            
+            except zlib.error as e:
+                raise ValueError(str(e))
+            
+            if len(decoder.unconsumed_tail) > 0:
+                raise ValueError("Batches can be at most " + str(self.maxIngestBytes) + " bytes uncompressed.")
+            
+            return retVal
+        
+        if (encoding == "zstd") and (zstandard is not None):
+            try:
+                retVal = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)).read(self.maxIngestBytes + 1)
+            
+            except zstandard.ZstdError as e:
+                raise ValueError(str(e))
+            
+            if len(retVal) > self.maxIngestBytes:
+                raise ValueError("Batches can be at most " + str(self.maxIngestBytes) + " bytes uncompressed.")
+            
+            return retVal
+        
+        raise KeyError(encoding)
+    
+    def __ingest(self, env):
+        """
+        __ingest(env)
+        
+        Store a batch of records POSTed by a station like {"station": "roof", "columns": ["dts", "temp", ...], "records": [[1700000000000000, 12.5, ...], ...]}.
+        Timestamps are epoch microseconds. Batches can be gzip or zstd compressed with a Content-Encoding header. Returns a tuple of the HTTP status and a dict acknowledging the batch with the time of the station's latest stored record.
+        """
+        
+        try:
+            postSz = int(env.get('CONTENT_LENGTH', 0))
+        
+        except (ValueError):
+            postSz = 0
+        
+        if postSz > self.maxIngestBytes:
+            return ("413 Payload Too Large", {"error": "Batches can be at most " + str(self.maxIngestBytes) + " bytes."})
+        
+        try:
+            body = self.__decompress(env['wsgi.input'].read(postSz), env.get('HTTP_CONTENT_ENCODING', '').lower())
+        
+        except KeyError:
+            return ("415 Unsupported Media Type", {"error": "Batches can be gzip" + ("" if zstandard is None else " or zstd") + " compressed."})
+        
+        except ValueError as e:
+            return ("400 Bad Request", {"error": str(e)})
+        
+        try:
+            batch = json.loads(body.decode("utf-8"))
+        
+        except ValueError:
+            return ("400 Bad Request", {"error": "The batch isn't JSON."})
+        
+        if (not isinstance(batch, dict)) or (not isinstance(batch.get('records'), list)) or (not isinstance(batch.get('columns'), list)):
+            return ("400 Bad Request", {"error": "A batch needs a station, columns, and records."})
+        
+        station = batch.get('station')
+        
+        try:
+            added, duplicates = self.central.addRecords(station, batch['records'], batch['columns'])
+        
+        except (ValueError, TypeError) as e:
+            return ("400 Bad Request", {"error": str(e)})
+        
+        return ("200 OK", {"station": station, "added": added, "duplicates": duplicates, "lastDts": self.central.getLastDts(station)})
+    
+    def __getLatest(self, query):
+        """
+        __getLatest(query)
+        
+        Get the latest record from each station, or from the stations in a query string like ?stations=roof,garden. Returns a dict.
+        """
+        
+        stations = None
+        
+        if 'stations' in query:
+            stations = [station for station in ','.join(query['stations']).split(',') if len(station) > 0]
+        
+        latest = self.central.getLatest(stations)
+        
+        return {"stations": dict([(station, self.__getRecordDict(record)) for station, record in latest.items()])}
+    
+    def __getStations(self):
+        """
+        __getStations()
+        
+        List the stations we've heard from. Returns a dict.
+        """
+        
+        names = ["station", "firstIngest", "lastIngest", "records", "dts"]
+        
+        return {"stations": [dict(zip(names, row)) for row in self.central.getStations()]}
+    
+    def __getHistory(self, query):
+        """
+        __getHistory(query)
+        
+        Get columns of a station's records for a query string like ?station=roof&hours=6&columns=temp,baro. Returns a tuple of the HTTP status and a dict.
+        """
+        
+        station = query.get('station', [None])[0]
+        
+        if station is None:
+            return ("400 Bad Request", {"error": "History needs a station."})
+        
+        try:
+            hours = min(max(float(query.get('hours', ['6'])[0]), 0.0), self.maxHistoryHours)
+        
+        except ValueError:
+            hours = 6.0
+        
+        columns = None
+        
+        if 'columns' in query:
+            columns = [colName for colName in ','.join(query['columns']).split(',') if len(colName) > 0]
+            
+            if "dts" not in columns:
+                columns.insert(0, "dts")
+        
+        endEpoch = self.central.dtsToEpoch(datetime.datetime.utcnow())
+        startEpoch = endEpoch - int(hours * 3600 * 1000000)
+        
+        try:
+            data = self.central.getRangeColumns(station, startEpoch, endEpoch, columns)
+        
+        except ValueError as e:
+            return ("400 Bad Request", {"error": str(e)})
+        
+        retVal = {"station": station, "start": startEpoch, "end": endEpoch, "columns": {}}
+        
+        # Make columns plain lists with null for missing values.
+        for name in data:
+            column = data[name].tolist() if hasattr(data[name], "tolist") else list(data[name])
+            retVal['columns'][name] = [None if v != v else v for v in column]
+        
+        return ("200 OK", retVal)
+    
+    def worker(self, env, startResponse):
+        """
+        worker(env, startResponse)
+        
+        Do all the things, and time and trace how long they took. Accepts two arguments: the environment data, and start_server from WSGI.
+        """
+        
+        # Label the request time with the kind of request.
+        route = env.get('PATH_INFO', '').lower().strip('/').split('/')[0]
+        
+        if route not in ("ingest", "latest", "stations", "history", "metrics"):
+            route = "other"
+        
+        try:
+            with registry.timer("ows_http_request_seconds", {"route": route}), tracer.span(route, "http", {"path": env.get('PATH_INFO', '')}):
+                return self.__route(route, env, startResponse)
+        
+        finally:
+            # Write out the trace if we're tracing.
+            tracer.flush()
+    
+    def __route(self, route, env, startResponse):
+        """
+        __route(route, env, startResponse)
+        
+        Answer a request. Accepts three arguments: the route, the environment data, and start_server from WSGI.
+        """
+        
+        if route == "metrics":
+            startResponse("200 OK", [('Content-Type', "text/plain; version=0.0.4; charset=utf-8")])
+            
+            return [bytes(registry.render([registry.getSnapshot("centralService")]), 'utf-8')]
+        
+        query = parse_qs(env.get('QUERY_STRING', ''))
+        status = "200 OK"
+        
+        # Pick the response format with a query string like ?format=msgpack.
+        fmt = query.get('format', ["json"])[0].lower()
+        
+        if fmt not in self.encoder.mimeTypes: fmt = "json"
+        
+        if route == "ingest":
+            if env.get('REQUEST_METHOD') == 'POST':
+                status, result = self.__ingest(env)
+            else:
+                status, result = ("405 Method Not Allowed", {"error": "Stations POST records to /ingest."})
+        
+        elif route == "latest":
+            result = self.__getLatest(query)
+        
+        elif route == "stations":
+            result = self.__getStations()
+        
+        elif route == "history":
+            status, result = self.__getHistory(query)
+        
+        else:
+            status, result = ("404 Not Found", {"error": "Try /latest, /stations, /history, or /ingest."})
+        
+        startResponse(status, [('Content-Type', self.encoder.mimeTypes[fmt])])
+        
+        return [self.encoder.encodeValue(result, fmt)]
+
+
+#############
+# Functions #
+#############
+
+def main(dbFile = "db/central.db", port = 8080):
+    """
+    main([dbFile = "db/central.db"], [port = 8080])
+    
+    Collect and serve records from stations until we're killed.
+    """
+    
+    # The HTTP server is only needed when we're serving, so importing centralService for testing doesn't pay for it.
+    from wsgiref.simple_server import make_server
+    
+    hardWorker = centralService(dbFile)
+    
+    # Set up HTTP server
+    httpSrv = make_server('', port, hardWorker.worker)
+    
+    registry.describe("ows_startup_seconds", "gauge", "Seconds from the process starting to being ready for requests.")
+    registry.set("ows_startup_seconds", registry.getUptime())
+    
+    print("centralService HTTP server listening on port " + str(port) + ", started in " + str(round(registry.getUptime(), 2)) + " seconds.")
+    httpSrv.serve_forever()
+
+#######################
+# Main execution body #
+#######################
+
+# Only run when started as a program, so the classes can be imported for testing and benchmarks.
+# Usage: centralService.py [dbFile] [port]
+if __name__ == "__main__":
+    dbFile = "db/central.db"
+    port = 8080
+    
+    if len(sys.argv) > 1:
+        dbFile = sys.argv[1]
+    
+    if len(sys.argv) > 2:
+        port = int(sys.argv[2])
+    
+    main(dbFile, port)
@@ -10,8 +10,7 @@
 # Imports #
 ###########
 
-import quick2wire.i2c as qI2c
-import time
+from owsI2c import owsI2c
 
 
 #################
@@ -25,8 +24,8 @@ class compoundSensor():
 
 	def __init__(self, windOffset, cmpdAddr = 0x64):
 		# I2C set up class-wide I2C bus
-		self.__i2c = qI2c
-		self.__i2cMaster = qI2c.I2CMaster()
+		self.__i2cMaster = owsI2c("compoundSensor")
+		self.__i2c = self.__i2cMaster
 		
 		# Sensor's I2C address
 		self.__cmpdAddr = cmpdAddr
@@ -37,10 +36,13 @@ class compoundSensor():
 		# Hold last recieved sample data.
 		self.__lastData = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
 		
+		# Hold the last wind speed now sample.
+		self.__windNowData = [0, 0]
+		
 		### Register settings and definitions ###
 		
-		# Actual number of one-byte registers
-		self.i2cRegSize    =      12
+		# Actual number of one-byte registers. Firmware 0.6 added the wind now registers.
+		self.i2cRegSize    =      14
 		
 		# Register name -> location
 		self.i2c_fwMajor =        0
@@ -55,6 +57,8 @@ class compoundSensor():
 		self.i2c_windMaxMSB =     9
 		self.i2c_windMaxLSB =     10
 		self.i2c_lightAvg   =     11
+		self.i2c_windNowMSB =     12
+		self.i2c_windNowLSB =     13
 		
 		# Status register dictionary
 		self.i2cStatus_initpoll = 0x01
@@ -168,6 +172,16 @@ class compoundSensor():
 		# Read all registers, and set global lastData array.
 		self.__lastData = self.__readAll()	
 
+	def pollWindNow(self):
+		"""
+		pollWindNow()
+		
+		Poll just the wind speed now registers, which are updated about once a second. This is much cheaper than pollAll(), and requires compound sensor firmware 0.6 or newer.
+		"""
+		
+		# Read the wind now registers.
+		self.__windNowData = self.__readRange(self.i2c_windNowMSB, self.i2c_windNowLSB)
+	
 	def checkStatusReg(self, status):
 		"""
 		checkStatusReg(status)
@@ -210,7 +224,7 @@ class compoundSensor():
 		
 		# Make sure we have stable output.
 		if ~self.checkStatusReg(self.i2cStatus_data):
-			time.sleep(.1)
+			self.__i2cMaster.sleep(.1)
 			self.pollAll()
 		
 		# Put together a 32-bit unsigned integer representing the rain counter.
@@ -228,7 +242,7 @@ class compoundSensor():
 		
 		# Make sure we have stable output.
 		if ~self.checkStatusReg(self.i2cStatus_data):
-			time.sleep(.1)
+			self.__i2cMaster.sleep(.1)
 			self.pollAll()
 		
 		# Grab the average for the wind data and convert it to an int
@@ -249,7 +263,7 @@ class compoundSensor():
 		
 		# Make sure we have stable output.
 		if ~self.checkStatusReg(self.i2cStatus_data):
-			time.sleep(.1)
+			self.__i2cMaster.sleep(.1)
 			self.pollAll()
 		
 		# Grab the average for the wind data and convert it to an int
@@ -270,7 +284,7 @@ class compoundSensor():
 		
 		# Make sure we have stable output.
 		if ~self.checkStatusReg(self.i2cStatus_data):
-			time.sleep(.1)
+			self.__i2cMaster.sleep(.1)
 			self.pollAll()
 		
 		# Grab the average for the wind data and convert it to an int
@@ -287,7 +301,7 @@ class compoundSensor():
 		
 		# Make sure we have stable output.
 		if ~self.checkStatusReg(self.i2cStatus_data):
-			time.sleep(.1)
+			self.__i2cMaster.sleep(.1)
 			self.pollAll()
 		
 		# Grab the average for the wind data and convert it to an int
@@ -295,6 +309,34 @@ class compoundSensor():
 		
 		return int(windMaxRaw)
 	
+	def getWindNowRaw(self):
+		"""
+		getWindNowRaw()
+		
+		Get the wind speed now data from the last pollWindNow(). Returns the integer value of the register's MSB and LSB added together, or None if the registers couldn't be read.
+		"""
+		
+		# Make sure we got both bytes.
+		if len(self.__windNowData) < 2:
+			return None
+		
+		return int((self.__windNowData[0] << 8) | self.__windNowData[1])
+	
+	def getWindNow(self):
+		"""
+		getWindNow()
+		
+		Get the wind speed now from the last pollWindNow(). Returns wind speed in kph, rounded to two decimal places, or None if the registers couldn't be read.
+		"""
+		
+		windNowRaw = self.getWindNowRaw()
+		
+		if windNowRaw is None:
+			return None
+		
+		# Convert the wind reading to a value in KPH
+		return round(self.__windScale2Speed(windNowRaw), 2)
+	
 	def getLightAvg(self):
 		"""
 		getLightAvg()
@@ -304,7 +346,7 @@ class compoundSensor():
 		
 		# Make sure we have stable output.
 		if ~self.checkStatusReg(self.i2cStatus_data):
-			time.sleep(.1)
+			self.__i2cMaster.sleep(.1)
 			self.pollAll()
 		
 		# Grab average light data
@@ -4,7 +4,7 @@
 # Imports #
 ###########
 
-import quick2wire.i2c as qI2c
+from owsI2c import owsI2c
 
 ##################
 # hmc5883L class #
@@ -22,8 +22,8 @@ class hmc5883l:
 
     def __init__(self, hmc5883lAddr = 0x1e):
         # I2C set up class-wide I2C bus
-        self.__i2c = qI2c
-        self.__i2cMaster = qI2c.I2CMaster()
+        self.__i2cMaster = owsI2c("hmc5883l")
+        self.__i2c = self.__i2cMaster
         
         # Set global address var
         self.__addr = hmc5883lAddr
@@ -345,3 +345,12 @@ class hmc5883l:
         else:
             raise ValueError("HMC5883L register must be writable to set it.")
     
+    
+    def sleep(self, seconds):
+        """
+        sleep(seconds)
+        
+        Wait for the magnetometer, for example until its next sample is ready.
+        """
+        
+        self.__i2cMaster.sleep(seconds)
@@ -0,0 +1,34 @@
+# OpenWeatherStn wind vein calibration utility by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import sys
+from hmc5883l import hmc5883l
+from owsMagCal import owsMagCal
+
+#######################
+# Main execution body #
+#######################
+
+# Where we save the calibration. The scanner loads it from here.
+calFile = "db/magCal.json"
+
+# Allow a different calibration file to be specified.
+if len(sys.argv) > 1:
+    calFile = sys.argv[1]
+
+magCal = owsMagCal()
+
+print("Calibrating wind vein. Slowly turn the vein through at least two full circles...")
+samples = magCal.collect(hmc5883l())
+
+print("Got " + str(len(samples)) + " samples, fitting calibration.")
+magCal.fit(samples)
+
+print("Hard iron offset (X, Y): " + str([round(v, 1) for v in magCal.center]))
+print("Correction matrix:       " + str([[round(v, 4) for v in row] for row in magCal.matrix]))
+
+magCal.save(calFile)
+print("Calibration saved to " + calFile + ".")
@@ -5,7 +5,7 @@
 # Imports #
 ###########
 
-import quick2wire.i2c as qI2c
+from owsI2c import owsI2c
 from pprint import pprint
 
 ##################
@@ -24,8 +24,8 @@ class mcp9808:
 
     def __init__(self, mcp9808Addr = 0x18):
         # I2C set up class-wide I2C bus
-        self.__i2c = qI2c
-        self.__i2cMaster = qI2c.I2CMaster()
+        self.__i2cMaster = owsI2c("mcp9808")
+        self.__i2c = self.__i2cMaster
         
         # Set global address var
         self.__addr = mcp9808Addr
@@ -136,11 +136,11 @@ class mcp9808:
         """
         __writeReg(register, data)
         
-        Write data to a given register to the MCP9808. Data can be 1 to n bytes.
+        Write data to a given register to the MCP9808. Data is a list of 1 to n bytes, MSB first.
         """
         
         try:
-            self.__i2cMaster.transaction(self.__i2c.writing_bytes(self.__addr, register, data))
+            self.__i2cMaster.transaction(self.__i2c.writing_bytes(self.__addr, register, *data))
         except IOError:
             raise IOError("mcp9808 IO Error: Failed to write to MCP9808 sensor on I2C bus.")
     
@@ -168,9 +168,20 @@ class mcp9808:
         __makeSigned(signed, [bitCt = 11])
         
         Creates a signed integer. Requires one argument which is a signed temperature, and has an optional value which is the big length. Returns an unsigned inteter with lengh specified in bitCt.
+        """
         
-        *** NOT YET IMPLEMENTED ***
+        # Mask off everything above our bit count, which leaves us with the two's compliment representation.
+        return int(signed) & ((1 << bitCt) - 1)
+    
+    def __tempToLimit(self, temp):
         """
+        __tempToLimit(temp)
+        
+        Converts a temperature in degrees C to the format used by the upper, lower, and critical temperature registers. Returns an integer.
+        """
+        
+        # The limit registers have a 0.25 degree C LSB, an 11 bit two's compliment value, and start at bit 2.
+        return self.__makeSigned(round(temp / 0.25), 11) << 2
     
     def getReg(self, register):
         """
@@ -197,7 +208,8 @@ class mcp9808:
         
         # Make sure we're trying to write to a R/W register
         if (register >= self.regConfig) and (register <= self.regTCrit):
-            self.__writeReg(register, value)
+            # All writable registers are 16 bits wide, so send the MSB then the LSB.
+            self.__writeReg(register, [(value >> 8) & 0xff, value & 0xff])
         else:
             raise ValueError("MCP9808 register must be writable to set it.")
     
@@ -215,19 +227,26 @@ class mcp9808:
         """
         setTempWindow(upperTemp, lowerTemp)
         
-        Set the temperature window for the sensor. If the temperature falls outside the values between upper and lower arguments the window alert bit is set.
-        
-        *** NOT YET IMPLEMENTED ***
+        Set the temperature window for the sensor. If the temperature falls outside the values between upper and lower arguments the window alert bit is set. Temperatures are in degrees C with a resolution of 0.25 degrees.
         """
+        
+        # Make sure the window makes sense.
+        if lowerTemp >= upperTemp:
+            raise ValueError("MCP9808 lower temperature must be below the upper temperature.")
+        
+        # Set both window registers.
+        self.setReg(self.regTUpper, self.__tempToLimit(upperTemp))
+        self.setReg(self.regTLower, self.__tempToLimit(lowerTemp))
     
     def setTempCritical(self, critTemp):
         """
         setTempWindow(critTemp)
         
-        Set the critical temperature for the sensor. If the temperature matches or exceeds the critical temperature specified the critical temperature alerm bit is set.
-        
-        *** NOT YET IMPLEMENTED ***
+        Set the critical temperature for the sensor. If the temperature matches or exceeds the critical temperature specified the critical temperature alerm bit is set. The temperature is in degrees C with a resolution of 0.25 degrees.
         """
+        
+        # Set the critical temperature register.
+        self.setReg(self.regTCrit, self.__tempToLimit(critTemp))
     
     def getAmbientTemp(self):
         """
@@ -250,6 +269,24 @@ class mcp9808:
         
         return signedNum
     
+    def getAmbientTempFlags(self):
+        """
+        getAmbientTempFlags()
+        
+        Get ambient temperature data and the alert flags in a single register read. Returns an array with the temperature in degrees C [0] and the alert flag bits [1].
+        """
+        
+        # Get the contents of the ambient temperature register.
+        i2cRaw = self.getReg(self.regTA)
+        
+        # Put the whole register together once.
+        regVal = (i2cRaw[0] << 8) | i2cRaw[1]
+        
+        # Get our signed temperature sans alert flags, and scale it by the 0.0625 LSB.
+        signedNum = self.__getSigned(regVal & self.tempAlertMask, 13) * 0.0625
+        
+        return [signedNum, regVal & ~self.tempAlertMask]
+    
     def checkAlarmFlags(self, flags, strict = False):
         """
         checkAlarmFlags(flags)
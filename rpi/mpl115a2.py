@@ -4,8 +4,7 @@
 # Imports #
 ###########
 
-import time
-import quick2wire.i2c as qI2c
+from owsI2c import owsI2c
 from pprint import pprint
 
 ##################
@@ -24,8 +23,8 @@ class mpl115a2:
 
     def __init__(self, mpl115a2Addr = 0x60):
         # I2C set up class-wide I2C bus
-        self.__i2c = qI2c
-        self.__i2cMaster = qI2c.I2CMaster()
+        self.__i2cMaster = owsI2c("mpl115a2")
+        self.__i2c = self.__i2cMaster
         
         # Set global address var
         self.__addr = mpl115a2Addr
@@ -138,7 +137,7 @@ class mpl115a2:
         self.__writeReg(self.regConvert, 0x00)
         
         # Wait for conversion.
-        time.sleep(0.04)
+        self.__i2cMaster.sleep(0.04)
         
         # And get the ADC counter
         adcBytes = self.__readRegRange(self.regPadcMSB, self.regTadcLSB)
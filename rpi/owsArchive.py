@@ -0,0 +1,523 @@
+# OpenWeatherStn columnar archive by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+# Packed column data
+import array
+
+# Binary search on sorted timestamps
+import bisect
+
+# Date and time conversion
+import calendar
+import datetime
+
+# File handling
+import mmap
+import os
+import struct
+
+# Block compression
+from owsGorilla import owsGorilla
+
+# NumPy lets us read columns straight out of the file without copying them.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+####################
+# owsArchive class #
+####################
+
+class owsArchive:
+    """
+    owsArchive - columnar archive for closed months of weather data. Each month is stored in its own file with every column packed into a fixed width little endian array:
+    
+    Header: "OWSA", format version (uint16), row count (uint32), column count (uint16)
+    Column list: name length (uint8), name, array type code (1 byte) for each column
+    Column data: one packed array per column, in column list order
+    
+    Timestamps are stored as int64 microseconds since the epoch, measurements as float32, and counters and flags as int32 (or int64 when they need it).
+    Missing values are NaN for floats and the smallest value of the type for integers. Rows are sorted by timestamp.
+    
+    Compressed files (format version 2) have the same header and column list, but the rows are split into blocks that are compressed a column at a time with owsGorilla, which makes
+    them several times smaller. Reads only decompress the blocks and columns they need:
+    
+    Block list: rows per block (uint32), block count (uint32), then for each block its row count (uint32), first and last timestamps (int64), and each column's compressed size (uint32)
+    Block data: each block's compressed columns, in column list order
+    
+    Both versions can be read no matter which one we write. The constructor accepts two optional arguments:
+    
+    archiveDir: the directory to keep archive files in. Defaults to "db/archive".
+    compress: set to True to write compressed files. Defaults to False.
+    """
+    
+    def __init__(self, archiveDir = "db/archive", compress = False):
+        self.archiveDir = archiveDir
+        self.compress = compress
+        
+        # File format settings.
+        self.__magic = b"OWSA"
+        self.__version = 1
+        self.__compressedVersion = 2
+        self.__headerFmt = "<4sHIH"
+        
+        # Compressed block settings. A block holds a day at one record a minute.
+        self.__blockRows = 1440
+        self.__blockListFmt = "<II"
+        self.__blockFmt = "<Iqq"
+        self.__gorilla = owsGorilla()
+        
+        # Archive types by SQL type, and columns that need something different.
+        self.__typeMap = {"TIMESTAMP": "q", "NUMERIC": "f", "REAL": "f", "INTEGER": "i"}
+        self.__typeOverride = {"rain": "q"}
+        
+        # Missing integer values.
+        self.__nullInt = {"i": -(1 << 31), "q": -(1 << 63)}
+        
+        # Byte order for struct and array conversion.
+        self.__littleEndian = (struct.pack("=H", 1) == struct.pack("<H", 1))
+        
+        # The epoch our timestamps count from.
+        self.__epoch = datetime.datetime(1970, 1, 1)
+    
+    def dtsToEpoch(self, dts):
+        """
+        dtsToEpoch(dts)
+        
+        Convert a datetime to integer microseconds since the epoch. Returns an integer.
+        """
+        
+        return calendar.timegm(dts.timetuple()) * 1000000 + dts.microsecond
+    
+    def epochToDts(self, epoch):
+        """
+        epochToDts(epoch)
+        
+        Convert integer microseconds since the epoch to a datetime. Returns a datetime.
+        """
+        
+        return self.__epoch + datetime.timedelta(microseconds = int(epoch))
+    
+    def getMonthRange(self, year, month):
+        """
+        getMonthRange(year, month)
+        
+        Get the first moment of a month and of the month after it in microseconds since the epoch. Returns a list of two integers.
+        """
+        
+        return [calendar.timegm((year, month, 1, 0, 0, 0)) * 1000000, calendar.timegm((year + (month // 12), (month % 12) + 1, 1, 0, 0, 0)) * 1000000]
+    
+    def getArchiveFile(self, year, month):
+        """
+        getArchiveFile(year, month)
+        
+        Get the path to the archive file for a given month. Returns a string.
+        """
+        
+        return os.path.join(self.archiveDir, "weather-%04d-%02d.owa" % (year, month))
+    
+    def getMonths(self):
+        """
+        getMonths()
+        
+        Get the months we have archived. Returns a sorted list of (year, month) tuples.
+        """
+        
+        retVal = []
+        
+        if os.path.isdir(self.archiveDir):
+            for fileName in os.listdir(self.archiveDir):
+                if fileName.startswith("weather-") and fileName.endswith(".owa"):
+                    retVal.append((int(fileName[8:12]), int(fileName[13:15])))
+        
+        return sorted(retVal)
+    
+    def removeMonth(self, year, month):
+        """
+        removeMonth(year, month)
+        
+        Delete a month's archive file if it exists. Returns True if a file was deleted.
+        """
+        
+        archFile = self.getArchiveFile(year, month)
+        
+        if not os.path.isfile(archFile):
+            return False
+        
+        os.remove(archFile)
+        
+        return True
+    
+    def __getTypeCode(self, colName, colType):
+        """
+        __getTypeCode(colName, colType)
+        
+        Get the array type code we store a column as. Returns a one character string.
+        """
+        
+        if colName in self.__typeOverride:
+            return self.__typeOverride[colName]
+        
+        return self.__typeMap.get(colType, "f")
+    
+    def __getNullInt(self, colData):
+        """
+        __getNullInt(colData)
+        
+        Get the value that marks a missing integer in a column read from an archive. Returns an integer, or None for float columns.
+        """
+        
+        retVal = None
+        
+        # Figure out the type code from the NumPy dtype or the Python array.
+        if np is not None:
+            if colData.dtype.kind == "i":
+                retVal = self.__nullInt["i" if colData.dtype.itemsize == 4 else "q"]
+        else:
+            retVal = self.__nullInt.get(colData.typecode)
+        
+        return retVal
+    
+    def writeMonth(self, year, month, columnTypes, rows):
+        """
+        writeMonth(year, month, columnTypes, rows)
+        
+        Write a month of rows to its archive file. columnTypes is a list of (name, SQL type) tuples in row order, and the first column has to be "dts". Timestamps are epoch microseconds.
+        Rows have to be sorted by dts. The file is written to a temporary name and then moved into place so readers never see a partial file.
+        """
+        
+        colList = [(colName, self.__getTypeCode(colName, colType)) for colName, colType in columnTypes]
+        colValues = []
+        
+        for i in range(len(colList)):
+            if colList[i][1] in self.__nullInt:
+                colValues.append([self.__nullInt[colList[i][1]] if row[i] is None else int(row[i]) for row in rows])
+            else:
+                colValues.append([float("nan") if row[i] is None else float(row[i]) for row in rows])
+        
+        self.__writeColumns(year, month, colList, colValues)
+    
+    def convertMonth(self, year, month):
+        """
+        convertMonth(year, month)
+        
+        Rewrite a month's archive file compressed or not, depending on compress. Values are copied exactly, including missing ones. Returns a tuple of the file's size before and after.
+        """
+        
+        before = os.path.getsize(self.getArchiveFile(year, month))
+        
+        mapped, version, rowCount, colList, offset = self.__openMonth(year, month)
+        monthData = self.readMonth(year, month)
+        
+        self.__writeColumns(year, month, colList, [monthData[colName].tolist() for colName, typeCode in colList])
+        
+        return (before, os.path.getsize(self.getArchiveFile(year, month)))
+    
+    def __writeColumns(self, year, month, colList, colValues):
+        """
+        __writeColumns(year, month, colList, colValues)
+        
+        Write a month's archive file from a list of (name, type code) tuples and a list of values for each column, with missing values already marked.
+        """
+        
+        if not os.path.isdir(self.archiveDir):
+            os.makedirs(self.archiveDir)
+        
+        archFile = self.getArchiveFile(year, month)
+        tmpFile = archFile + ".tmp"
+        rowCount = len(colValues[0]) if len(colValues) > 0 else 0
+        
+        with open(tmpFile, "wb") as f:
+            # Header
+            f.write(struct.pack(self.__headerFmt, self.__magic, self.__compressedVersion if self.compress else self.__version, rowCount, len(colList)))
+            
+            # Column list
+            for colName, typeCode in colList:
+                nameBytes = colName.encode("ascii")
+                f.write(struct.pack("<B", len(nameBytes)) + nameBytes + typeCode.encode("ascii"))
+            
+            if self.compress:
+                self.__writeBlocks(f, colList, colValues, rowCount)
+            else:
+                # Column data
+                for i in range(len(colList)):
+                    colData = array.array(colList[i][1], colValues[i])
+                    
+                    if not self.__littleEndian:
+                        colData.byteswap()
+                    
+                    colData.tofile(f)
+            
+            f.flush()
+            os.fsync(f.fileno())
+        
+        os.replace(tmpFile, archFile)
+    
+    def __writeBlocks(self, f, colList, colValues, rowCount):
+        """
+        __writeBlocks(f, colList, colValues, rowCount)
+        
+        Write the block list and compressed blocks of a compressed archive file.
+        """
+        
+        blockList = []
+        blockData = []
+        
+        for first in range(0, rowCount, self.__blockRows):
+            last = min(first + self.__blockRows, rowCount)
+            encoded = []
+            
+            for i in range(len(colList)):
+                if colList[i][1] in self.__nullInt:
+                    encoded.append(self.__gorilla.encodeInts(colValues[i][first:last]))
+                else:
+                    encoded.append(self.__gorilla.encodeFloats(colValues[i][first:last]))
+            
+            blockList.append(struct.pack(self.__blockFmt, last - first, colValues[0][first], colValues[0][last - 1]) + struct.pack("<" + "I" * len(encoded), *[len(data) for data in encoded]))
+            blockData.append(b"".join(encoded))
+        
+        f.write(struct.pack(self.__blockListFmt, self.__blockRows, len(blockList)))
+        f.write(b"".join(blockList))
+        f.write(b"".join(blockData))
+    
+    def __openMonth(self, year, month):
+        """
+        __openMonth(year, month)
+        
+        Map a month's archive file and read its header and column list. Raises ValueError if it isn't an archive file we can read.
+        Returns a tuple of the mapped file, its format version, the row count, a list of (name, type code) tuples, and the offset of what comes after the column list.
+        """
+        
+        with open(self.getArchiveFile(year, month), "rb") as f:
+            # Map the file so we only touch the columns we want.
+            mapped = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        
+        magic, version, rowCount, colCount = struct.unpack_from(self.__headerFmt, mapped, 0)
+        
+        if (magic != self.__magic) or (version not in (self.__version, self.__compressedVersion)):
+            raise ValueError("owsArchive: " + self.getArchiveFile(year, month) + " isn't an archive file we can read.")
+        
+        # Walk the column list.
+        offset = struct.calcsize(self.__headerFmt)
+        colList = []
+        
+        for i in range(colCount):
+            nameLen = mapped[offset]
+            colName = mapped[offset + 1:offset + 1 + nameLen].decode("ascii")
+            typeCode = mapped[offset + 1 + nameLen:offset + 2 + nameLen].decode("ascii")
+            colList.append((colName, typeCode))
+            offset = offset + 2 + nameLen
+        
+        return (mapped, version, rowCount, colList, offset)
+    
+    def readMonth(self, year, month, columns = None):
+        """
+        readMonth(year, month, [columns = None])
+        
+        Read columns from a month's archive file. If columns is None all columns are read. With NumPy the columns are arrays mapped straight from the file,
+        otherwise they're Python arrays. Compressed files are decompressed into new arrays. Missing values are left as NaN or the smallest integer value.
+        Returns a dict of column name to array, plus "rowCount".
+        """
+        
+        mapped, version, rowCount, colList, offset = self.__openMonth(year, month)
+        
+        # Put compressed blocks back together.
+        if version == self.__compressedVersion:
+            blocks = list(self.iterBlocks(year, month, columns))
+            retVal = {"rowCount": rowCount}
+            
+            for colName, typeCode in colList:
+                if (columns is None) or (colName in columns):
+                    colDataType = "f" if typeCode not in self.__nullInt else typeCode
+                    
+                    if np is not None:
+                        retVal[colName] = np.concatenate([block[colName] for block in blocks]) if len(blocks) > 0 else np.array([], dtype = np.dtype(colDataType))
+                    else:
+                        retVal[colName] = array.array(colDataType)
+                        
+                        for block in blocks:
+                            retVal[colName].extend(block[colName])
+            
+            return retVal
+        
+        return self.__readColumns(mapped, rowCount, colList, offset, columns)
+    
+    def __readColumns(self, mapped, rowCount, colList, offset, columns):
+        """
+        __readColumns(mapped, rowCount, colList, offset, columns)
+        
+        Read columns from an uncompressed archive file mapped with __openMonth(). Returns a dict of column name to array, plus "rowCount".
+        """
+        
+        retVal = {}
+        
+        # Walk the column data.
+        for colName, typeCode in colList:
+            itemSize = array.array(typeCode).itemsize
+            colSize = itemSize * rowCount
+            
+            if (columns is None) or (colName in columns):
+                if np is not None:
+                    retVal[colName] = np.frombuffer(mapped, dtype = np.dtype(typeCode).newbyteorder("<"), count = rowCount, offset = offset)
+                else:
+                    colData = array.array(typeCode)
+                    colData.frombytes(mapped[offset:offset + colSize])
+                    
+                    if not self.__littleEndian:
+                        colData.byteswap()
+                    
+                    retVal[colName] = colData
+            
+            offset = offset + colSize
+        
+        retVal['rowCount'] = rowCount
+        
+        return retVal
+    
+    def __decodeColumn(self, data, typeCode, count):
+        """
+        __decodeColumn(data, typeCode, count)
+        
+        Decompress one column of a block. Returns a NumPy array, or a Python array without NumPy.
+        """
+        
+        if typeCode in self.__nullInt:
+            values = self.__gorilla.decodeInts(data, count)
+            
+            if np is not None:
+                return np.array(values, dtype = np.dtype(typeCode))
+            
+            return array.array(typeCode, values)
+        
+        # Floats come back as their bits, so just look at them as floats.
+        words = self.__gorilla.decodeFloats(data, count)
+        
+        if np is not None:
+            return np.frombuffer(words, dtype = np.uint32).view(np.float32)
+        
+        retVal = array.array("f")
+        retVal.frombytes(words.tobytes())
+        
+        return retVal
+    
+    def iterBlocks(self, year, month, columns = None, startEpoch = None, endEpoch = None):
+        """
+        iterBlocks(year, month, [columns = None], [startEpoch = None], [endEpoch = None])
+        
+        Generator that reads a month a block at a time, only decompressing the blocks that have rows from startEpoch up to but not including endEpoch, and only the columns asked for.
+        If columns is None all columns are read. Uncompressed files are one block. Yields a dict for each block in the same form readMonth() returns.
+        """
+        
+        mapped, version, rowCount, colList, offset = self.__openMonth(year, month)
+        
+        if version != self.__compressedVersion:
+            yield self.__readColumns(mapped, rowCount, colList, offset, columns)
+            return
+        
+        blockRows, blockCount = struct.unpack_from(self.__blockListFmt, mapped, offset)
+        offset = offset + struct.calcsize(self.__blockListFmt)
+        
+        # Read the block list, which tells us where each block's columns are.
+        entryFmt = self.__blockFmt + "I" * len(colList)
+        entrySize = struct.calcsize(entryFmt)
+        dataOffset = offset + (entrySize * blockCount)
+        
+        for i in range(blockCount):
+            entry = struct.unpack_from(entryFmt, mapped, offset + (entrySize * i))
+            blockRowCt, firstEpoch, lastEpoch = entry[0:3]
+            colSizes = entry[3:]
+            
+            # Skip blocks that are completely outside of our range.
+            if ((startEpoch is None) or (lastEpoch >= startEpoch)) and ((endEpoch is None) or (firstEpoch < endEpoch)):
+                block = {"rowCount": blockRowCt}
+                colOffset = dataOffset
+                
+                for j in range(len(colList)):
+                    colName, typeCode = colList[j]
+                    
+                    if (columns is None) or (colName in columns):
+                        block[colName] = self.__decodeColumn(mapped[colOffset:colOffset + colSizes[j]], typeCode, blockRowCt)
+                    
+                    colOffset = colOffset + colSizes[j]
+                
+                yield block
+            
+            dataOffset = dataOffset + sum(colSizes)
+    
+    def getRangeColumns(self, startEpoch, endEpoch, columns = None):
+        """
+        getRangeColumns(startEpoch, endEpoch, [columns = None])
+        
+        Read columns for archived rows from startEpoch up to but not including endEpoch, both in microseconds since the epoch. Only the blocks of compressed months that have rows in the range are decompressed.
+        Returns a list with one dict per month or block that has data in the range, in the same form readMonth() returns.
+        """
+        
+        retVal = []
+        
+        # We need dts to find the range, even if it wasn't asked for.
+        readCols = None
+        
+        if columns is not None:
+            readCols = list(set(columns) | set(["dts"]))
+        
+        for year, month in self.getMonths():
+            # Skip months that are completely outside of our range.
+            monthStart, monthEnd = self.getMonthRange(year, month)
+            
+            if (monthEnd <= startEpoch) or (monthStart >= endEpoch):
+                continue
+            
+            for blockData in self.iterBlocks(year, month, readCols, startEpoch, endEpoch):
+                # Rows are sorted, so find our slice with a binary search.
+                if np is not None:
+                    first = int(np.searchsorted(blockData['dts'], startEpoch, "left"))
+                    last = int(np.searchsorted(blockData['dts'], endEpoch, "left"))
+                else:
+                    first = bisect.bisect_left(blockData['dts'], startEpoch)
+                    last = bisect.bisect_left(blockData['dts'], endEpoch)
+                
+                if last > first:
+                    sliced = {"rowCount": last - first}
+                    
+                    for colName in blockData:
+                        if colName != 'rowCount':
+                            sliced[colName] = blockData[colName][first:last]
+                    
+                    retVal.append(sliced)
+        
+        return retVal
+    
+    def getRange(self, startEpoch, endEpoch, columnTypes):
+        """
+        getRange(startEpoch, endEpoch, columnTypes)
+        
+        Get archived rows from startEpoch up to but not including endEpoch, both in microseconds since the epoch, as tuples in the order of columnTypes, a list of (name, SQL type) tuples.
+        Values are converted back to what the database would give us, and columns that weren't archived are None. Returns a list of tuples.
+        """
+        
+        retVal = []
+        
+        for monthData in self.getRangeColumns(startEpoch, endEpoch):
+            converted = []
+            
+            for colName, colType in columnTypes:
+                if colName not in monthData:
+                    converted.append([None] * monthData['rowCount'])
+                    continue
+                
+                colData = monthData[colName]
+                nullInt = self.__getNullInt(colData)
+                
+                if nullInt is not None:
+                    converted.append([None if v == nullInt else v for v in colData.tolist()])
+                else:
+                    # Keep floats from picking up float32 noise by only keeping the digits float32 can hold.
+                    converted.append([None if v != v else float("%.7g" % v) for v in colData.tolist()])
+            
+            retVal.extend(zip(*converted))
+        
+        return retVal
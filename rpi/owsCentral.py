@@ -0,0 +1,394 @@
+# OpenWeatherStn central data layer by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+# Add SQLite3 support
+import sqlite3
+
+# Date and time handling for timestamps
+import calendar
+import datetime
+
+# Performance counters
+from owsMetrics import registry
+
+# Tracing
+from owsTrace import tracer
+
+# NumPy is used for column data if we have it.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+####################
+# owsCentral class #
+####################
+
+class owsCentral:
+    """
+    owsCentral is a data layer for a central server that collects records from many stations. Records are kept in one table keyed on (station, dts) without a rowid, so each station's records
+    are stored together in time order and a station's range is one index walk. Each station's latest record is kept in the stations table as records arrive, so the latest from every station is one small read.
+    Stations can run different versions, so records come with the names of their columns, and columns the central database hasn't seen yet are added as they show up.
+    The constructor accepts one optional argument:
+    
+    dbFile is a string containing the path to the central Sqlite3 database file.
+    
+    Timestamps are stored and returned as integer microseconds since the epoch (UTC), like owsData. Methods that take a timestamp also accept a datetime.
+    """
+    
+    def __init__(self, dbFile = "db/central.db"):
+        try:
+            # Connect to our SQLite database. The web service and pullers can share the database, so use write-ahead logging so readers never wait on ingest,
+            # and only sync at checkpoints since stations keep their own copy of everything.
+            self.__dbConn = sqlite3.connect(dbFile, check_same_thread = False)
+            self.__db = self.__dbConn.cursor()
+            self.__db.execute('PRAGMA journal_mode = WAL;')
+            self.__db.execute('PRAGMA synchronous = NORMAL;')
+        
+        # Pass any exception we get straight through.
+        except Exception as e:
+            raise e
+        
+        # Same columns as owsData's weather table, in the same order. Columns stations send that aren't here are added as REAL columns.
+        self.columnTypes = [("dts", "TIMESTAMP"), ("temp", "REAL"), ("humid", "REAL"), ("baro", "REAL"), ("rain", "INTEGER"), \
+            ("windDir", "REAL"), ("windAvg", "REAL"), ("windMax", "REAL"), ("lightLvl", "REAL"), ("sysTemp", "REAL"), \
+            ("quality", "INTEGER"), ("rainDelta", "INTEGER"), ("rainCpm", "REAL"), ("rainRate", "REAL"), \
+            ("windGust", "REAL"), ("windGustDts", "TIMESTAMP"), ("windAvg2m", "REAL"), ("windAvg10m", "REAL"), \
+            ("dewpoint", "REAL"), ("heatIndex", "REAL"), ("windChill", "REAL"), ("seaLevelBaro", "REAL"), ("windDirCrd", "INTEGER")]
+        self.columns = [col[0] for col in self.columnTypes]
+        
+        # Station bookkeeping columns that come before the latest record in the stations table.
+        self.stationColumns = ["station", "firstIngest", "lastIngest", "records"]
+        
+        # Longest station ID we accept.
+        self.maxStationLen = 64
+        
+        # INSERT statements by the columns they fill.
+        self.__insertSql = {}
+        
+        self.__epoch = datetime.datetime(1970, 1, 1)
+        
+        registry.describe("ows_central_records_total", "counter", "Records ingested from each station.")
+        registry.describe("ows_central_duplicates_total", "counter", "Records stations sent again that were already stored.")
+        
+        self.__createSchema()
+    
+    def dtsToEpoch(self, dts):
+        """
+        dtsToEpoch(dts)
+        
+        Convert a datetime to integer microseconds since the epoch. Integers and None are passed through. Returns an integer or None.
+        """
+        
+        if isinstance(dts, datetime.datetime):
+            return calendar.timegm(dts.timetuple()) * 1000000 + dts.microsecond
+        
+        return dts
+    
+    def epochToDts(self, epoch):
+        """
+        epochToDts(epoch)
+        
+        Convert integer microseconds since the epoch to a datetime. None is passed through. Returns a datetime or None.
+        """
+        
+        if epoch is None:
+            return None
+        
+        return self.__epoch + datetime.timedelta(microseconds = int(epoch))
+    
+    def __createSchema(self):
+        """
+        __createSchema()
+        
+        Create the readings and stations tables if they don't exist, and pick up columns that were added to an existing database.
+        """
+        
+        colSql = ', '.join([colName + ' ' + ("INTEGER" if colType == "TIMESTAMP" else colType) for colName, colType in self.columnTypes[1:]])
+        
+        try:
+            self.__db.execute('CREATE TABLE IF NOT EXISTS readings(station TEXT NOT NULL, dts INTEGER NOT NULL, ' + colSql + ', PRIMARY KEY(station, dts)) WITHOUT ROWID;')
+            self.__db.execute('CREATE TABLE IF NOT EXISTS stations(station TEXT NOT NULL PRIMARY KEY, firstIngest INTEGER NOT NULL, lastIngest INTEGER NOT NULL, ' + \
+                'records INTEGER NOT NULL, dts INTEGER NOT NULL, ' + colSql + ');')
+            
+            self.__dbConn.commit()
+            
+            self.__loadColumns()
+        
+        except Exception as e:
+            raise e
+    
+    def __loadColumns(self):
+        """
+        __loadColumns()
+        
+        Pick up columns stations added after the database was created, which are at the end of the readings table. Other connections to the database can add columns too.
+        """
+        
+        try:
+            self.__db.execute('PRAGMA table_info(readings);')
+            
+            for row in self.__db.fetchall():
+                if (row[1] not in self.columns) and (row[1] != "station"):
+                    self.columnTypes.append((row[1], row[2].upper()))
+                    self.columns.append(row[1])
+                    
+                    # Statements we built before don't know about the new column.
+                    self.__insertSql = {}
+        
+        except Exception as e:
+            raise e
+    
+    def __addColumns(self, columns):
+        """
+        __addColumns(columns)
+        
+        Add REAL columns we haven't seen to the readings and stations tables. Column names have to be plain identifiers since they go into SQL. Raises ValueError for anything else.
+        """
+        
+        for colName in columns:
+            if colName in self.columns:
+                continue
+            
+            if (not isinstance(colName, str)) or (not colName.isidentifier()) or (not colName.isascii()) or \
+                (colName.lower() in [name.lower() for name in self.stationColumns + self.columns]):
+                raise ValueError("owsCentral: " + repr(colName) + " isn't a column name we can store.")
+            
+            # Add the column to both tables or neither.
+            try:
+                self.__db.execute('BEGIN;')
+                self.__db.execute('ALTER TABLE readings ADD COLUMN ' + colName + ' REAL;')
+                self.__db.execute('ALTER TABLE stations ADD COLUMN ' + colName + ' REAL;')
+                self.__dbConn.commit()
+            
+            # Another connection may have just added the column. Otherwise it's a name SQLite keeps for itself, like "order", that can't be a column.
+            except sqlite3.OperationalError:
+                self.__dbConn.rollback()
+                self.__loadColumns()
+                
+                if colName in self.columns:
+                    continue
+                
+                raise ValueError("owsCentral: " + repr(colName) + " isn't a column name we can store.")
+            
+            except Exception as e:
+                self.__dbConn.rollback()
+                raise e
+            
+            self.columnTypes.append((colName, "REAL"))
+            self.columns.append(colName)
+            
+            # Statements we built before don't know about the new column.
+            self.__insertSql = {}
+    
+    def __getInsertSql(self, columns):
+        """
+        __getInsertSql(columns)
+        
+        Get the statements that add readings with the given columns and keep the station's latest record up to date. Returns a tuple of two strings.
+        """
+        
+        key = tuple(columns)
+        
+        if key not in self.__insertSql:
+            colList = ', '.join(columns)
+            params = ','.join(['?'] * len(columns))
+            
+            # Stations resend records when they don't hear back, so the first copy wins.
+            readingSql = 'INSERT OR IGNORE INTO readings(station, ' + colList + ') VALUES(?,' + params + ');'
+            
+            # Only replace the latest record with a newer one, since batches can arrive out of order. Columns the station didn't send are null in its latest record.
+            others = [colName for colName in self.columns if colName not in columns]
+            latestSql = 'INSERT INTO stations(station, firstIngest, lastIngest, records, ' + colList + ') VALUES(?,?,?,?,' + params + ') ' + \
+                'ON CONFLICT(station) DO UPDATE SET lastIngest = excluded.lastIngest, records = records + excluded.records, ' + \
+                ', '.join(['{0} = CASE WHEN excluded.dts >= stations.dts THEN {1} ELSE stations.{0} END'.format(colName, 'excluded.' + colName if colName in columns else 'NULL') for colName in columns + others]) + ';'
+            
+            self.__insertSql[key] = (readingSql, latestSql)
+        
+        return self.__insertSql[key]
+    
+    def addRecords(self, station, records, columns = None):
+        """
+        addRecords(station, records, [columns = None])
+        
+        Add records from a station in one transaction. Each record is a tuple of values for columns, which is a list of column names that has to include dts. If columns is None records are in owsData's
+        record order, and can leave off trailing values. Records the station already sent are skipped. If any record can't be added none of them are. Raises ValueError for a bad station ID or column name.
+        Returns a tuple of the number of records added and the number that were already stored.
+        """
+        
+        if (not isinstance(station, str)) or (len(station) == 0) or (len(station) > self.maxStationLen):
+            raise ValueError("owsCentral: Station IDs have to be 1 to " + str(self.maxStationLen) + " characters.")
+        
+        if columns is None:
+            records = [list(values) for values in records]
+            width = max([len(values) for values in records]) if len(records) > 0 else 1
+            columns = self.columns[:width]
+            records = [values + [None] * (width - len(values)) for values in records]
+        else:
+            columns = list(columns)
+            
+            if ("dts" not in columns) or (len(set(columns)) != len(columns)):
+                raise ValueError("owsCentral: Records need one dts column.")
+            
+            self.__addColumns(columns)
+            records = [list(values) for values in records]
+        
+        if len(records) == 0:
+            return (0, 0)
+        
+        # Store timestamps as epoch microseconds.
+        timestampIdx = [columns.index(colName) for colName, colType in self.columnTypes if (colType == "TIMESTAMP") and (colName in columns)]
+        dtsIdx = columns.index("dts")
+        
+        for values in records:
+            if len(values) != len(columns):
+                raise ValueError("owsCentral: Records have to have a value for each column.")
+            
+            for i in timestampIdx:
+                values[i] = self.dtsToEpoch(values[i])
+            
+            if not isinstance(values[dtsIdx], int):
+                raise ValueError("owsCentral: Records need a timestamp.")
+        
+        readingSql, latestSql = self.__getInsertSql(columns)
+        latest = max(records, key = lambda values: values[dtsIdx])
+        now = self.dtsToEpoch(datetime.datetime.utcnow())
+        
+        try:
+            with registry.timer("ows_sqlite_seconds", {"op": "centralAddRecords"}), tracer.span("centralAddRecords", "sqlite", {"station": station, "records": len(records)}):
+                before = self.__dbConn.total_changes
+                self.__db.executemany(readingSql, [[station] + values for values in records])
+                added = self.__dbConn.total_changes - before
+                
+                self.__db.execute(latestSql, [station, now, now, added] + latest)
+                
+                with tracer.span("commit", "sqlite"):
+                    self.__dbConn.commit()
+        
+        except Exception as e:
+            self.__dbConn.rollback()
+            raise e
+        
+        registry.inc("ows_central_records_total", {"station": station}, added)
+        registry.inc("ows_central_duplicates_total", {"station": station}, len(records) - added)
+        
+        return (added, len(records) - added)
+    
+    def getStations(self):
+        """
+        getStations()
+        
+        Get every station we've heard from, sorted by station ID. Returns a list of (station, firstIngest, lastIngest, records, dts) tuples, where records is how many records we have from the station,
+        the ingest times are when we first and last got records from it, and dts is the time of its latest record.
+        """
+        
+        try:
+            with registry.timer("ows_sqlite_seconds", {"op": "centralGetStations"}), tracer.span("centralGetStations", "sqlite"):
+                self.__db.execute("SELECT station, firstIngest, lastIngest, records, dts FROM stations ORDER BY station;")
+                
+                return self.__db.fetchall()
+        
+        except Exception as e:
+            raise e
+    
+    def getLastDts(self, station):
+        """
+        getLastDts(station)
+        
+        Get the time of the latest record we have from a station, so it can send or be asked for everything after it. Returns epoch microseconds, or None if we've never heard from the station.
+        """
+        
+        try:
+            self.__db.execute("SELECT dts FROM stations WHERE station = ?;", (station,))
+            row = self.__db.fetchone()
+        
+        except Exception as e:
+            raise e
+        
+        return None if row is None else row[0]
+    
+    def getLatest(self, stations = None):
+        """
+        getLatest([stations = None])
+        
+        Get the latest record from each station in one query. stations is a list of station IDs, or None for every station. Stations we've never heard from are left out.
+        Returns a dict of station ID to a record tuple in columns order.
+        """
+        
+        sql = "SELECT station, " + ', '.join(self.columns) + " FROM stations"
+        params = []
+        
+        if stations is not None:
+            stations = list(stations)
+            
+            if len(stations) == 0:
+                return {}
+            
+            sql = sql + " WHERE station IN (" + ','.join(['?'] * len(stations)) + ")"
+            params = stations
+        
+        try:
+            with registry.timer("ows_sqlite_seconds", {"op": "centralGetLatest"}), tracer.span("centralGetLatest", "sqlite"):
+                self.__db.execute(sql + ";", params)
+                rows = self.__db.fetchall()
+        
+        except Exception as e:
+            raise e
+        
+        return dict([(row[0], row[1:]) for row in rows])
+    
+    def getRange(self, station, startDts, endDts):
+        """
+        getRange(station, startDts, endDts)
+        
+        Get a station's records starting at startDts up to but not including endDts, in the same tuple order as getLatest(), sorted by dts. Returns a list of tuples.
+        """
+        
+        try:
+            with registry.timer("ows_sqlite_seconds", {"op": "centralGetRange"}), tracer.span("centralGetRange", "sqlite", {"station": station}):
+                self.__db.execute("SELECT " + ', '.join(self.columns) + " FROM readings WHERE station = ? AND dts >= ? AND dts < ? ORDER BY dts;", \
+                    (station, self.dtsToEpoch(startDts), self.dtsToEpoch(endDts)))
+                
+                return self.__db.fetchall()
+        
+        except Exception as e:
+            raise e
+    
+    def getRangeColumns(self, station, startDts, endDts, columns = None):
+        """
+        getRangeColumns(station, startDts, endDts, [columns = None])
+        
+        Get columns of a station's data starting at startDts up to but not including endDts. If columns is None all columns are returned. Missing values are NaN.
+        Raises ValueError for columns we don't have. Returns a dict of column name to a NumPy array (or a list without NumPy).
+        """
+        
+        if columns is None:
+            columns = self.columns
+        
+        for colName in columns:
+            if colName not in self.columns:
+                raise ValueError("owsCentral: We don't have a " + repr(colName) + " column.")
+        
+        try:
+            with registry.timer("ows_sqlite_seconds", {"op": "centralGetRangeColumns"}), tracer.span("centralGetRangeColumns", "sqlite", {"station": station}):
+                self.__db.execute("SELECT " + ', '.join(columns) + " FROM readings WHERE station = ? AND dts >= ? AND dts < ? ORDER BY dts;", \
+                    (station, self.dtsToEpoch(startDts), self.dtsToEpoch(endDts)))
+                rows = self.__db.fetchall()
+        
+        except Exception as e:
+            raise e
+        
+        retVal = {}
+        
+        for i in range(len(columns)):
+            if columns[i] == "dts":
+                column = [row[i] for row in rows]
+            else:
+                column = [float("nan") if row[i] is None else row[i] for row in rows]
+            
+            retVal[columns[i]] = column if np is None else np.asarray(column)
+        
+        return retVal
@@ -0,0 +1,93 @@
+# OpenWeatherStn compass point lookup by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+# NumPy lets us convert whole columns of headings at once.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+####################
+# owsCompass class #
+####################
+
+class owsCompass:
+    """
+    owsCompass - converts headings in degrees to compass points with a lookup table. The compass is split into equal sectors centered on each point, so any heading, fractional or not,
+    maps to a point with one arithmetic operation: int((heading + width / 2) / width) % points. The constructor accepts one optional argument:
+    
+    points: the number of compass points, 8, 16, or 32. Defaults to 8.
+    """
+    
+    def __init__(self, points = 8):
+        # Point names for each compass size, clockwise from north.
+        pointNames = {
+            8: ["N", "NE", "E", "SE", "S", "SW", "W", "NW"],
+            16: ["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE", "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW"],
+            32: ["N", "NbE", "NNE", "NEbN", "NE", "NEbE", "ENE", "EbN", "E", "EbS", "ESE", "SEbE", "SE", "SEbS", "SSE", "SbE", \
+                "S", "SbW", "SSW", "SWbS", "SW", "SWbW", "WSW", "WbS", "W", "WbN", "WNW", "NWbW", "NW", "NWbN", "NNW", "NbW"]}
+        
+        if points not in pointNames:
+            raise ValueError("owsCompass: Compass must have 8, 16, or 32 points.")
+        
+        self.points = points
+        self.names = pointNames[points]
+        
+        # Sector width, and how far we shift headings so each sector is centered on its point.
+        self.__width = 360.0 / points
+        self.__offset = self.__width / 2.0
+        
+        # Names as an array for vectorized lookups.
+        if np is not None:
+            self.__nameArray = np.array(self.names + [""])
+    
+    def getIdx(self, heading):
+        """
+        getIdx(heading)
+        
+        Get the compass point index of a heading in degrees. Returns an integer index into names, or None if heading is None.
+        """
+        
+        if heading is None:
+            return None
+        
+        return int((heading % 360.0 + self.__offset) / self.__width) % self.points
+    
+    def getName(self, heading):
+        """
+        getName(heading)
+        
+        Get the compass point of a heading in degrees. Returns a string with directional information (N, NE, NNE, etc.), or None if heading is None.
+        """
+        
+        if heading is None:
+            return None
+        
+        return self.names[self.getIdx(heading)]
+    
+    def getIdxArray(self, headings):
+        """
+        getIdxArray(headings)
+        
+        Vectorized getIdx() for converting history in bulk. Takes a NumPy array (or sequence) of headings with NaN for missing values. Returns a NumPy array of indices, with -1 where the heading is missing.
+        """
+        
+        headings = np.asarray(headings, dtype = np.float64)
+        missing = np.isnan(headings)
+        
+        idx = ((np.where(missing, 0.0, headings) % 360.0 + self.__offset) // self.__width).astype(np.int64) % self.points
+        
+        return np.where(missing, -1, idx)
+    
+    def getNameArray(self, headings):
+        """
+        getNameArray(headings)
+        
+        Vectorized getName() for converting history in bulk. Takes a NumPy array (or sequence) of headings with NaN for missing values. Returns a NumPy array of strings, with "" where the heading is missing.
+        """
+        
+        # -1 picks the empty name at the end of the lookup table.
+        return self.__nameArray[self.getIdxArray(headings)]
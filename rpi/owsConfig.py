@@ -0,0 +1,88 @@
+# OpenWeatherStn configuration by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import json
+import os
+
+# Sensors we can read
+from owsSensors import sensorRegistry
+
+###################
+# owsConfig class #
+###################
+
+class owsConfig:
+    """
+    owsConfig - station settings for scanner.py and weatherService.py, read from a JSON file of setting names to values. Settings the file doesn't have keep their defaults, and a station
+    without a config file gets the defaults, which match the hardware the station was built with. The sensors setting lists the sensors that are installed. Sensors that aren't listed are never
+    loaded or touched on the bus. The plugins setting lists modules to import that register more sensors with sensorRegistry, and scanBudget limits how many seconds of bus time a scan spends
+    reading sensors. The constructor accepts one optional argument:
+    
+    configFile: path to the config file. Defaults to the OWS_CONFIG environment variable if it's set, or "db/config.json".
+    """
+    
+    def __init__(self, configFile = None):
+        if configFile is None:
+            configFile = os.environ.get("OWS_CONFIG", "db/config.json")
+        
+        self.configFile = configFile
+        
+        # Settings and their defaults.
+        self.settings = {"sensors": list(sensorRegistry.defaultSensors), "plugins": [], "scanBudget": None, "magOffset": 0, "windOffset": 79, "magCalFile": "db/magCal.json", "rainCal": 0.01, "elevation": 0, \
+            "scanInterval": 60, "debug": True, "dbFile": "db/weather.db", "compressArchive": False, "ringFile": "db/samples.ring", "metricsFile": "db/metrics.json", "httpPort": 80}
+        
+        self.__load()
+    
+    def __load(self):
+        """
+        __load()
+        
+        Read the config file if there is one and import its plugins. Raises ValueError for settings or sensors we don't know, so typos don't quietly fall back to defaults.
+        """
+        
+        try:
+            with open(self.configFile, "r") as f:
+                fileSettings = json.load(f)
+        
+        except FileNotFoundError:
+            return
+        
+        except Exception as e:
+            raise e
+        
+        if not isinstance(fileSettings, dict):
+            raise ValueError("owsConfig: " + self.configFile + " should hold a JSON object of settings.")
+        
+        for name in fileSettings:
+            if name not in self.settings:
+                raise ValueError("owsConfig: Unknown setting " + repr(name) + " in " + self.configFile + ".")
+        
+        # Plugins register their sensors when they're imported.
+        sensorRegistry.loadPlugins(fileSettings.get('plugins', []))
+        
+        for sensor in fileSettings.get('sensors', []):
+            if sensor not in sensorRegistry.getNames():
+                raise ValueError("owsConfig: Unknown sensor " + repr(sensor) + " in " + self.configFile + ". Known sensors are " + ", ".join(sensorRegistry.getNames()) + ".")
+        
+        self.settings.update(fileSettings)
+    
+    def get(self, name):
+        """
+        get(name)
+        
+        Get a setting. Raises KeyError for settings we don't have. Returns the setting's value.
+        """
+        
+        return self.settings[name]
+    
+    def hasSensor(self, sensor):
+        """
+        hasSensor(sensor)
+        
+        Is a sensor installed? Returns a boolean.
+        """
+        
+        return sensor in self.settings['sensors']
@@ -7,6 +7,33 @@
 # Add SQLite3 support
 import sqlite3
 
+# Date and time handling for ranges
+import datetime
+
+# Vector averages for wind direction
+import math
+
+# Path handling
+import os
+
+# Waiting for other connections
+import time
+
+# Columnar archive of closed months
+from owsArchive import owsArchive
+
+# Performance counters
+from owsMetrics import registry
+
+# Tracing
+from owsTrace import tracer
+
+# NumPy is used for column data if we have it.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 #################
 # owsData class #
 #################
@@ -16,67 +43,1050 @@ class owsData:
     owsData is a data layer class to manage data access for the OpenWeatherStn project:
         
     dbFile is a string containing the path to the weather Sqlite3 database file.
+    archiveDir is a string containing the path to the directory closed months are archived in. If it's None the "archive" directory next to the database file is used.
+    retention is a dict with the number of days of "raw", "hourly", "daily", and "archive" data to keep when applyRetention() runs. None keeps that data forever. Raw data is the live weather table,
+    and archive is the archived months. Defaults to 30 days of raw data, 2 years of hourly data, and daily and archived data forever.
+    compressArchive is set to True to archive closed months in owsArchive's compressed format, which is several times smaller but slower to read. Defaults to False.
+    sensorCols is a list of (name, type) tuples for plugin sensors' channels from owsSensors.getColumns(). Columns the weather table doesn't have are added. Columns added before are always
+    included after ours, whether or not they're in sensorCols, so records line up no matter which plugins a process loaded. Defaults to None.
+    
+    Timestamps are stored and returned as integer microseconds since the epoch (UTC). Methods that take a timestamp also accept a datetime. Use dtsToEpoch() and epochToDts() to convert.
     """
     
-    def __init__(self, dbFile = "db/weather.db"):
+    def __init__(self, dbFile = "db/weather.db", archiveDir = None, retention = None, compressArchive = False, sensorCols = None):
         try:
             # Connect to our SQLite database and create an object we can use to interact with it,
             # and make sure the Sqlite 3 doesn't do the thread check since we're only using one thread.
-            self.__dbConn = sqlite3.connect(dbFile, detect_types = sqlite3.PARSE_DECLTYPES, check_same_thread = False)
+            # Timestamps are integers, so there's nothing for SQLite to convert.
+            # The scanner and the web service share the database, so use write-ahead logging so the service's reads never hold up the scanner's inserts.
+            self.__dbConn = sqlite3.connect(dbFile, check_same_thread = False)
             self.__db = self.__dbConn.cursor()
+            self.__db.execute('PRAGMA journal_mode = WAL;')
         
         # Pass any exception we get straight through.
         except Exception as e:
             raise e
+        
+        # Columns in the weather table in record order, and their types.
+        self.columnTypes = [("dts", "TIMESTAMP"), ("temp", "REAL"), ("humid", "REAL"), ("baro", "REAL"), ("rain", "INTEGER"), \
+            ("windDir", "REAL"), ("windAvg", "REAL"), ("windMax", "REAL"), ("lightLvl", "REAL"), ("sysTemp", "REAL")]
+        
+        # Columns added after the original table layout, and their types. These are appended to records in this order.
+        self.__addedCols = [("quality", "INTEGER"), ("rainDelta", "INTEGER"), ("rainCpm", "REAL"), ("rainRate", "REAL"), \
+            ("windGust", "REAL"), ("windGustDts", "TIMESTAMP"), ("windAvg2m", "REAL"), ("windAvg10m", "REAL"), \
+            ("dewpoint", "REAL"), ("heatIndex", "REAL"), ("windChill", "REAL"), ("seaLevelBaro", "REAL"), ("windDirCrd", "INTEGER")]
+        self.columnTypes = self.columnTypes + self.__addedCols
+        self.columns = [col[0] for col in self.columnTypes]
+        
+        # Plugin sensors' channels go after our columns.
+        if sensorCols is not None:
+            for colName, colType in sensorCols:
+                if colName in self.columns:
+                    raise ValueError("owsData: Sensor channel " + colName + " is already a weather column.")
+            
+            self.columnTypes = self.columnTypes + list(sensorCols)
+            self.columns = [col[0] for col in self.columnTypes]
+        
+        # Where the timestamps are in a record.
+        self.__timestampIdx = [i for i in range(len(self.columnTypes)) if self.columnTypes[i][1] == "TIMESTAMP"]
+        
+        # Columns in the events table and their types.
+        self.eventColTypes = [("dts", "TIMESTAMP"), ("source", "TEXT"), ("event", "TEXT"), ("value", "REAL")]
+        
+        # Closed months live in the archive.
+        if archiveDir is None:
+            archiveDir = os.path.join(os.path.dirname(dbFile), "archive")
+        
+        self.archive = owsArchive(archiveDir, compressArchive)
+        
+        # INSERT statements by the number of values in a record.
+        self.__insertSql = {}
+        
+        # How long we keep each kind of data, in days.
+        self.retention = {"raw": 30, "hourly": 730, "daily": None, "archive": None}
+        
+        if retention is not None:
+            self.retention.update(retention)
+        
+        # Hourly and daily rollup columns in record order, their types, the weather column they summarize, and how.
+        self.rollupColTypes = [("dts", "TIMESTAMP", "dts", None), ("samples", "INTEGER", "dts", "count"), ("temp", "REAL", "temp", "avg"), \
+            ("tempMin", "REAL", "temp", "min"), ("tempMax", "REAL", "temp", "max"), ("humid", "REAL", "humid", "avg"), ("baro", "REAL", "baro", "avg"), \
+            ("rainDelta", "INTEGER", "rainDelta", "sum"), ("rainRateMax", "REAL", "rainRate", "max"), ("windDir", "REAL", "windDir", "dir"), \
+            ("windAvg", "REAL", "windAvg", "avg"), ("windMax", "REAL", "windMax", "max"), ("windGust", "REAL", "windGust", "max"), \
+            ("lightLvl", "REAL", "lightLvl", "avg"), ("sysTemp", "REAL", "sysTemp", "avg"), ("sysTempMax", "REAL", "sysTemp", "max"), ("quality", "INTEGER", "quality", "or")]
+        self.rollupColumns = [col[0] for col in self.rollupColTypes]
+        
+        # Rollup tables and the number of microseconds each row covers.
+        self.__rollupTables = {"hourly": ("weatherHourly", 3600 * 1000000), "daily": ("weatherDaily", 86400 * 1000000)}
+        
+        # Delete this many rows per transaction so we never hold the database for long.
+        self.__deleteChunk = 500
+        
+        # Schema version kept in PRAGMA user_version. Version 2 stores timestamps as epoch microseconds with typed columns.
+        self.__schemaVersion = 2
+        
+        # Copy this many rows at a time when migrating a table, and how many seconds to wait for another connection to finish upgrading the database.
+        self.__migrateChunk = 5000
+        self.migrateWait = 600
+        
+        registry.describe("ows_sqlite_seconds", "histogram", "SQLite insert and query time in seconds by data layer call.")
+        
+        # Bring older databases up to date.
+        self.__upgradeSchema()
+        
+        # Pick up plugin sensor columns that were added before.
+        self.columnTypes = self.columnTypes + self.__getStoredSensorCols()
+        self.columns = [col[0] for col in self.columnTypes]
+    
+    def dtsToEpoch(self, dts):
+        """
+        dtsToEpoch(dts)
+        
+        Convert a datetime, or a string like the ones SQLite TIMESTAMP columns hold, to integer microseconds since the epoch. Integers and None are passed through. Returns an integer or None.
+        """
+        
+        if isinstance(dts, datetime.datetime):
+            return self.archive.dtsToEpoch(dts)
+        
+        if isinstance(dts, str):
+            return self.archive.dtsToEpoch(datetime.datetime.fromisoformat(dts))
+        
+        return dts
+    
+    def epochToDts(self, epoch):
+        """
+        epochToDts(epoch)
+        
+        Convert integer microseconds since the epoch to a datetime. None is passed through. Returns a datetime or None.
+        """
+        
+        if epoch is None:
+            return None
+        
+        return self.archive.epochToDts(epoch)
+    
+    def __getTableSql(self, table, colTypes):
+        """
+        __getTableSql(table, colTypes)
+        
+        Get the CREATE TABLE statement for a table with the given (name, type) columns. Tables whose first column is dts are keyed on it, except for events. Returns a string.
+        """
+        
+        colSql = []
+        
+        for colName, colType in colTypes:
+            sqlType = "INTEGER" if colType == "TIMESTAMP" else colType
+            colSql.append(colName + ' ' + sqlType + ('' if colName == "dts" else ' NOT NULL' if colType == "TEXT" else ''))
+        
+        # An INTEGER PRIMARY KEY is the rowid, so rows are stored in dts order with no separate index.
+        if table.startswith("events"):
+            colSql[0] = colSql[0] + ' NOT NULL'
+        else:
+            colSql[0] = colSql[0] + ' PRIMARY KEY'
+        
+        return 'CREATE TABLE IF NOT EXISTS ' + table + '(' + ', '.join(colSql) + ');'
+    
+    def __migrateTable(self, table, colTypes):
+        """
+        __migrateTable(table, colTypes)
+        
+        Copy a table from the original schema with TIMESTAMP text keys and NUMERIC columns into the current layout, then swap it into place. Rows are copied in small batches so we never hold the whole
+        table in memory. The caller holds the write lock for the whole migration, so other connections wait for it to finish, and an interrupted migration is rolled back. A copy left behind by an
+        older interrupted migration is copied over again. Returns the number of rows copied.
+        """
+        
+        retVal = 0
+        newTable = table + "Migrate"
+        lastRowid = 0
+        
+        try:
+            self.__db.execute(self.__getTableSql(newTable, colTypes))
+            
+            # Only copy columns the old table has.
+            self.__db.execute('PRAGMA table_info(' + table + ');')
+            haveCols = [row[1] for row in self.__db.fetchall()]
+            copyCols = [(colName, colType) for colName, colType in colTypes if colName in haveCols]
+            timestampIdx = [i for i in range(len(copyCols)) if copyCols[i][1] == "TIMESTAMP"]
+            
+            selectSql = "SELECT rowid, " + ', '.join([col[0] for col in copyCols]) + " FROM " + table + " WHERE rowid > ? ORDER BY rowid LIMIT ?;"
+            insertSql = "INSERT OR REPLACE INTO " + newTable + "(" + ', '.join([col[0] for col in copyCols]) + ") VALUES(" + ','.join(['?'] * len(copyCols)) + ");"
+            
+            while True:
+                self.__db.execute(selectSql, (lastRowid, self.__migrateChunk))
+                rows = self.__db.fetchall()
+                
+                if len(rows) == 0:
+                    break
+                
+                # Convert timestamp strings to epoch microseconds.
+                converted = []
+                
+                for row in rows:
+                    values = list(row[1:])
+                    
+                    for i in timestampIdx:
+                        values[i] = self.dtsToEpoch(values[i])
+                    
+                    converted.append(values)
+                
+                lastRowid = rows[-1][0]
+                
+                self.__db.executemany(insertSql, converted)
+                retVal = retVal + len(rows)
+            
+            # Swap the new table in. This commits with the rest of the upgrade.
+            self.__db.execute('DROP TABLE ' + table + ';')
+            self.__db.execute('ALTER TABLE ' + newTable + ' RENAME TO ' + table + ';')
+            
+        except Exception as e:
+            raise e
+        
+        return retVal
+    
+    def __upgradeSchema(self):
+        """
+        __upgradeSchema()
+        
+        Add tables and columns that didn't exist when a database was created, and migrate tables from the original schema to typed columns with epoch microsecond timestamps.
+        Everything happens with the database's write lock held, and the schema version is read once we have it, so when several processes open a database at once the first one
+        upgrades it and the rest wait and find it up to date. Raises sqlite3.OperationalError if another connection holds the lock for more than migrateWait seconds.
+        """
+        
+        try:
+            # Wait for the write lock. Each try waits for the connection's busy timeout, and a migration can take longer than that.
+            waitStart = time.monotonic()
+            
+            while True:
+                try:
+                    self.__db.execute('BEGIN IMMEDIATE;')
+                    break
+                
+                except sqlite3.OperationalError as e:
+                    if ("locked" not in str(e)) or (time.monotonic() - waitStart > self.migrateWait):
+                        raise e
+            
+            self.__db.execute('PRAGMA user_version;')
+            version = self.__db.fetchone()[0]
+            
+            # Tables we keep and their columns.
+            tables = [("weather", self.columnTypes), ("events", self.eventColTypes)]
+            
+            for table, period in self.__rollupTables.values():
+                tables.append((table, [col[:2] for col in self.rollupColTypes]))
+            
+            for table, colTypes in tables:
+                # Migrate tables that still have text timestamps.
+                if version < self.__schemaVersion:
+                    self.__db.execute('PRAGMA table_info(' + table + ');')
+                    haveTypes = dict([(row[1], row[2].upper()) for row in self.__db.fetchall()])
+                    
+                    if haveTypes.get("dts", "INTEGER") != "INTEGER":
+                        print("owsData: Migrating " + table + " to schema version " + str(self.__schemaVersion) + ".")
+                        print("owsData: Copied " + str(self.__migrateTable(table, colTypes)) + " " + table + " rows.")
+                
+                self.__db.execute(self.__getTableSql(table, colTypes))
+                
+                # Add any new columns the table is missing.
+                self.__db.execute('PRAGMA table_info(' + table + ');')
+                haveCols = [row[1] for row in self.__db.fetchall()]
+                
+                for colName, colType in colTypes:
+                    if colName not in haveCols:
+                        self.__db.execute('ALTER TABLE ' + table + ' ADD COLUMN ' + colName + ' ' + ("INTEGER" if colType == "TIMESTAMP" else colType) + ';')
+            
+            self.__db.execute('CREATE INDEX IF NOT EXISTS eventsSourceDts ON events(source, dts);')
+            
+            if version < self.__schemaVersion:
+                self.__db.execute('DROP TABLE IF EXISTS migrateProgress;')
+                self.__db.execute('PRAGMA user_version = ' + str(self.__schemaVersion) + ';')
+            
+            self.__dbConn.commit()
+            
+        except Exception as e:
+            # Don't leave the lock held, or a half done migration in place.
+            self.__dbConn.rollback()
+            raise e
     
-    def __getPast(self, endingPoint):
+    def __getStoredSensorCols(self):
+        """
+        __getStoredSensorCols()
+        
+        Get the weather table's columns that we don't know about, which hold plugin sensors' channels. Returns a list of (name, type) tuples in table order.
         """
-        __getPast(startingPoint, endingPoint)
         
-        Get data from the past stating at a date time stamp and ending with another.
+        try:
+            self.__db.execute('PRAGMA table_info(weather);')
+            
+            return [(row[1], row[2].upper()) for row in self.__db.fetchall() if row[1] not in self.columns]
+        
+        except Exception as e:
+            raise e
+    
+    def __getLiveRange(self, startEpoch, endEpoch):
+        """
+        __getLiveRange(startEpoch, endEpoch)
         
-        *** NOT YET IMPLEMENTED ***
+        Get records from the live database starting at startEpoch up to but not including endEpoch, skipping any that are in an archived month. Returns a list of tuples.
+        """
+        
+        try:
+            with registry.timer("ows_sqlite_seconds", {"op": "getLiveRange"}), tracer.span("getLiveRange", "sqlite"):
+                self.__db.execute("SELECT " + ', '.join(self.columns) + " FROM weather WHERE dts >= ? AND dts < ? ORDER BY dts;", (startEpoch, endEpoch))
+                rows = self.__db.fetchall()
+            
+        except Exception as e:
+            raise e
+        
+        # If archiving a month was interrupted its records can be in both places. The archive wins.
+        archived = [self.archive.getMonthRange(year, month) for year, month in self.archive.getMonths()]
+        
+        if len(archived) > 0:
+            rows = [row for row in rows if not any([(monthStart <= row[0] < monthEnd) for monthStart, monthEnd in archived])]
+        
+        return rows
+    
+    def getRange(self, startDts, endDts):
+        """
+        getRange(startDts, endDts)
+        
+        Get records starting at startDts up to but not including endDts from the archive and the live database. Records are in the same tuple order as getLastRecord(), sorted by dts. Returns a list of tuples.
+        """
+        
+        startEpoch = self.dtsToEpoch(startDts)
+        endEpoch = self.dtsToEpoch(endDts)
+        
+        # Archived months always come before live ones.
+        return self.archive.getRange(startEpoch, endEpoch, self.columnTypes) + self.__getLiveRange(startEpoch, endEpoch)
+    
+    def getNextRecords(self, startDts, count):
+        """
+        getNextRecords(startDts, count)
+        
+        Get up to count records starting at startDts from the archive and the live database, in the same tuple order as getLastRecord(), sorted by dts. Archived months are read one at a time
+        and the live database is read with a limit, so a long backlog never has to fit in memory. Returns a list of tuples.
+        """
+        
+        startEpoch = self.dtsToEpoch(startDts)
+        liveStart = startEpoch
+        
+        # Archived months always come before live ones, and a month with records after startEpoch has the next ones.
+        for year, month in self.archive.getMonths():
+            monthStart, monthEnd = self.archive.getMonthRange(year, month)
+            liveStart = max(liveStart, monthEnd)
+        
+            if monthEnd > startEpoch:
+                rows = self.archive.getRange(max(startEpoch, monthStart), monthEnd, self.columnTypes)
+        
+                if len(rows) > 0:
+                    return rows[:count]
+        
+        # Start the live records after the last archived month, since records left there by an interrupted archive run are already archived.
+        try:
+            with registry.timer("ows_sqlite_seconds", {"op": "getNextRecords"}), tracer.span("getNextRecords", "sqlite"):
+                self.__db.execute("SELECT " + ', '.join(self.columns) + " FROM weather WHERE dts >= ? ORDER BY dts LIMIT ?;", (liveStart, count))
+                rows = self.__db.fetchall()
+        
+        except Exception as e:
+            raise e
+        
+        return rows
+        
+    def getRangeColumns(self, startDts, endDts, columns = None):
+        """
+        getRangeColumns(startDts, endDts, [columns = None])
+        
+        Get columns of data starting at startDts up to but not including endDts from the archive and the live database. This is much faster than getRange() for analysis.
+        If columns is None all columns are returned. Missing values are NaN. Returns a dict of column name to a NumPy array (or a list without NumPy).
+        """
+        
+        if columns is None:
+            columns = self.columns
+        
+        startEpoch = self.dtsToEpoch(startDts)
+        endEpoch = self.dtsToEpoch(endDts)
+        
+        # Grab archived column data.
+        parts = self.archive.getRangeColumns(startEpoch, endEpoch, columns)
+        
+        # Turn the live records into columns.
+        liveRows = self.__getLiveRange(startEpoch, endEpoch)
+        liveCols = {"rowCount": len(liveRows)}
+        
+        for colName in columns:
+            idx = self.columns.index(colName)
+            liveCols[colName] = [float("nan") if row[idx] is None else row[idx] for row in liveRows]
+        
+        parts.append(liveCols)
+        
+        # Stitch the parts together.
+        retVal = {}
+        
+        for colName in columns:
+            colParts = []
+            
+            for part in parts:
+                if colName in part:
+                    colParts.append(part[colName])
+                else:
+                    colParts.append([float("nan")] * part['rowCount'])
+            
+            if np is not None:
+                # Integer columns from the archive use the smallest value to mark missing values, so make those NaN too
+                # unless this is dts, which is never missing and needs every bit.
+                # Leave out empty parts so they don't turn integer columns into floats.
+                colParts = [np.asarray(part) for part in colParts if len(part) > 0]
+                
+                if colName != "dts":
+                    colParts = [np.where(part == np.iinfo(part.dtype).min, np.nan, part) if part.dtype.kind == "i" else part for part in colParts]
+                
+                retVal[colName] = np.concatenate(colParts) if len(colParts) > 0 else np.array([])
+            else:
+                retVal[colName] = [v for part in colParts for v in part]
+        
+        return retVal
+    
+    def archiveMonth(self, year, month):
+        """
+        archiveMonth(year, month)
+        
+        Move a month of records from the live database to the archive. If the month was already archived the records are merged. Returns the number of records moved.
+        """
+        
+        monthStart, monthEnd = self.archive.getMonthRange(year, month)
+        
+        try:
+            self.__db.execute("SELECT " + ', '.join(self.columns) + " FROM weather WHERE dts >= ? AND dts < ? ORDER BY dts;", (monthStart, monthEnd))
+            rows = self.__db.fetchall()
+            
+        except Exception as e:
+            raise e
+        
+        if len(rows) == 0:
+            return 0
+        
+        # Merge in anything we already archived for the month. If we were interrupted after writing the archive last time the live rows are still here too,
+        # so the archived copy of a record wins and nothing is stored twice.
+        if (year, month) in self.archive.getMonths():
+            archived = self.archive.getRange(monthStart, monthEnd, self.columnTypes)
+            archivedDts = set([row[0] for row in archived])
+            rows = sorted(archived + [row for row in rows if row[0] not in archivedDts], key = lambda row: row[0])
+        
+        # Write the archive first, so if we're interrupted the records are in both places rather than neither.
+        self.archive.writeMonth(year, month, self.columnTypes, rows)
+        
+        try:
+            self.__db.execute("DELETE FROM weather WHERE dts >= ? AND dts < ?;", (monthStart, monthEnd))
+            moved = self.__db.rowcount
+            self.__dbConn.commit()
+            
+        except Exception as e:
+            raise e
+        
+        return moved
+    
+    def archiveClosedMonths(self, now = None):
+        """
+        archiveClosedMonths([now = None])
+        
+        Archive every month with records in the live database that ended before the month now (a datetime) is in. If now is None the current UTC time is used. Returns the number of records moved.
+        """
+        
+        if now is None:
+            now = datetime.datetime.utcnow()
+        
+        thisMonth = self.archive.getMonthRange(now.year, now.month)[0]
+        
+        try:
+            # Find the oldest record that's in a closed month.
+            self.__db.execute("SELECT dts FROM weather WHERE dts < ? ORDER BY dts LIMIT 1;", (thisMonth,))
+            oldest = self.__db.fetchone()
+            
+        except Exception as e:
+            raise e
+        
+        moved = 0
+        
+        # Walk each month up to this one.
+        if oldest is not None:
+            oldest = self.epochToDts(oldest[0])
+            year = oldest.year
+            month = oldest.month
+            
+            while self.archive.getMonthRange(year, month)[0] < thisMonth:
+                moved = moved + self.archiveMonth(year, month)
+                
+                year = year + (month // 12)
+                month = (month % 12) + 1
+        
+        return moved
+    
+    def __getDerivedRows(self, derived, rows):
+        """
+        __getDerivedRows(derived, rows)
+        
+        Compute derived values for weather records with an owsDerived object, in bulk if we have NumPy. Returns a list with a list of derived values for each record, in derived.columns order.
+        """
+        
+        srcIdx = [self.columns.index(colName) for colName in ["temp", "humid", "baro", "windAvg", "windDir"]]
+        
+        if np is None:
+            return [derived.getDerived(*[row[i] for i in srcIdx]) for row in rows]
+        
+        # Build input columns with NaN for missing values, and turn the results back into None.
+        inputs = [np.array([float("nan") if row[i] is None else row[i] for row in rows], dtype = np.float64) for i in srcIdx]
+        derivedCols = derived.getDerivedColumns(*inputs)
+        
+        converted = []
+        
+        for colName in derived.columns:
+            if colName == "windDirCrd":
+                converted.append([None if v < 0 else v for v in derivedCols[colName].tolist()])
+            else:
+                converted.append([None if v != v else v for v in derivedCols[colName].tolist()])
+        
+        return [list(values) for values in zip(*converted)]
+    
+    def backfillDerived(self, derived, chunkSize = 5000):
+        """
+        backfillDerived(derived, [chunkSize = 5000])
+        
+        Compute derived values with an owsDerived object for records stored without them. Live records are updated in chunks of chunkSize, each in its own transaction,
+        and archived months written before the derived columns existed are rewritten with them. Returns the number of records updated.
+        """
+        
+        retVal = 0
+        
+        derivedIdx = [self.columns.index(colName) for colName in derived.columns]
+        missingSql = ' AND '.join([colName + ' IS NULL' for colName in derived.columns])
+        updateSql = 'UPDATE weather SET ' + ', '.join([colName + ' = ?' for colName in derived.columns]) + ' WHERE dts = ?;'
+        
+        # Walk the live records that don't have derived values yet.
+        lastEpoch = -1
+        
+        while True:
+            try:
+                self.__db.execute("SELECT " + ', '.join(self.columns) + " FROM weather WHERE dts > ? AND " + missingSql + " ORDER BY dts LIMIT ?;", (lastEpoch, chunkSize))
+                rows = self.__db.fetchall()
+                
+                if len(rows) == 0:
+                    break
+                
+                self.__db.executemany(updateSql, [values + [row[0]] for values, row in zip(self.__getDerivedRows(derived, rows), rows)])
+                self.__dbConn.commit()
+                
+            except Exception as e:
+                raise e
+            
+            retVal = retVal + len(rows)
+            lastEpoch = rows[-1][0]
+        
+        # Rewrite archived months that don't have derived columns.
+        for year, month in self.archive.getMonths():
+            if derived.columns[-1] in self.archive.readMonth(year, month, [derived.columns[-1]]):
+                continue
+            
+            monthStart, monthEnd = self.archive.getMonthRange(year, month)
+            rows = [list(row) for row in self.archive.getRange(monthStart, monthEnd, self.columnTypes)]
+            
+            for row, values in zip(rows, self.__getDerivedRows(derived, rows)):
+                for i, value in zip(derivedIdx, values):
+                    row[i] = value
+            
+            self.archive.writeMonth(year, month, self.columnTypes, rows)
+            retVal = retVal + len(rows)
+        
+        return retVal
+    
+    def __floorEpoch(self, epoch, period):
+        """
+        __floorEpoch(epoch, period)
+        
+        Get the start of the hour or day (period is "hourly" or "daily") a timestamp is in. Returns an integer.
+        """
+        
+        return epoch - (epoch % self.__rollupTables[period][1])
+    
+    def __getFirstEpoch(self, afterEpoch = None):
+        """
+        __getFirstEpoch([afterEpoch = None])
+        
+        Find the first record at or after afterEpoch in the archive or the live database. If afterEpoch is None find the first record we have. Returns a timestamp, or None if there aren't any records.
         """
         
         retVal = None
         
+        # Look through the archive first since it holds the oldest records.
+        for year, month in self.archive.getMonths():
+            monthStart, monthEnd = self.archive.getMonthRange(year, month)
+            
+            if (afterEpoch is not None) and (monthEnd <= afterEpoch):
+                continue
+            
+            for part in self.archive.getRangeColumns(monthStart if afterEpoch is None else max(monthStart, afterEpoch), monthEnd, ["dts"]):
+                retVal = int(part['dts'][0])
+                break
+            
+            if retVal is not None:
+                break
+        
+        try:
+            if afterEpoch is None:
+                self.__db.execute("SELECT dts FROM weather ORDER BY dts LIMIT 1;")
+            else:
+                self.__db.execute("SELECT dts FROM weather WHERE dts >= ? ORDER BY dts LIMIT 1;", (afterEpoch,))
+            
+            row = self.__db.fetchone()
+            
+        except Exception as e:
+            raise e
+        
+        if (row is not None) and ((retVal is None) or (row[0] < retVal)):
+            retVal = row[0]
+        
+        return retVal
+    
+    def __getNextRollup(self, period):
+        """
+        __getNextRollup(period)
+        
+        Get the start of the next hour or day (period is "hourly" or "daily") that needs to be rolled up. Returns a timestamp, or None if nothing has been rolled up yet.
+        """
+        
+        table, length = self.__rollupTables[period]
+        
+        try:
+            self.__db.execute("SELECT dts FROM " + table + " ORDER BY dts DESC LIMIT 1;")
+            row = self.__db.fetchone()
+            
+        except Exception as e:
+            raise e
+        
+        if row is None:
+            return None
+        
+        return row[0] + length
+    
+    def __summarize(self, periodEpoch, rows):
+        """
+        __summarize(periodEpoch, rows)
+        
+        Summarize weather records into a rollup record for the period starting at periodEpoch. Returns a tuple in rollupColumns order.
+        """
+        
+        retVal = [periodEpoch]
+        
+        for colName, colType, srcCol, func in self.rollupColTypes[1:]:
+            if func == "count":
+                retVal.append(len(rows))
+                continue
+            
+            idx = self.columns.index(srcCol)
+            vals = [row[idx] for row in rows if row[idx] is not None]
+            
+            if len(vals) == 0:
+                retVal.append(None)
+            elif func == "avg":
+                retVal.append(round(sum(vals) / len(vals), 2))
+            elif func == "min":
+                retVal.append(min(vals))
+            elif func == "max":
+                retVal.append(max(vals))
+            elif func == "sum":
+                retVal.append(sum(vals))
+            elif func == "or":
+                orVal = 0
+                
+                for val in vals:
+                    orVal = orVal | int(val)
+                
+                retVal.append(orVal)
+            elif func == "dir":
+                # Average directions as vectors so we don't have problems around north.
+                dirX = sum([math.sin(math.radians(val)) for val in vals])
+                dirY = sum([math.cos(math.radians(val)) for val in vals])
+                retVal.append(round(math.degrees(math.atan2(dirX, dirY)) % 360.0, 1))
+        
+        return tuple(retVal)
+    
+    def rollup(self, now = None):
+        """
+        rollup([now = None])
+        
+        Summarize every complete hour and day that hasn't been rolled up yet into the weatherHourly and weatherDaily tables, reading from the archive and the live database.
+        Each day is written in its own transaction. If now is None the current UTC time is used. Returns a list with the number of hourly [0] and daily [1] records written.
+        """
+        
+        retVal = [0, 0]
+        
+        if now is None:
+            now = datetime.datetime.utcnow()
+        
+        # Only complete periods get rolled up.
+        now = self.dtsToEpoch(now)
+        hourEnd = self.__floorEpoch(now, "hourly")
+        dayEnd = self.__floorEpoch(now, "daily")
+        
+        # Figure out where each rollup left off. If we've never rolled up start from the first record.
+        firstEpoch = self.__getFirstEpoch()
+        
+        if firstEpoch is None:
+            return retVal
+        
+        nextHour = self.__getNextRollup("hourly")
+        nextDay = self.__getNextRollup("daily")
+        
+        if nextHour is None:
+            nextHour = self.__floorEpoch(firstEpoch, "hourly")
+        
+        if nextDay is None:
+            nextDay = self.__floorEpoch(firstEpoch, "daily")
+        
+        # Skip over any gap in the records.
+        startEpoch = self.__getFirstEpoch(min(nextHour, nextDay))
+        
+        if startEpoch is None:
+            return retVal
+        
+        day = self.__floorEpoch(startEpoch, "daily")
+        
+        while day < hourEnd:
+            dayStop = day + self.__rollupTables['daily'][1]
+            rows = self.getRange(day, min(dayStop, hourEnd))
+            
+            # Nothing here, so jump to the next day with records.
+            if len(rows) == 0:
+                startEpoch = self.__getFirstEpoch(dayStop)
+                
+                if startEpoch is None:
+                    break
+                
+                day = self.__floorEpoch(startEpoch, "daily")
+                continue
+            
+            # Group the records by hour.
+            hours = {}
+            
+            for row in rows:
+                hours.setdefault(self.__floorEpoch(row[0], "hourly"), []).append(row)
+            
+            hourly = [self.__summarize(hour, hours[hour]) for hour in sorted(hours) if hour >= nextHour]
+            
+            daily = []
+            
+            if (day >= nextDay) and (dayStop <= dayEnd):
+                daily.append(self.__summarize(day, rows))
+            
+            try:
+                for table, records in [(self.__rollupTables['hourly'][0], hourly), (self.__rollupTables['daily'][0], daily)]:
+                    if len(records) > 0:
+                        self.__db.executemany('INSERT OR REPLACE INTO ' + table + '(' + ', '.join(self.rollupColumns) + ') VALUES(' + ','.join(['?'] * len(self.rollupColumns)) + ');', records)
+                
+                self.__dbConn.commit()
+                
+            except Exception as e:
+                raise e
+            
+            retVal[0] = retVal[0] + len(hourly)
+            retVal[1] = retVal[1] + len(daily)
+            
+            day = dayStop
+        
+        return retVal
+    
+    def getRollupRange(self, period, startDts, endDts):
+        """
+        getRollupRange(period, startDts, endDts)
+        
+        Get hourly or daily (period is "hourly" or "daily") rollup records starting at startDts up to but not including endDts, sorted by dts. Records are tuples in rollupColumns order. Returns a list of tuples.
+        """
+        
+        try:
+            with registry.timer("ows_sqlite_seconds", {"op": "getRollupRange"}), tracer.span("getRollupRange", "sqlite"):
+                self.__db.execute("SELECT " + ', '.join(self.rollupColumns) + " FROM " + self.__rollupTables[period][0] + " WHERE dts >= ? AND dts < ? ORDER BY dts;", \
+                    (self.dtsToEpoch(startDts), self.dtsToEpoch(endDts)))
+                
+                return self.__db.fetchall()
+            
+        except Exception as e:
+            raise e
+    
+    def __deleteBefore(self, table, cutoffEpoch):
+        """
+        __deleteBefore(table, cutoffEpoch)
+        
+        Delete records older than cutoffEpoch from a table oldest first, in small transactions so readers never wait long. Returns the number of records deleted.
+        """
+        
+        retVal = 0
+        
+        while True:
+            try:
+                self.__db.execute("DELETE FROM " + table + " WHERE dts IN (SELECT dts FROM " + table + " WHERE dts < ? ORDER BY dts LIMIT ?);", (cutoffEpoch, self.__deleteChunk))
+                deleted = self.__db.rowcount
+                self.__dbConn.commit()
+                
+            except Exception as e:
+                raise e
+            
+            retVal = retVal + deleted
+            
+            if deleted < self.__deleteChunk:
+                break
+        
+        return retVal
+    
+    def applyRetention(self, now = None):
+        """
+        applyRetention([now = None])
+        
+        Roll up complete hours and days, then drop data that's older than the retention policy allows. Raw records are only dropped once they've been rolled up, and records from the current month
+        are kept so archiveClosedMonths() can archive the whole month once it closes. Archived months have their own retention and are dropped once the whole month has expired.
+        If now is None the current UTC time is used. Returns a dict with the number of hourly and daily records rolled up ("hourlyRolled", "dailyRolled"), records deleted from each table ("rawDeleted", "hourlyDeleted", "dailyDeleted"), and archived months deleted ("monthsDeleted").
+        """
+        
+        if now is None:
+            now = datetime.datetime.utcnow()
+        
+        retVal = {"rawDeleted": 0, "hourlyDeleted": 0, "dailyDeleted": 0, "monthsDeleted": 0}
+        retVal['hourlyRolled'], retVal['dailyRolled'] = self.rollup(now)
+        
+        now = self.dtsToEpoch(now)
+        dayLen = self.__rollupTables['daily'][1]
+        
+        # Never drop raw records that haven't made it into a rollup.
+        nextRollups = [self.__getNextRollup(period) for period in self.__rollupTables]
+        
+        if (self.retention['raw'] is not None) and (None not in nextRollups):
+            nowDts = self.epochToDts(now)
+            cutoff = min([now - (self.retention['raw'] * dayLen), self.archive.getMonthRange(nowDts.year, nowDts.month)[0]] + nextRollups)
+            
+            retVal['rawDeleted'] = self.__deleteBefore("weather", cutoff)
+        
+        if (self.retention['archive'] is not None) and (None not in nextRollups):
+            cutoff = min([now - (self.retention['archive'] * dayLen)] + nextRollups)
+            
+            for year, month in self.archive.getMonths():
+                if self.archive.getMonthRange(year, month)[1] <= cutoff:
+                    if self.archive.removeMonth(year, month):
+                        retVal['monthsDeleted'] = retVal['monthsDeleted'] + 1
+        
+        for period in self.__rollupTables:
+            if self.retention[period] is not None:
+                retVal[period + "Deleted"] = self.__deleteBefore(self.__rollupTables[period][0], now - (self.retention[period] * dayLen))
+        
         return retVal
     
+    def vacuum(self, maxPages = None):
+        """
+        vacuum([maxPages = None])
+        
+        Give space freed by deleted records back to the filesystem. The first time this runs on a database that isn't set up for incremental vacuuming it's converted with a full VACUUM, after that only free pages are released.
+        maxPages limits how many pages are released at once. None releases all of them. Returns a dict with the page size ("pageSize"), the number of pages before ("pagesBefore") and after ("pagesAfter"), and the bytes reclaimed ("reclaimed").
+        """
+        
+        try:
+            # Don't try to vacuum in the middle of a transaction.
+            self.__dbConn.commit()
+            
+            self.__db.execute('PRAGMA page_size;')
+            pageSize = self.__db.fetchone()[0]
+            self.__db.execute('PRAGMA page_count;')
+            pagesBefore = self.__db.fetchone()[0]
+            self.__db.execute('PRAGMA auto_vacuum;')
+            autoVacuum = self.__db.fetchone()[0]
+            
+            if autoVacuum != 2:
+                # Switch to incremental mode. This only takes effect after a full VACUUM.
+                self.__db.execute('PRAGMA auto_vacuum = INCREMENTAL;')
+                self.__db.execute('VACUUM;')
+            else:
+                # incremental_vacuum releases a page each time it's stepped, and executescript() steps it until it's done.
+                self.__dbConn.executescript('PRAGMA incremental_vacuum' + ('' if maxPages is None else '(' + str(int(maxPages)) + ')') + ';')
+            
+            self.__dbConn.commit()
+            
+            self.__db.execute('PRAGMA page_count;')
+            pagesAfter = self.__db.fetchone()[0]
+            
+        except Exception as e:
+            raise e
+        
+        return {"pageSize": pageSize, "pagesBefore": pagesBefore, "pagesAfter": pagesAfter, "reclaimed": (pagesBefore - pagesAfter) * pageSize}
+    
+    def __getInsertSql(self, valueCt):
+        """
+        __getInsertSql(valueCt)
+        
+        Get the INSERT statement for a record with a given number of values. Returns a string.
+        """
+        
+        # Build the statement once for each record length we see.
+        if valueCt not in self.__insertSql:
+            if (valueCt < 1) or (valueCt > len(self.columns)):
+                raise ValueError("owsData: Records must have between 1 and " + str(len(self.columns)) + " values.")
+            
+            self.__insertSql[valueCt] = 'INSERT INTO weather(' + ', '.join(self.columns[:valueCt]) + ') VALUES(' + ','.join(['?'] * valueCt) + ');'
+        
+        return self.__insertSql[valueCt]
+    
     def addRecord(self, values):
         """
         addRecord(values)
         
         Add a record to the database containing the information in values. Values should be a tuple containing the following elements:
         
-        ("dts", "temp", "humid", "baro", "rain", "windDir", "windAvg", "windMax", "lightLvl", "sysTemp")
+        ("dts", "temp", "humid", "baro", "rain", "windDir", "windAvg", "windMax", "lightLvl", "sysTemp", "quality", "rainDelta", "rainCpm", "rainRate", "windGust", "windGustDts", "windAvg2m", "windAvg10m", "dewpoint", "heatIndex", "windChill", "seaLevelBaro", "windDirCrd")
         
-        Null values for any of these keys, except dts are acceptable.
+        Null values for any of these keys, except dts are acceptable. Trailing values can be left off the tuple, in which case they're null. Timestamps can be datetimes or epoch microseconds.
         """
         
+        # Store timestamps as epoch microseconds.
+        values = list(values)
+        
+        for i in self.__timestampIdx:
+            if i < len(values):
+                values[i] = self.dtsToEpoch(values[i])
+        
         try:
-            self.__db.execute('INSERT INTO weather(dts, temp, humid, baro, rain, windDir, windAvg, windMax, lightLvl, sysTemp) VALUES(?,?,?,?,?,?,?,?,?,?);', values)
-            self.__dbConn.commit()
+            with registry.timer("ows_sqlite_seconds", {"op": "addRecord"}), tracer.span("addRecord", "sqlite"):
+                self.__db.execute(self.__getInsertSql(len(values)), values)
+                
+                with tracer.span("commit", "sqlite"):
+                    self.__dbConn.commit()
             
         except Exception as e:
             raise e
     
+    def addRecords(self, records):
+        """
+        addRecords(records)
+        
+        Add several records to the database in one transaction, which is much faster than calling addRecord() for each of them. Each record is a tuple like the ones addRecord() takes,
+        and records can have different numbers of values. If any record can't be added none of them are. Returns the number of records added.
+        """
+        
+        # Store timestamps as epoch microseconds, and group records by length so each group shares an INSERT statement.
+        byLength = {}
+        
+        for values in records:
+            values = list(values)
+            
+            for i in self.__timestampIdx:
+                if i < len(values):
+                    values[i] = self.dtsToEpoch(values[i])
+            
+            byLength.setdefault(len(values), []).append(values)
+        
+        try:
+            with registry.timer("ows_sqlite_seconds", {"op": "addRecords"}), tracer.span("addRecords", "sqlite"):
+                for valueCt, rows in byLength.items():
+                    self.__db.executemany(self.__getInsertSql(valueCt), rows)
+                
+                with tracer.span("commit", "sqlite"):
+                    self.__dbConn.commit()
+            
+        except Exception as e:
+            self.__dbConn.rollback()
+            raise e
+        
+        return sum([len(rows) for rows in byLength.values()])
+    
+    def beginRead(self):
+        """
+        beginRead()
+        
+        Start a read snapshot. Everything read from the live database until endRead() sees the same data, even if the scanner adds records in between. The database uses write-ahead logging,
+        so the scanner can keep adding records while a snapshot is open. Don't write until endRead().
+        """
+        
+        try:
+            self.__db.execute('BEGIN;')
+        
+        except Exception as e:
+            raise e
+    
+    def endRead(self):
+        """
+        endRead()
+        
+        End a read snapshot started with beginRead().
+        """
+        
+        try:
+            self.__dbConn.commit()
+        
+        except Exception as e:
+            raise e
+    
     def getLastRecord(self):
         """
         getLastRecord()
         
         Pull the latest record from the database in the following tuple order:
         
-        ("dts", "temp", "humid", "baro", "rain", "windDir", "windAvg", "windMax", "lightLvl", "sysTemp")
+        ("dts", "temp", "humid", "baro", "rain", "windDir", "windAvg", "windMax", "lightLvl", "sysTemp", "quality", "rainDelta", "rainCpm", "rainRate", "windGust", "windGustDts", "windAvg2m", "windAvg10m", "dewpoint", "heatIndex", "windChill", "seaLevelBaro", "windDirCrd")
         
-        Any value except dts can be null.
+        Any value except dts can be null. Timestamps are epoch microseconds. Right after the live table's months are archived the latest record comes from the archive.
+        Returns None if there are no records at all.
         """
         
         try:
-            # Pull the most recent data point.
-            self.__db.execute("SELECT * FROM weather WHERE dts = (SELECT MAX(dts) FROM weather);")
+            with registry.timer("ows_sqlite_seconds", {"op": "getLastRecord"}), tracer.span("getLastRecord", "sqlite"):
+                # Pull the most recent data point.
+                self.__db.execute("SELECT " + ', '.join(self.columns) + " FROM weather ORDER BY dts DESC LIMIT 1;")
+                
+                retVal = self.__db.fetchone()
             
-            return self.__db.fetchone()
+        except Exception as e:
+            raise e
+        
+        # The newest archived month has the latest record until the scanner stores a new one.
+        if retVal is None:
+            for year, month in reversed(self.archive.getMonths()):
+                monthStart, monthEnd = self.archive.getMonthRange(year, month)
+                rows = self.archive.getRange(monthStart, monthEnd, self.columnTypes)
+                
+                if len(rows) > 0:
+                    return rows[-1]
+        
+        return retVal
+    
+    def addEvent(self, values):
+        """
+        addEvent(values)
+        
+        Add an event such as a sensor alert to the database. Values should be a tuple containing the following elements:
+        
+        ("dts", "source", "event", "value")
+        
+        The value can be null. dts can be a datetime or epoch microseconds.
+        """
+        
+        try:
+            with registry.timer("ows_sqlite_seconds", {"op": "addEvent"}), tracer.span("addEvent", "sqlite"):
+                self.__db.execute('INSERT INTO events(dts, source, event, value) VALUES(?,?,?,?);', (self.dtsToEpoch(values[0]),) + tuple(values[1:]))
+                self.__dbConn.commit()
+            
+        except Exception as e:
+            raise e
+    
+    def getLastEvent(self, source):
+        """
+        getLastEvent(source)
+        
+        Pull the latest event for a given source from the database in the following tuple order:
+        
+        ("dts", "source", "event", "value")
+        
+        dts is in epoch microseconds. Returns None if the source has never logged an event.
+        """
+        
+        try:
+            with registry.timer("ows_sqlite_seconds", {"op": "getLastEvent"}), tracer.span("getLastEvent", "sqlite"):
+                # Pull the most recent event for the source.
+                self.__db.execute("SELECT dts, source, event, value FROM events WHERE source = ? ORDER BY dts DESC LIMIT 1;", (source,))
+                
+                return self.__db.fetchone()
             
         except Exception as e:
             raise e
-    
\ No newline at end of file
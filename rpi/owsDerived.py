@@ -0,0 +1,202 @@
+# OpenWeatherStn derived weather metrics by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+# Scalar math
+import math
+
+# Compass point lookup
+from owsCompass import owsCompass
+
+# NumPy lets us compute whole columns of history at once.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+####################
+# owsDerived class #
+####################
+
+class owsDerived:
+    """
+    owsDerived - computes metrics derived from raw measurements once, when a record is stored, so nothing has to recompute them when records are read. Every metric has a scalar form
+    for single records and a NumPy form for backfilling history. The derived metrics are dew point (C), heat index (C), wind chill (C), sea-level pressure (kPa), and cardinal wind direction,
+    which is stored as an index into cardinalNames. The constructor accepts one optional argument:
+    
+    elevation: the station's elevation in meters, used to reduce barometric pressure to sea level. Defaults to 0.
+    """
+    
+    def __init__(self, elevation = 0.0):
+        # Station elevation in meters.
+        self.elevation = elevation
+        
+        # Derived columns in the order getDerived() returns them, and their types.
+        self.columnTypes = [("dewpoint", "REAL"), ("heatIndex", "REAL"), ("windChill", "REAL"), ("seaLevelBaro", "REAL"), ("windDirCrd", "INTEGER")]
+        self.columns = [col[0] for col in self.columnTypes]
+        
+        # Cardinal directions are stored as 8 point compass indices.
+        self.compass = owsCompass(8)
+        self.cardinalNames = self.compass.names
+        
+        # Magnus formula coefficients for dew point.
+        self.__magnusB = 17.625
+        self.__magnusC = 243.04
+        
+        # Heat index only applies at or above this temperature (F), and wind chill at or below this temperature (C) and above this wind speed (kph).
+        self.__heatIndexMin = 80.0
+        self.__windChillMaxTemp = 10.0
+        self.__windChillMinWind = 4.8
+    
+    def getDewpoint(self, temp, rh):
+        """
+        getDewpoint(temp, rh)
+        
+        Estimates the dew point given a temperature in degrees celsius and relative humidity as a percentage. Returns a float representing dew point in degrees celsius rounded to one decimal point, or None if it can't be computed.
+        """
+        
+        if (temp is None) or (rh is None) or (rh <= 0):
+            return None
+        
+        gamma = math.log(rh / 100.0) + ((self.__magnusB * temp) / (self.__magnusC + temp))
+        
+        return round(self.__magnusC * gamma / (self.__magnusB - gamma), 1)
+    
+    def getHeatIndex(self, temp, rh):
+        """
+        getHeatIndex(temp, rh)
+        
+        Compute the NWS heat index given a temperature in degrees celsius and relative humidity as a percentage. Below 80 F this is Steadman's simple estimate, which stays close to the temperature.
+        Returns a float in degrees celsius rounded to one decimal point, or None if it can't be computed.
+        """
+        
+        if (temp is None) or (rh is None):
+            return None
+        
+        tempF = (temp * 9.0 / 5.0) + 32.0
+        
+        # Start with the simple formula, and only use the full regression if it's hot enough to matter.
+        heatIndex = 0.5 * (tempF + 61.0 + ((tempF - 68.0) * 1.2) + (rh * 0.094))
+        
+        if ((heatIndex + tempF) / 2.0) >= self.__heatIndexMin:
+            heatIndex = -42.379 + (2.04901523 * tempF) + (10.14333127 * rh) - (0.22475541 * tempF * rh) - (0.00683783 * tempF * tempF) - (0.05481717 * rh * rh) + \
+                (0.00122874 * tempF * tempF * rh) + (0.00085282 * tempF * rh * rh) - (0.00000199 * tempF * tempF * rh * rh)
+            
+            # Adjust for very dry and very humid air.
+            if (rh < 13.0) and (80.0 <= tempF <= 112.0):
+                heatIndex = heatIndex - (((13.0 - rh) / 4.0) * math.sqrt((17.0 - abs(tempF - 95.0)) / 17.0))
+            elif (rh > 85.0) and (80.0 <= tempF <= 87.0):
+                heatIndex = heatIndex + (((rh - 85.0) / 10.0) * ((87.0 - tempF) / 5.0))
+        
+        return round((heatIndex - 32.0) * 5.0 / 9.0, 1)
+    
+    def getWindChill(self, temp, windSpd):
+        """
+        getWindChill(temp, windSpd)
+        
+        Compute the wind chill given a temperature in degrees celsius and wind speed in kph. Wind chill is only defined at or below 10 C with wind above 4.8 kph.
+        Returns a float in degrees celsius rounded to one decimal point, or None if it isn't defined.
+        """
+        
+        if (temp is None) or (windSpd is None) or (temp > self.__windChillMaxTemp) or (windSpd <= self.__windChillMinWind):
+            return None
+        
+        windFactor = windSpd ** 0.16
+        
+        return round(13.12 + (0.6215 * temp) - (11.37 * windFactor) + (0.3965 * temp * windFactor), 1)
+    
+    def getSeaLevelBaro(self, baro, temp):
+        """
+        getSeaLevelBaro(baro, temp)
+        
+        Reduce station pressure in kPa to sea level using the station's elevation and the temperature in degrees celsius. Returns a float in kPa rounded to three decimal places, or None if it can't be computed.
+        """
+        
+        if (baro is None) or (temp is None):
+            return None
+        
+        lapse = 0.0065 * self.elevation
+        
+        return round(baro * ((1.0 - (lapse / (temp + lapse + 273.15))) ** -5.257), 3)
+    
+    def getCardinalIdx(self, heading):
+        """
+        getCardinalIdx(heading)
+        
+        Get the cardinal direction of a heading as an index into cardinalNames. Returns an integer, or None if heading is None.
+        """
+        
+        return self.compass.getIdx(heading)
+    
+    def getCardinalName(self, idx):
+        """
+        getCardinalName(idx)
+        
+        Get the name of a cardinal direction index. Returns a string with directional information (N, NE, S, SW, etc.), or None if idx is None.
+        """
+        
+        if idx is None:
+            return None
+        
+        return self.cardinalNames[idx]
+    
+    def getDerived(self, temp, humid, baro, windSpd, windDir):
+        """
+        getDerived(temp, humid, baro, windSpd, windDir)
+        
+        Compute every derived metric for one record given temperature (C), humidity (%RH), station pressure (kPa), wind speed (kph), and wind direction (degrees). Any of these can be None.
+        Returns a list in columns order: dew point [0], heat index [1], wind chill [2], sea-level pressure [3], and cardinal direction index [4].
+        """
+        
+        return [self.getDewpoint(temp, humid), self.getHeatIndex(temp, humid), self.getWindChill(temp, windSpd), self.getSeaLevelBaro(baro, temp), self.getCardinalIdx(windDir)]
+    
+    def getDerivedColumns(self, temp, humid, baro, windSpd, windDir):
+        """
+        getDerivedColumns(temp, humid, baro, windSpd, windDir)
+        
+        Vectorized getDerived() for backfilling history. Takes NumPy arrays (or sequences) of equal length with NaN for missing values. Returns a dict of derived column name to NumPy array,
+        where missing values are NaN, and windDirCrd is -1 where there's no direction.
+        """
+        
+        if np is None:
+            raise RuntimeError("owsDerived: NumPy is required for getDerivedColumns().")
+        
+        temp = np.asarray(temp, dtype = np.float64)
+        humid = np.asarray(humid, dtype = np.float64)
+        baro = np.asarray(baro, dtype = np.float64)
+        windSpd = np.asarray(windSpd, dtype = np.float64)
+        windDir = np.asarray(windDir, dtype = np.float64)
+        
+        retVal = {}
+        
+        # Invalid inputs turn into NaN on their own, so don't warn about them.
+        with np.errstate(invalid = "ignore", divide = "ignore"):
+            # Dew point
+            gamma = np.log(np.where(humid > 0, humid, np.nan) / 100.0) + ((self.__magnusB * temp) / (self.__magnusC + temp))
+            retVal['dewpoint'] = np.round(self.__magnusC * gamma / (self.__magnusB - gamma), 1)
+            
+            # Heat index
+            tempF = (temp * 9.0 / 5.0) + 32.0
+            simple = 0.5 * (tempF + 61.0 + ((tempF - 68.0) * 1.2) + (humid * 0.094))
+            full = -42.379 + (2.04901523 * tempF) + (10.14333127 * humid) - (0.22475541 * tempF * humid) - (0.00683783 * tempF * tempF) - (0.05481717 * humid * humid) + \
+                (0.00122874 * tempF * tempF * humid) + (0.00085282 * tempF * humid * humid) - (0.00000199 * tempF * tempF * humid * humid)
+            full = np.where((humid < 13.0) & (tempF >= 80.0) & (tempF <= 112.0), full - (((13.0 - humid) / 4.0) * np.sqrt((17.0 - np.abs(tempF - 95.0)) / 17.0)), full)
+            full = np.where((humid > 85.0) & (tempF >= 80.0) & (tempF <= 87.0), full + (((humid - 85.0) / 10.0) * ((87.0 - tempF) / 5.0)), full)
+            heatIndex = np.where(((simple + tempF) / 2.0) >= self.__heatIndexMin, full, simple)
+            retVal['heatIndex'] = np.round((heatIndex - 32.0) * 5.0 / 9.0, 1)
+            
+            # Wind chill
+            windFactor = windSpd ** 0.16
+            windChill = 13.12 + (0.6215 * temp) - (11.37 * windFactor) + (0.3965 * temp * windFactor)
+            retVal['windChill'] = np.round(np.where((temp <= self.__windChillMaxTemp) & (windSpd > self.__windChillMinWind), windChill, np.nan), 1)
+            
+            # Sea-level pressure
+            lapse = 0.0065 * self.elevation
+            retVal['seaLevelBaro'] = np.round(baro * ((1.0 - (lapse / (temp + lapse + 273.15))) ** -5.257), 3)
+            
+            # Cardinal direction
+            retVal['windDirCrd'] = self.compass.getIdxArray(windDir)
+        
+        return retVal
@@ -0,0 +1,296 @@
+# OpenWeatherStn response encoder by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import math
+import numbers
+import struct
+
+# C string escaping from the JSON library
+from json.encoder import encode_basestring_ascii
+
+####################
+# owsEncoder class #
+####################
+
+class owsEncoder:
+    """
+    owsEncoder - encodes weather records as JSON, MessagePack, or CBOR without rebuilding the parts that never change. Records are dicts like the ones weatherService builds, where each field is
+    a dict with a display name, value, and unit. The bytes that go around each value (the field name, display name, and unit) are encoded the first time a field is seen with that name and unit,
+    so encoding a record only encodes the values. Records can be encoded in the full schema, which keeps the display names and units, or the compact schema, which only has values.
+    """
+    
+    def __init__(self):
+        # Supported formats and their MIME types.
+        self.mimeTypes = {"json": "application/javascript", "msgpack": "application/msgpack", "cbor": "application/cbor"}
+        
+        # Supported schemas
+        self.schemas = ["full", "compact"]
+        
+        # Value encoders for each format.
+        self.__encoders = {"json": self.__jsonValue, "msgpack": self.__msgpackValue, "cbor": self.__cborValue}
+        
+        # Pre-encoded chunks by format, schema, field, display name, and unit.
+        self.__chunks = {}
+    
+    def __jsonValue(self, value):
+        """
+        __jsonValue(value)
+        
+        Encode a value as JSON. Lists and dicts are encoded recursively, and NumPy numbers are encoded like the Python numbers they hold. Raises TypeError for anything else. Returns bytes.
+        """
+        
+        if value is None:
+            return b"null"
+        elif value is True:
+            return b"true"
+        elif value is False:
+            return b"false"
+        elif isinstance(value, str):
+            return bytes(encode_basestring_ascii(value), 'ascii')
+        elif isinstance(value, (list, tuple)):
+            return b"[" + b", ".join([self.__jsonValue(v) for v in value]) + b"]"
+        elif isinstance(value, dict):
+            return b"{" + b", ".join([self.__jsonValue(str(k)) + b": " + self.__jsonValue(v) for k, v in value.items()]) + b"}"
+        elif isinstance(value, numbers.Integral):
+            return bytes(str(int(value)), 'ascii')
+        elif isinstance(value, numbers.Real):
+            value = float(value)
+            
+            # Match what json.dumps() does with these.
+            if not math.isfinite(value):
+                return b"NaN" if value != value else (b"Infinity" if value > 0 else b"-Infinity")
+            
+            # repr() of a NumPy float isn't a number, but float's repr is what json.dumps() writes.
+            return bytes(float.__repr__(value), 'ascii')
+        
+        raise TypeError("owsEncoder: Can't encode " + type(value).__name__ + " values.")
+    
+    def __msgpackValue(self, value):
+        """
+        __msgpackValue(value)
+        
+        Encode a value as MessagePack. Lists and dicts are encoded recursively, and NumPy numbers are encoded like the Python numbers they hold. Raises TypeError for anything else. Returns bytes.
+        """
+        
+        if value is None:
+            return b"\xc0"
+        elif value is True:
+            return b"\xc3"
+        elif value is False:
+            return b"\xc2"
+        elif isinstance(value, str):
+            value = bytes(value, 'utf-8')
+            
+            if len(value) < 32:
+                return struct.pack(">B", 0xa0 | len(value)) + value
+            elif len(value) < 256:
+                return struct.pack(">BB", 0xd9, len(value)) + value
+            
+            return struct.pack(">BH", 0xda, len(value)) + value
+        elif isinstance(value, (list, tuple)):
+            return self.__msgpackArray(len(value)) + b"".join([self.__msgpackValue(v) for v in value])
+        elif isinstance(value, dict):
+            return self.__msgpackMap(len(value)) + b"".join([self.__msgpackValue(str(k)) + self.__msgpackValue(v) for k, v in value.items()])
+        elif isinstance(value, numbers.Integral):
+            value = int(value)
+            
+            if 0 <= value < 128:
+                return struct.pack(">B", value)
+            elif -32 <= value < 0:
+                return struct.pack(">b", value)
+            
+            return struct.pack(">Bq", 0xd3, value)
+        elif isinstance(value, numbers.Real):
+            return struct.pack(">Bd", 0xcb, float(value))
+        
+        raise TypeError("owsEncoder: Can't encode " + type(value).__name__ + " values.")
+    
+    def __msgpackMap(self, count):
+        """
+        __msgpackMap(count)
+        
+        Encode the header of a MessagePack map with count entries. Returns bytes.
+        """
+        
+        if count < 16:
+            return struct.pack(">B", 0x80 | count)
+        elif count < 65536:
+            return struct.pack(">BH", 0xde, count)
+        
+        return struct.pack(">BI", 0xdf, count)
+    
+    def __msgpackArray(self, count):
+        """
+        __msgpackArray(count)
+        
+        Encode the header of a MessagePack array with count entries. Returns bytes.
+        """
+        
+        if count < 16:
+            return struct.pack(">B", 0x90 | count)
+        elif count < 65536:
+            return struct.pack(">BH", 0xdc, count)
+        
+        return struct.pack(">BI", 0xdd, count)
+    
+    def __cborHead(self, major, length):
+        """
+        __cborHead(major, length)
+        
+        Encode a CBOR header with a major type and length or value. Returns bytes.
+        """
+        
+        if length < 24:
+            return struct.pack(">B", (major << 5) | length)
+        elif length < 256:
+            return struct.pack(">BB", (major << 5) | 24, length)
+        elif length < 65536:
+            return struct.pack(">BH", (major << 5) | 25, length)
+        elif length < 4294967296:
+            return struct.pack(">BI", (major << 5) | 26, length)
+        
+        return struct.pack(">BQ", (major << 5) | 27, length)
+    
+    def __cborValue(self, value):
+        """
+        __cborValue(value)
+        
+        Encode a value as CBOR. Lists and dicts are encoded recursively, and NumPy numbers are encoded like the Python numbers they hold. Raises TypeError for anything else. Returns bytes.
+        """
+        
+        if value is None:
+            return b"\xf6"
+        elif value is True:
+            return b"\xf5"
+        elif value is False:
+            return b"\xf4"
+        elif isinstance(value, str):
+            value = bytes(value, 'utf-8')
+            
+            return self.__cborHead(3, len(value)) + value
+        elif isinstance(value, (list, tuple)):
+            return self.__cborHead(4, len(value)) + b"".join([self.__cborValue(v) for v in value])
+        elif isinstance(value, dict):
+            return self.__cborHead(5, len(value)) + b"".join([self.__cborValue(str(k)) + self.__cborValue(v) for k, v in value.items()])
+        elif isinstance(value, numbers.Integral):
+            value = int(value)
+            
+            if value >= 0:
+                return self.__cborHead(0, value)
+            
+            return self.__cborHead(1, -1 - value)
+        elif isinstance(value, numbers.Real):
+            return struct.pack(">Bd", 0xfb, float(value))
+        
+        raise TypeError("owsEncoder: Can't encode " + type(value).__name__ + " values.")
+    
+    def __mapHead(self, fmt, count):
+        """
+        __mapHead(fmt, count)
+        
+        Encode the start of a map with count entries. Returns bytes.
+        """
+        
+        if fmt == "msgpack":
+            return self.__msgpackMap(count)
+        elif fmt == "cbor":
+            return self.__cborHead(5, count)
+        
+        return b"{"
+    
+    def __getChunks(self, fmt, schema, key, point):
+        """
+        __getChunks(fmt, schema, key, point)
+        
+        Get the bytes that go before and after the value of a field, encoding them the first time they're needed. point is the field's dict, or None for plain values like dts. Returns a (prefix, suffix) tuple.
+        """
+        
+        if point is None:
+            chunkKey = (fmt, schema, key)
+        else:
+            chunkKey = (fmt, schema, key, point['name'], point['unit'])
+        
+        if chunkKey not in self.__chunks:
+            encode = self.__encoders[fmt]
+            
+            # JSON needs separators, and the binary formats need map headers.
+            if fmt == "json":
+                colon = b": " if schema == "full" else b":"
+                comma = b", " if schema == "full" else b","
+            else:
+                colon = b""
+                comma = b""
+            
+            if (point is None) or (schema == "compact"):
+                prefix = encode(key) + colon
+                suffix = b""
+            else:
+                prefix = encode(key) + colon + self.__mapHead(fmt, 3) + encode("name") + colon + encode(point['name']) + comma + encode("value") + colon
+                suffix = comma + encode("unit") + colon + encode(point['unit']) + (b"}" if fmt == "json" else b"")
+            
+            self.__chunks[chunkKey] = (prefix, suffix)
+        
+        return self.__chunks[chunkKey]
+    
+    def encode(self, weatherDict, fmt = "json", schema = "full"):
+        """
+        encode(weatherDict, [fmt = "json"], [schema = "full"])
+        
+        Encode a weather record in a format ("json", "msgpack", or "cbor") and schema ("full" or "compact"). Raises KeyError for unknown formats and ValueError for unknown schemas.
+        Returns bytes. Full JSON output is the same as json.dumps() gives.
+        """
+        
+        encode = self.__encoders[fmt]
+        
+        if schema not in self.schemas:
+            raise ValueError("owsEncoder: Unknown schema " + str(schema) + ".")
+        
+        # Separator between fields in JSON.
+        comma = b", " if schema == "full" else b","
+        
+        parts = [self.__mapHead(fmt, len(weatherDict))]
+        
+        for key, point in weatherDict.items():
+            if (fmt == "json") and (len(parts) > 1):
+                parts.append(comma)
+            
+            if isinstance(point, dict):
+                prefix, suffix = self.__getChunks(fmt, schema, key, point)
+                parts.extend([prefix, encode(point['value']), suffix])
+            else:
+                prefix, suffix = self.__getChunks(fmt, schema, key, None)
+                parts.extend([prefix, encode(point), suffix])
+        
+        if fmt == "json":
+            parts.append(b"}")
+        
+        return b"".join(parts)
+    
+    def encodeValue(self, value, fmt = "json"):
+        """
+        encodeValue(value, [fmt = "json"])
+        
+        Encode any value made of dicts, lists, strings, numbers, booleans, and None in a format ("json", "msgpack", or "cbor"). Nothing is pre-encoded, so use encode() for weather records.
+        Raises KeyError for unknown formats and TypeError for values we can't encode. Returns bytes.
+        """
+        
+        return self.__encoders[fmt](value)
+    
+    def encodeBatch(self, results, fmt = "json"):
+        """
+        encodeBatch(results, [fmt = "json"])
+        
+        Wrap a list of results that were already encoded in a format with encode() or encodeValue() in a batch response like {"results": [...]}. Raises KeyError for unknown formats. Returns bytes.
+        """
+        
+        encode = self.__encoders[fmt]
+        
+        if fmt == "json":
+            return b'{"results": [' + b", ".join(results) + b"]}"
+        elif fmt == "msgpack":
+            return self.__msgpackMap(1) + encode("results") + self.__msgpackArray(len(results)) + b"".join(results)
+        
+        return self.__cborHead(5, 1) + encode("results") + self.__cborHead(4, len(results)) + b"".join(results)
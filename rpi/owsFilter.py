@@ -0,0 +1,225 @@
+# OpenWeatherStn sample validation filter by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+# Fallback median when we don't have NumPy.
+import statistics
+
+# NumPy lets us validate whole batches at once.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+#########################
+# owsSampleFilter class #
+#########################
+
+class owsSampleFilter:
+    """
+    owsSampleFilter - validates batches of raw sensor samples before they're used. Every sample gets a set of quality flags, and a sample with no flags set is good. The checks are:
+    
+    - Saturated: the sample matches one of the channel's saturation values.
+    - Range: the sample is outside the channel's valid range.
+    - Spike: the sample is too far from the median of recent samples, measured in MADs (median absolute deviation). Only for channels that should hold steady, since a real swing looks like a spike.
+    - Stuck: the sample is part of a run of identical samples that's too long.
+    
+    The constructor accepts two optional arguments:
+    
+    historyLen: number of recent in-range samples per channel used as a reference for spike detection. Defaults to 30.
+    madLimit: how many (normal-scaled) MADs from the median a sample has to be to count as a spike. Defaults to 5.
+    """
+    
+    def __init__(self, historyLen = 30, madLimit = 5.0):
+        # Spike detection settings.
+        self.__historyLen = historyLen
+        self.__madLimit = madLimit
+        
+        # Don't try to find spikes until we have this many reference samples.
+        self.__minRef = 5
+        
+        # Scale factor to make the MAD comparable to a standard deviation.
+        self.__madScale = 1.4826
+        
+        # Channel settings, recent samples, and stuck value tracking by channel name.
+        self.__channels = {}
+        self.__history = {}
+        self.__lastVal = {}
+        self.__runLen = {}
+        
+        # Quality flags
+        self.qualOk        = 0x00 # Good sample.
+        self.qualSaturated = 0x01 # Sensor reported saturation.
+        self.qualRange     = 0x02 # Outside the valid range.
+        self.qualSpike     = 0x04 # Too far from the median of recent samples.
+        self.qualStuck     = 0x08 # Identical to too many previous samples.
+        self.qualMissing   = 0x10 # No sample was available.
+    
+    def addChannel(self, name, minVal, maxVal, saturated = (), stuckCount = None, noise = 0, spike = True):
+        """
+        addChannel(name, minVal, maxVal, [saturated = ()], [stuckCount = None], [noise = 0], [spike = True])
+        
+        Set up a channel to be validated. minVal and maxVal specify the valid range, saturated is a sequence of values the sensor uses to report saturation,
+        stuckCount is the number of identical samples in a row we consider stuck (None to disable), and noise is the smallest MAD we'll use for spike detection so a very quiet channel doesn't flag its own noise.
+        spike turns spike detection on or off. Turn it off for channels that really do jump around, like a magnetometer axis when the vein swings or wind speed in a gust.
+        """
+        
+        self.__channels[name] = {"min": minVal, "max": maxVal, "saturated": tuple(saturated), "stuckCount": stuckCount, "noise": noise, "spike": spike}
+        self.__history[name] = []
+        self.__lastVal[name] = None
+        self.__runLen[name] = 0
+    
+    def __updateState(self, name, values, inRange):
+        """
+        __updateState(name, values, inRange)
+        
+        Update a channel's spike reference history with in-range samples. Returns nothing.
+        """
+        
+        # Keep every in-range sample so a real shift becomes the new median after a while.
+        history = self.__history[name] + [v for v, ok in zip(values, inRange) if ok]
+        self.__history[name] = history[-self.__historyLen:]
+    
+    def __validateNumpy(self, name, values):
+        """
+        __validateNumpy(name, values)
+        
+        Vectorized validation of a batch of samples. Returns an array of quality flags.
+        """
+        
+        chan = self.__channels[name]
+        vals = np.asarray(values, dtype = np.float64)
+        n = vals.shape[0]
+        flags = np.zeros(n, dtype = np.uint8)
+        
+        # Missing samples come in as NaN.
+        missing = np.isnan(vals)
+        flags[missing] |= self.qualMissing
+        
+        # Saturation and range checks.
+        saturated = np.isin(vals, chan['saturated']) if len(chan['saturated']) else np.zeros(n, dtype = bool)
+        flags[saturated] |= self.qualSaturated
+        
+        outOfRange = ~saturated & ~missing & ((vals < chan['min']) | (vals > chan['max']))
+        flags[outOfRange] |= self.qualRange
+        
+        inRange = ~(missing | saturated | outOfRange)
+        
+        # Spike check against the median of recent samples and this batch.
+        ref = np.concatenate((np.asarray(self.__history[name], dtype = np.float64), vals[inRange]))
+        
+        if chan['spike'] and (ref.shape[0] >= self.__minRef):
+            median = np.median(ref)
+            mad = max(np.median(np.abs(ref - median)) * self.__madScale, chan['noise'])
+            
+            if mad > 0:
+                spike = inRange & (np.abs(vals - median) > (self.__madLimit * mad))
+                flags[spike] |= self.qualSpike
+        
+        # Stuck check. Figure out how long the run of identical values is at each sample.
+        if (chan['stuckCount'] is not None) and (n > 0):
+            same = np.empty(n, dtype = bool)
+            same[0] = (vals[0] == self.__lastVal[name])
+            same[1:] = vals[1:] == vals[:-1]
+            
+            # Find where each run starts, and carry it forward.
+            idx = np.arange(n)
+            runStart = np.maximum.accumulate(np.where(same, -1, idx))
+            
+            # Runs that started before this batch carry the previous run length with them.
+            runLen = np.where(runStart < 0, idx + 1 + self.__runLen[name], idx - runStart + 1)
+            flags[runLen >= chan['stuckCount']] |= self.qualStuck
+            
+            self.__lastVal[name] = vals[-1]
+            self.__runLen[name] = int(runLen[-1])
+        
+        self.__updateState(name, vals.tolist(), inRange.tolist())
+        
+        return flags
+    
+    def __validatePython(self, name, values):
+        """
+        __validatePython(name, values)
+        
+        Plain Python validation of a batch of samples for when NumPy isn't available. Returns a list of quality flags.
+        """
+        
+        chan = self.__channels[name]
+        flags = []
+        inRange = []
+        
+        for v in values:
+            flag = self.qualOk
+            
+            # Saturation and range checks.
+            if (v is None) or (v != v):
+                flag = self.qualMissing
+            elif v in chan['saturated']:
+                flag = self.qualSaturated
+            elif (v < chan['min']) or (v > chan['max']):
+                flag = self.qualRange
+            
+            flags.append(flag)
+            inRange.append(flag == self.qualOk)
+        
+        # Spike check against the median of recent samples and this batch.
+        ref = self.__history[name] + [v for v, ok in zip(values, inRange) if ok]
+        
+        if chan['spike'] and (len(ref) >= self.__minRef):
+            median = statistics.median(ref)
+            mad = max(statistics.median([abs(v - median) for v in ref]) * self.__madScale, chan['noise'])
+            
+            if mad > 0:
+                for i in range(len(values)):
+                    if inRange[i] and (abs(values[i] - median) > (self.__madLimit * mad)):
+                        flags[i] = flags[i] | self.qualSpike
+        
+        # Stuck check. Missing samples start a new run and never continue one, like NaN does with NumPy.
+        if chan['stuckCount'] is not None:
+            for i in range(len(values)):
+                if (flags[i] & self.qualMissing == 0) and (values[i] == self.__lastVal[name]):
+                    self.__runLen[name] = self.__runLen[name] + 1
+                else:
+                    self.__lastVal[name] = values[i]
+                    self.__runLen[name] = 1
+                
+                if self.__runLen[name] >= chan['stuckCount']:
+                    flags[i] = flags[i] | self.qualStuck
+        
+        self.__updateState(name, values, inRange)
+        
+        return flags
+    
+    def validate(self, name, values):
+        """
+        validate(name, values)
+        
+        Validate a batch of samples for a given channel. Missing samples can be None or NaN. Returns a sequence of quality flags, one per sample, where 0 (qualOk) means the sample is good.
+        """
+        
+        if name not in self.__channels:
+            raise KeyError("owsSampleFilter: Unknown channel " + str(name) + ".")
+        
+        if np is not None:
+            # NumPy wants NaN instead of None.
+            retVal = self.__validateNumpy(name, [float('nan') if v is None else v for v in values])
+        else:
+            retVal = self.__validatePython(name, values)
+        
+        return retVal
+    
+    def combine(self, flags):
+        """
+        combine(flags)
+        
+        OR a sequence of quality flags together. Returns an integer.
+        """
+        
+        retVal = self.qualOk
+        
+        for flag in flags:
+            retVal = retVal | int(flag)
+        
+        return retVal
@@ -0,0 +1,237 @@
+# OpenWeatherStn time series compression by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import array
+
+####################
+# owsGorilla class #
+####################
+
+class owsGorilla:
+    """
+    owsGorilla - Gorilla style compression for columns of time series data, after Facebook's Gorilla paper. Weather values barely change from one minute to the next, so we store how each value
+    differs from the one before it in as few bits as we can:
+    
+    Integers and timestamps: the first value as 64 bits, then the change in the difference between values (the delta of deltas). A steady interval or an unchanged counter is one 0 bit,
+    and bigger changes get 10 + 7 bits, 110 + 14 bits, 1110 + 20 bits, or 11110 + 32 bits. Anything bigger is 11111 followed by the value itself as 64 bits.
+    Floats (stored as float32): the first value's 32 bits, then each value's bits XORed with the one before it. A repeated value is one 0 bit. Otherwise it's 10 and the changed bits if they fit in the
+    previous value's window of changed bits, or 11, the number of leading zero bits (5 bits), the number of changed bits less one (5 bits), and the changed bits.
+    
+    Bits are packed most significant first and the last byte is padded with zeros. Counts aren't stored, so decoders have to be told how many values there are.
+    """
+    
+    def __init__(self):
+        # Delta of delta sizes in bits by how many 1 bits come before them, and the prefix for a value stored as is.
+        self.__dodBits = [None, 7, 14, 20, 32]
+        self.__escapeOnes = len(self.__dodBits)
+        
+        # Float width in bits.
+        self.__floatBits = 32
+    
+    def __toBytes(self, bits):
+        """
+        __toBytes(bits)
+        
+        Pack a list of strings of 0s and 1s into bytes, padding the last byte with zeros. Returns bytes.
+        """
+        
+        bitStr = "".join(bits)
+        bitStr = bitStr + "0" * (-len(bitStr) % 8)
+        
+        if len(bitStr) == 0:
+            return b""
+        
+        return int(bitStr, 2).to_bytes(len(bitStr) // 8, "big")
+    
+    def __toBits(self, data):
+        """
+        __toBits(data)
+        
+        Unpack bytes into a string of 0s and 1s. Returns a string.
+        """
+        
+        if len(data) == 0:
+            return ""
+        
+        return bin(int.from_bytes(data, "big"))[2:].zfill(len(data) * 8)
+    
+    def encodeInts(self, values):
+        """
+        encodeInts(values)
+        
+        Compress a list of integers that fit in 64 bits, like epoch microsecond timestamps or counters, with delta of delta encoding. Returns bytes.
+        """
+        
+        bits = []
+        
+        if len(values) == 0:
+            return b""
+        
+        prev = int(values[0])
+        bits.append(format(prev & 0xffffffffffffffff, "064b"))
+        prevDelta = 0
+        
+        for value in values[1:]:
+            value = int(value)
+            delta = value - prev
+            dod = delta - prevDelta
+            
+            if dod == 0:
+                bits.append("0")
+            else:
+                for ones in range(1, self.__escapeOnes + 1):
+                    if ones == self.__escapeOnes:
+                        # Too big for a delta of delta, so store the value itself.
+                        bits.append("1" * ones + format(value & 0xffffffffffffffff, "064b"))
+                        break
+                    
+                    size = self.__dodBits[ones]
+                    
+                    if -(1 << (size - 1)) <= dod < (1 << (size - 1)):
+                        bits.append("1" * ones + "0" + format(dod & ((1 << size) - 1), "0" + str(size) + "b"))
+                        break
+            
+            prev = value
+            prevDelta = delta
+        
+        return self.__toBytes(bits)
+    
+    def decodeInts(self, data, count):
+        """
+        decodeInts(data, count)
+        
+        Decompress count integers compressed with encodeInts(). Returns a list of integers.
+        """
+        
+        if count == 0:
+            return []
+        
+        bits = self.__toBits(data)
+        dodBits = self.__dodBits
+        escapeOnes = self.__escapeOnes
+        
+        value = int(bits[0:64], 2)
+        
+        if value >= (1 << 63):
+            value = value - (1 << 64)
+        
+        retVal = [value]
+        pos = 64
+        delta = 0
+        
+        for i in range(count - 1):
+            if bits[pos] == "0":
+                pos = pos + 1
+            else:
+                # Count the 1 bits in front of the value.
+                zeroPos = bits.find("0", pos, pos + escapeOnes)
+                ones = escapeOnes if zeroPos < 0 else zeroPos - pos
+                
+                if ones == escapeOnes:
+                    pos = pos + ones
+                    newValue = int(bits[pos:pos + 64], 2)
+                    pos = pos + 64
+                    
+                    if newValue >= (1 << 63):
+                        newValue = newValue - (1 << 64)
+                    
+                    delta = newValue - value
+                else:
+                    size = dodBits[ones]
+                    pos = pos + ones + 1
+                    dod = int(bits[pos:pos + size], 2)
+                    pos = pos + size
+                    
+                    if dod >= (1 << (size - 1)):
+                        dod = dod - (1 << size)
+                    
+                    delta = delta + dod
+            
+            value = value + delta
+            retVal.append(value)
+        
+        return retVal
+    
+    def encodeFloats(self, values):
+        """
+        encodeFloats(values)
+        
+        Compress a list of floats as float32 with XOR encoding. NaN is kept as is. Returns bytes.
+        """
+        
+        if len(values) == 0:
+            return b""
+        
+        # Get each float32's bits as an integer.
+        words = array.array("I", array.array("f", values).tobytes())
+        floatBits = self.__floatBits
+        
+        bits = [format(words[0], "032b")]
+        prev = words[0]
+        prevLead = -1
+        prevTrail = 0
+        prevLen = 0
+        
+        for word in words[1:]:
+            xor = word ^ prev
+            prev = word
+            
+            if xor == 0:
+                bits.append("0")
+                continue
+            
+            lead = floatBits - xor.bit_length()
+            trail = (xor & -xor).bit_length() - 1
+            
+            # Reuse the last window of changed bits if these fit in it.
+            if (prevLead >= 0) and (lead >= prevLead) and (trail >= prevTrail):
+                bits.append("10" + format(xor >> prevTrail, "0" + str(prevLen) + "b"))
+            else:
+                length = floatBits - lead - trail
+                bits.append("11" + format(lead, "05b") + format(length - 1, "05b") + format(xor >> trail, "0" + str(length) + "b"))
+                prevLead, prevTrail, prevLen = lead, trail, length
+        
+        return self.__toBytes(bits)
+    
+    def decodeFloats(self, data, count):
+        """
+        decodeFloats(data, count)
+        
+        Decompress count floats compressed with encodeFloats(). Returns an array of float32 bit patterns as unsigned integers (array type "I"), which can be viewed as floats without copying them one by one.
+        """
+        
+        retVal = array.array("I")
+        
+        if count == 0:
+            return retVal
+        
+        bits = self.__toBits(data)
+        floatBits = self.__floatBits
+        
+        value = int(bits[0:32], 2)
+        retVal.append(value)
+        pos = 32
+        prevTrail = 0
+        prevLen = 0
+        
+        for i in range(count - 1):
+            if bits[pos] == "0":
+                pos = pos + 1
+            elif bits[pos + 1] == "0":
+                pos = pos + 2
+                value = value ^ (int(bits[pos:pos + prevLen], 2) << prevTrail)
+                pos = pos + prevLen
+            else:
+                lead = int(bits[pos + 2:pos + 7], 2)
+                prevLen = int(bits[pos + 7:pos + 12], 2) + 1
+                prevTrail = floatBits - lead - prevLen
+                pos = pos + 12
+                value = value ^ (int(bits[pos:pos + prevLen], 2) << prevTrail)
+                pos = pos + prevLen
+            
+            retVal.append(value)
+        
+        return retVal
@@ -0,0 +1,100 @@
+# OpenWeatherStn live page renderer by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+# Values are escaped before they go in the page.
+from html import escape
+
+#################
+# owsHtml class #
+#################
+
+class owsHtml:
+    """
+    owsHtml - renders the live data page from precompiled templates. Each theme and layout is compiled once into a list of static byte chunks with gaps for the values, so rendering a page
+    only formats the value cells and returns a list of byte chunks for WSGI to send. The constructor accepts one optional argument:
+    
+    fields: a list of the fields shown on the page, in order. Defaults to the fields weatherService returns.
+    """
+    
+    def __init__(self, fields = None):
+        if fields is None:
+            fields = ["temp", "humid", "baro", "windAvgSpd", "windMaxSpd", "windGust", "windGustDts", "windAvg2m", "windAvg10m", "windDirCrd", "windDir", "rainCt", "rainRate", \
+                "dewpoint", "heatIndex", "windChill", "seaLevelBaro", "lightAmb", "sysTemp", "sysAlert"]
+        
+        self.fields = fields
+        
+        # Page styles by theme name.
+        self.themes = {
+            "dark": "font-family: sans-serif; background-color: black; color: white;",
+            "light": "font-family: sans-serif; background-color: white; color: black;",
+            "night": "font-family: sans-serif; background-color: black; color: #c00000;"}
+        
+        # Layouts by name: extra head tags, table style, and how a row opens, separates the name from the value, and closes.
+        self.layouts = {
+            "full": ("", "border: 1px solid black;", "<TR><TD style=\"font-weight: bold;\">", "</TD><TD>", "</TD></TR>\n"),
+            "mobile": ("<META name=\"viewport\" content=\"width=device-width, initial-scale=1\" />\n", "width: 100%; font-size: x-large;", \
+                "<TR><TD style=\"font-weight: bold;\">", "<BR />\n", "</TD></TR>\n")}
+        
+        # Compiled templates by theme and layout.
+        self.__templates = {}
+    
+    def __compile(self, weatherDict, theme, layout):
+        """
+        __compile(weatherDict, theme, layout)
+        
+        Compile the page for a theme and layout, taking field names from weatherDict. Returns a list of the static byte chunks that go around the timestamp and each value cell.
+        """
+        
+        head, tableStyle, rowOpen, rowSep, rowClose = self.layouts[layout]
+        
+        # HTML header
+        template = ["<HTML>\n<HEAD>\n<META http-equiv=\"refresh\" content=\"60\" />\n" + head + "<TITLE>OpenWeatherStn live data</TITLE>\n</HEAD>\n" + \
+            "<BODY style=\"" + self.themes[theme] + "\">\n" + \
+            "<SPAN style=\"font-size: large; font-weight: bold;\">Open Weather Station live data</SPAN>\n<BR />\n<BR />\nReading taken: ", \
+            " UTC\n<BR />\n<BR />\n<TABLE style=\"" + tableStyle + "\">\n"]
+        
+        # One row per field, with a gap for the value.
+        for key in self.fields:
+            template[-1] = template[-1] + rowOpen + escape(weatherDict[key]['name']) + rowSep
+            template.append(rowClose)
+        
+        # HTML footer
+        template[-1] = template[-1] + "</TABLE>\n</BODY>\n</HTML>"
+        
+        return [bytes(chunk, 'utf-8') for chunk in template]
+    
+    def render(self, weatherDict, theme = "dark", layout = "full"):
+        """
+        render(weatherDict, [theme = "dark"], [layout = "full"])
+        
+        Render weather data to an HTML page using a theme and layout, compiling the template the first time it's used. Raises KeyError for unknown themes and layouts.
+        Returns a list holding the page as one bytes object, so a WSGI server sends it in one write and can set its Content-Length.
+        """
+        
+        templateKey = (theme, layout)
+        
+        if templateKey not in self.__templates:
+            self.__templates[templateKey] = self.__compile(weatherDict, theme, layout)
+        
+        template = self.__templates[templateKey]
+        
+        # Format the timestamp and each field's value and unit.
+        cells = [weatherDict['dts']]
+        
+        for key in self.fields:
+            if weatherDict[key]['unit'] is None:
+                cells.append(str(weatherDict[key]['value']))
+            else:
+                cells.append(str(weatherDict[key]['value']) + " " + weatherDict[key]['unit'])
+        
+        # Interleave the static chunks with the cells.
+        page = [template[0]]
+        
+        for i in range(len(cells)):
+            page.append(bytes(escape(cells[i]), 'utf-8'))
+            page.append(template[i + 1])
+        
+        return [b"".join(page)]
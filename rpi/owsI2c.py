@@ -0,0 +1,140 @@
+# OpenWeatherStn instrumented I2C bus by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import os
+import time
+
+# quick2wire is only needed to talk to real hardware.
+try:
+    import quick2wire.i2c as qI2c
+except ImportError:
+    qI2c = None
+
+# Performance counters
+from owsMetrics import registry
+
+# Tracing
+from owsTrace import tracer
+
+# Raw transaction capture
+from owsI2cLog import owsI2cLog
+
+################
+# owsI2c class #
+################
+
+class owsI2c:
+    """
+    owsI2c - the I2C bus as one device sees it, counting transactions and errors and timing each transaction. Messages are built with writing_bytes() and reading() and run with transaction(),
+    the same as quick2wire's I2CMaster, and sensor classes wait for their devices with sleep() so the waits show up in traces. The real bus is used through quick2wire unless owsI2c.bus is set to
+    a simulated bus like owsI2cSim or owsI2cReplay before the sensor objects are created, which lets the scanner run without hardware. Messages are ("w", address, bytes) and
+    ("r", address, byte count) tuples, which simulated buses take as they are. If owsI2c.capture is set to an owsI2cLog every transaction's raw bytes are added to it, which the
+    OWS_I2C_CAPTURE environment variable does with the log file it's set to. The constructor accepts one argument:
+    
+    device: the name of the device on the bus, used to label metrics.
+    """
+    
+    # Simulated bus to use in place of the real one, if any.
+    bus = None
+    
+    # Log to capture transactions in, if any.
+    capture = None
+    
+    def __init__(self, device):
+        # Pick the bus. quick2wire needs our messages turned into its own, a simulated bus takes them as they are.
+        if owsI2c.bus is not None:
+            self.__master = owsI2c.bus
+            self.__qMsgs = False
+        
+        elif qI2c is not None:
+            self.__master = qI2c.I2CMaster()
+            self.__qMsgs = True
+        
+        else:
+            raise RuntimeError("owsI2c: quick2wire is required to use the I2C bus.")
+        
+        # Simulated buses decide how long a wait really takes.
+        self.__sleep = getattr(self.__master, "sleep", time.sleep)
+        
+        self.device = device
+        
+        # Every metric for this device has the same labels.
+        self.__labels = {"device": device}
+        
+        # Span names for traces.
+        self.__spanName = "i2c " + device
+        self.__sleepName = device + " wait"
+        
+        registry.describe("ows_i2c_transactions_total", "counter", "I2C transactions by device.")
+        registry.describe("ows_i2c_errors_total", "counter", "I2C transactions that failed by device.")
+        registry.describe("ows_i2c_seconds", "histogram", "I2C transaction time in seconds by device.")
+    
+    def writing_bytes(self, addr, *data):
+        """
+        writing_bytes(addr, *data)
+        
+        Build a message that writes bytes to the device at addr.
+        """
+        
+        return ("w", addr, bytes(data))
+    
+    def reading(self, addr, byteCt):
+        """
+        reading(addr, byteCt)
+        
+        Build a message that reads byteCt bytes from the device at addr.
+        """
+        
+        return ("r", addr, byteCt)
+    
+    def transaction(self, *msgs):
+        """
+        transaction(*msgs)
+        
+        Run an I2C transaction made of the messages. Returns a bytes object for each read, and raises whatever the bus raises.
+        """
+        
+        start = time.perf_counter()
+        
+        if self.__qMsgs:
+            busMsgs = [qI2c.writing_bytes(addr, *data) if kind == "w" else qI2c.reading(addr, data) for kind, addr, data in msgs]
+        else:
+            busMsgs = msgs
+        
+        try:
+            with tracer.span(self.__spanName, "i2c"):
+                results = self.__master.transaction(*busMsgs)
+        
+        except Exception as e:
+            registry.inc("ows_i2c_errors_total", self.__labels)
+            
+            if (owsI2c.capture is not None) and isinstance(e, IOError):
+                owsI2c.capture.add(msgs, None, True)
+            
+            raise e
+        
+        finally:
+            registry.inc("ows_i2c_transactions_total", self.__labels)
+            registry.observe("ows_i2c_seconds", time.perf_counter() - start, self.__labels)
+        
+        if owsI2c.capture is not None:
+            owsI2c.capture.add(msgs, results)
+        
+        return results
+    
+    def sleep(self, seconds):
+        """
+        sleep(seconds)
+        
+        Wait for the device, for example while it wakes up or finishes a conversion.
+        """
+        
+        with tracer.span(self.__sleepName, "sleep"):
+            self.__sleep(seconds)
+
+# Capture every transaction if the OWS_I2C_CAPTURE environment variable is set to the log file.
+if os.environ.get("OWS_I2C_CAPTURE"):
+    owsI2c.capture = owsI2cLog(os.environ["OWS_I2C_CAPTURE"], writer = True)
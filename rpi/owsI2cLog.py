@@ -0,0 +1,226 @@
+# OpenWeatherStn I2C capture log by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+# File handling
+import mmap
+import struct
+import threading
+import time
+
+###################
+# owsI2cLog class #
+###################
+
+class owsI2cLog:
+    """
+    owsI2cLog - compact append-only log of raw I2C transactions, so the bytes the sensors sent can be fed back through the drivers later with owsI2cReplay. The writer adds a record for each
+    transaction with one write, so a crash can only cut off the last record, and readers stop at a cut off record. The file layout is:
+    
+    Header: "OWSC", format version (uint16), reserved (uint16)
+    Records: device address (uint8), flags (uint8), microseconds since the previous record (uint32), then the epoch microseconds (int64) if the absolute time flag is set, then each message.
+    Messages: a length byte with the top bit set for reads, then the bytes written or read. Messages are at most 127 bytes. Failed reads don't have any bytes.
+    
+    The low bits of the flags say whether the transaction failed and whether the absolute time is there, and the top four bits are the message count. All numbers are little endian.
+    The constructor takes one argument, and one optional argument:
+    
+    logFile: path to the log file.
+    writer: set to True to append to the log, creating it if it doesn't exist. Defaults to False.
+    """
+    
+    def __init__(self, logFile, writer = False):
+        self.logFile = logFile
+        
+        # File format settings.
+        self.__magic = b"OWSC"
+        self.__version = 1
+        self.__headerFmt = "<4sHH"
+        self.__headerSize = struct.calcsize(self.__headerFmt)
+        self.__recordFmt = "<BBI"
+        self.__recordSize = struct.calcsize(self.__recordFmt)
+        
+        # Record flags.
+        self.flagFailed = 0x01
+        self.__flagAbsolute = 0x02
+        
+        # Read messages have the top bit set in their length byte, which leaves the rest for the length.
+        self.__readBit = 0x80
+        self.__maxLength = 0x7f
+        
+        # Longest gap a record can hold before we have to write the absolute time again.
+        self.__maxDelta = 0xffffffff
+        
+        self.__writer = writer
+        self.__file = None
+        
+        # The sensors and the wind sampler share the log.
+        self.__lock = threading.Lock()
+        
+        if writer:
+            self.__open()
+    
+    def __open(self):
+        """
+        __open()
+        
+        Open the log for appending, writing the header if it's a new file.
+        """
+        
+        try:
+            # Unbuffered so each record goes to the file with one write.
+            self.__file = open(self.logFile, "ab", buffering = 0)
+            
+            if self.__file.tell() == 0:
+                self.__file.write(struct.pack(self.__headerFmt, self.__magic, self.__version, 0))
+        
+        except Exception as e:
+            raise e
+        
+        # The first record we write has the absolute time.
+        self.__lastEpoch = None
+    
+    def add(self, msgs, results, failed = False):
+        """
+        add(msgs, results, [failed = False])
+        
+        Append a transaction. msgs is a list of ("w", address, bytes) and ("r", address, byte count) messages like owsI2c builds, and results is a list of bytes for each read,
+        or None if the transaction failed. Raises ValueError for transactions the log can't hold, without writing anything.
+        """
+        
+        if not self.__writer:
+            raise IOError("owsI2cLog: Log wasn't opened for writing.")
+        
+        if len(msgs) > 15:
+            raise ValueError("owsI2cLog: Transactions can have at most 15 messages.")
+        
+        # Lengths share their byte with the read bit, so a longer message would be logged as something else and throw off every record after it.
+        lengths = [len(data) if kind == "w" else data for kind, addr, data in msgs]
+        
+        if (not failed) and (results is not None):
+            lengths = lengths + [len(result) for result in results]
+        
+        if max(lengths) > self.__maxLength:
+            raise ValueError("owsI2cLog: Messages can be at most " + str(self.__maxLength) + " bytes long.")
+        
+        epoch = int(time.time() * 1000000)
+        
+        # Pack the messages.
+        body = []
+        readIdx = 0
+        
+        for kind, addr, data in msgs:
+            if kind == "w":
+                body.append(struct.pack("<B", len(data)) + data)
+            
+            elif failed or (results is None):
+                body.append(struct.pack("<B", self.__readBit | data))
+            
+            else:
+                body.append(struct.pack("<B", self.__readBit | len(results[readIdx])) + bytes(results[readIdx]))
+                readIdx = readIdx + 1
+        
+        flags = (len(msgs) << 4) | (self.flagFailed if failed else 0)
+        
+        with self.__lock:
+            if (self.__lastEpoch is None) or (epoch < self.__lastEpoch) or ((epoch - self.__lastEpoch) > self.__maxDelta):
+                header = struct.pack(self.__recordFmt, msgs[0][1], flags | self.__flagAbsolute, 0) + struct.pack("<q", epoch)
+            else:
+                header = struct.pack(self.__recordFmt, msgs[0][1], flags, epoch - self.__lastEpoch)
+            
+            self.__lastEpoch = epoch
+            
+            try:
+                self.__file.write(header + b"".join(body))
+            
+            except Exception as e:
+                raise e
+    
+    def read(self):
+        """
+        read()
+        
+        Generator that reads the log from the start. Yields a tuple for each transaction: epoch microseconds, device address, whether it failed, and a list of messages,
+        which are ("w", bytes written) or ("r", bytes read). Failed reads have the byte count that was asked for instead of bytes.
+        """
+        
+        try:
+            logFile = open(self.logFile, "rb")
+        
+        except Exception as e:
+            raise e
+        
+        with logFile:
+            header = logFile.read(self.__headerSize)
+            
+            if len(header) < self.__headerSize:
+                return
+            
+            magic, version, reserved = struct.unpack(self.__headerFmt, header)
+            
+            if (magic != self.__magic) or (version != self.__version):
+                raise ValueError("owsI2cLog: " + str(self.logFile) + " isn't an I2C capture log we can read.")
+            
+            # Map the log so long captures don't have to be read into memory.
+            data = mmap.mmap(logFile.fileno(), 0, access = mmap.ACCESS_READ)
+            
+            try:
+                offset = self.__headerSize
+                epoch = 0
+                dataLen = len(data)
+                
+                while (offset + self.__recordSize) <= dataLen:
+                    addr, flags, delta = struct.unpack_from(self.__recordFmt, data, offset)
+                    pos = offset + self.__recordSize
+                    
+                    if flags & self.__flagAbsolute:
+                        if (pos + 8) > dataLen:
+                            return
+                        
+                        recordEpoch = struct.unpack_from("<q", data, pos)[0]
+                        pos = pos + 8
+                    else:
+                        recordEpoch = epoch + delta
+                    
+                    failed = bool(flags & self.flagFailed)
+                    msgs = []
+                    
+                    for i in range(flags >> 4):
+                        if pos >= dataLen:
+                            return
+                        
+                        kind = "r" if (data[pos] & self.__readBit) else "w"
+                        length = data[pos] & ~self.__readBit
+                        pos = pos + 1
+                        
+                        # Failed reads just have the byte count.
+                        if failed and (kind == "r"):
+                            msgs.append((kind, length))
+                            continue
+                        
+                        if (pos + length) > dataLen:
+                            return
+                        
+                        msgs.append((kind, data[pos:pos + length]))
+                        pos = pos + length
+                    
+                    # The record is all there.
+                    yield (recordEpoch, addr, failed, msgs)
+                    
+                    epoch = recordEpoch
+                    offset = pos
+            
+            finally:
+                data.close()
+    
+    def close(self):
+        """
+        close()
+        
+        Close the log.
+        """
+        
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
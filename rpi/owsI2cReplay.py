@@ -0,0 +1,136 @@
+# OpenWeatherStn I2C capture replay by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import collections
+import datetime
+
+# Raw transaction capture
+from owsI2cLog import owsI2cLog
+
+######################
+# owsI2cReplay class #
+######################
+
+class owsI2cReplay:
+    """
+    owsI2cReplay - a bus that plays back an owsI2cLog capture through the same drivers that recorded it, as fast as they can ask for it. Set owsI2c.bus to one of these before creating sensor
+    objects to use it. Each transaction is answered with the next captured transaction that asked the same device for the same thing, so the scanner and the wind sampler's reads don't get
+    mixed up even though they were captured interleaved. Captured transactions that failed fail again. Transactions the drivers no longer make are skipped once they're more than window seconds
+    behind the capture. Writes that weren't captured are accepted. Once a read asks for something the rest of the capture doesn't have, exhausted is set and the read fails.
+    The constructor accepts one argument and one optional argument:
+    
+    logFile: path to the capture log.
+    window: how many seconds behind the capture a transaction can be before it's skipped. Defaults to 120.
+    """
+    
+    def __init__(self, logFile, window = 120):
+        self.__records = owsI2cLog(logFile).read()
+        self.__window = int(window * 1000000)
+        
+        # Captured transactions we've read ahead to, waiting for a driver to ask for them, by what they asked for.
+        self.__pending = {}
+        self.__ahead = collections.deque()
+        
+        # Capture time of the last transaction we answered.
+        self.__lastEpoch = None
+        
+        # Did we run out of capture?
+        self.exhausted = False
+        
+        # Counters.
+        self.transactions = 0
+        self.skipped = 0
+    
+    def __getKey(self, addr, msgs):
+        """
+        __getKey(addr, msgs)
+        
+        Get what a transaction asks for: the device address, and the bytes written or number of bytes read by each message. Returns a tuple.
+        """
+        
+        return (addr,) + tuple([(kind, bytes(data) if kind == "w" else (data if isinstance(data, int) else len(data))) for kind, data in msgs])
+    
+    def __readAhead(self, key):
+        """
+        __readAhead(key)
+        
+        Read the capture until we find a transaction for key, keeping the ones we pass for later and skipping ones that have fallen too far behind. Returns True if we found one.
+        """
+        
+        for epoch, addr, failed, msgs in self.__records:
+            recordKey = self.__getKey(addr, msgs)
+            self.__pending.setdefault(recordKey, collections.deque()).append((epoch, failed, msgs))
+            self.__ahead.append((epoch, recordKey))
+            
+            # Skip what nobody asked for in time.
+            while (len(self.__ahead) > 0) and ((epoch - self.__ahead[0][0]) > self.__window):
+                oldEpoch, oldKey = self.__ahead.popleft()
+                queue = self.__pending.get(oldKey)
+                
+                if (queue is not None) and (len(queue) > 0) and (queue[0][0] == oldEpoch):
+                    queue.popleft()
+                    self.skipped = self.skipped + 1
+            
+            if recordKey == key:
+                return True
+        
+        return False
+    
+    def transaction(self, *msgs):
+        """
+        transaction(*msgs)
+        
+        Answer owsI2c's messages with the next matching captured transaction. Returns a list with a bytes object for each read. Raises IOError if the captured transaction failed,
+        or if there's nothing left in the capture to answer with.
+        """
+        
+        addr = msgs[0][1]
+        key = self.__getKey(addr, [(kind, data) for kind, msgAddr, data in msgs])
+        queue = self.__pending.get(key)
+        
+        # Writes don't need an answer, so don't read ahead for them.
+        isRead = any([kind == "r" for kind, msgAddr, data in msgs])
+        
+        if ((queue is None) or (len(queue) == 0)) and isRead:
+            if not self.__readAhead(key):
+                self.exhausted = True
+                raise IOError("owsI2cReplay: Capture has nothing left for the device at " + hex(addr) + ".")
+            
+            queue = self.__pending[key]
+        
+        self.transactions = self.transactions + 1
+        
+        if (queue is None) or (len(queue) == 0):
+            return []
+        
+        epoch, failed, captured = queue.popleft()
+        self.__lastEpoch = epoch
+        
+        if failed:
+            raise IOError("owsI2cReplay: Captured transaction with the device at " + hex(addr) + " failed.")
+        
+        return [bytes(data) for kind, data in captured if kind == "r"]
+    
+    def sleep(self, seconds):
+        """
+        sleep(seconds)
+        
+        Waits are skipped so captures play back as fast as possible.
+        """
+        
+        pass
+    
+    def getDts(self):
+        """
+        getDts()
+        
+        Get when the last transaction we answered was captured, so reprocessed records get their original times. Returns a UTC datetime, or None if we haven't answered any.
+        """
+        
+        if self.__lastEpoch is None:
+            return None
+        
+        return datetime.datetime(1970, 1, 1) + datetime.timedelta(microseconds = self.__lastEpoch)
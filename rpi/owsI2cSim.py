@@ -0,0 +1,290 @@
+# OpenWeatherStn simulated I2C bus by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import math
+import random
+import time
+
+###################
+# owsI2cSim class #
+###################
+
+class owsI2cSim:
+    """
+    owsI2cSim - a simulated I2C bus with the station's sensors on it: the AM2315, MCP9808, MPL115A2, HMC5883L, and the compound weather sensor at their default addresses. Each device answers
+    the same messages the real one does, with registers built from the current weather in the weather dict. Readings get a little random noise so sample validation doesn't think they're stuck.
+    Set owsI2c.bus to one of these before creating sensor objects to use it, and play back generated weather with play() and advance(). Waits don't sleep by default, but the time the bus
+    and the devices would have taken is added up in busSeconds and sleepSeconds. The constructor accepts four optional arguments:
+    
+    seed: seed for the noise, so runs are repeatable. Defaults to 0.
+    windOffset: the anemometer's DC offset as an ADC reading, which should match the scanner's. Defaults to 79.
+    busHz: the bus clock used to work out busSeconds. Defaults to 100000.
+    realSleep: set to True to actually wait in sleep(). Defaults to False.
+    """
+    
+    def __init__(self, seed = 0, windOffset = 79, busHz = 100000, realSleep = False):
+        self.__random = random.Random(seed)
+        self.__windOffset = windOffset
+        self.__busHz = busHz
+        self.__realSleep = realSleep
+        
+        # Current conditions. Temperatures are in degrees C, pressure in kPa, wind in kph and degrees, and the rain counter in counts.
+        self.weather = {"temp": 15.0, "humid": 60.0, "baro": 101.3, "windKph": 12.0, "windDir": 225.0, "rain": 0, "light": 128, "sysTemp": 30.0}
+        
+        # How much noise to add to each reading.
+        self.noise = {"temp": 0.2, "humid": 0.5, "baro": 0.05, "windKph": 1.0, "windDir": 2.0, "light": 2, "sysTemp": 0.1}
+        
+        # Device addresses.
+        self.addrAm2315 = 0x5c
+        self.addrMcp9808 = 0x18
+        self.addrMpl115a2 = 0x60
+        self.addrHmc5883l = 0x1e
+        self.addrCmpd = 0x64
+        
+        # Register each device's register pointer is on, and the registers that have been written.
+        self.__pointer = {}
+        self.__written = {}
+        
+        # Last command sent to the AM2315.
+        self.__am2315Cmd = None
+        
+        # Reads and writes are handed to each device's functions.
+        self.__devices = {self.addrAm2315: (self.__am2315Write, self.__am2315Read), self.addrMcp9808: (self.__pointerWrite, self.__mcp9808Read), \
+            self.addrMpl115a2: (self.__pointerWrite, self.__mpl115a2Read), self.addrHmc5883l: (self.__pointerWrite, self.__hmc5883lRead), \
+            self.addrCmpd: (self.__pointerWrite, self.__cmpdRead)}
+        
+        # Frames of weather to play back.
+        self.__frames = iter([])
+        
+        # Counters.
+        self.transactions = 0
+        self.busSeconds = 0.0
+        self.sleepSeconds = 0.0
+    
+    def transaction(self, *msgs):
+        """
+        transaction(*msgs)
+        
+        Run owsI2c's messages against the simulated devices. Returns a list with a bytes object for each read. Raises IOError if nothing is at a message's address, like the real bus would.
+        """
+        
+        results = []
+        bitCt = 0
+        
+        for kind, addr, data in msgs:
+            if addr not in self.__devices:
+                raise IOError("owsI2cSim: No device at address " + hex(addr) + ".")
+            
+            write, read = self.__devices[addr]
+            
+            if kind == "w":
+                write(addr, data)
+                byteCt = len(data)
+            
+            else:
+                results.append(bytes(read(addr, data)))
+                byteCt = data
+            
+            # Start, the address, and the data bytes, each with an ack.
+            bitCt = bitCt + 1 + ((byteCt + 1) * 9)
+        
+        self.transactions = self.transactions + 1
+        self.busSeconds = self.busSeconds + (bitCt + 1) / float(self.__busHz)
+        
+        return results
+    
+    def sleep(self, seconds):
+        """
+        sleep(seconds)
+        
+        Wait for a device. This only counts the time unless realSleep was set.
+        """
+        
+        self.sleepSeconds = self.sleepSeconds + seconds
+        
+        if self.__realSleep:
+            time.sleep(seconds)
+    
+    def play(self, frames):
+        """
+        play(frames)
+        
+        Queue up a list of weather dicts, like the ones owsSynth.getFrames() makes, to play back one at a time with advance().
+        """
+        
+        self.__frames = iter(frames)
+    
+    def advance(self):
+        """
+        advance()
+        
+        Set the weather to the next queued frame. Returns False if there aren't any left.
+        """
+        
+        try:
+            self.weather.update(next(self.__frames))
+        
+        except StopIteration:
+            return False
+        
+        return True
+    
+    def __noisy(self, name):
+        """
+        __noisy(name)
+        
+        Get the current value of a weather reading with noise added.
+        """
+        
+        return self.weather[name] + self.__random.uniform(-self.noise[name], self.noise[name])
+    
+    def __pointerWrite(self, addr, data):
+        """
+        __pointerWrite(addr, data)
+        
+        Write to a device with a register pointer. The first byte sets the pointer, and any others are written to registers from there on.
+        """
+        
+        if len(data) == 0:
+            return
+        
+        self.__pointer[addr] = data[0]
+        
+        written = self.__written.setdefault(addr, {})
+        
+        for i in range(1, len(data)):
+            written[data[0] + i - 1] = data[i]
+    
+    def __registers(self, addr, regs, byteCt):
+        """
+        __registers(addr, regs, byteCt)
+        
+        Read byteCt bytes from a list of register values starting at the device's register pointer. Registers that have been written read back what was written.
+        """
+        
+        start = self.__pointer.get(addr, 0)
+        written = self.__written.get(addr, {})
+        
+        return [written.get(reg, regs[reg] if reg < len(regs) else 0) for reg in range(start, start + byteCt)]
+    
+    def __word(self, value):
+        """
+        __word(value)
+        
+        Split a 16 bit value into an MSB and LSB.
+        """
+        
+        value = int(value) & 0xffff
+        
+        return [value >> 8, value & 0xff]
+    
+    def __am2315Write(self, addr, data):
+        """
+        __am2315Write(addr, data)
+        
+        Commands for the AM2315 are a function code, the first register, and a register count.
+        """
+        
+        self.__am2315Cmd = data
+    
+    def __am2315Read(self, addr, byteCt):
+        """
+        __am2315Read(addr, byteCt)
+        
+        The AM2315 answers with the function code, the byte count, the registers, and a CRC. Temperature and humidity are 10x, and negative temperatures set the top bit.
+        """
+        
+        if self.__am2315Cmd is None:
+            raise IOError("owsI2cSim: AM2315 has nothing to send.")
+        
+        humid = round(min(100.0, max(0.0, self.__noisy("humid"))) * 10)
+        temp = round(self.__noisy("temp") * 10)
+        
+        if temp < 0:
+            temp = 0x8000 | -temp
+        
+        regs = self.__word(humid) + self.__word(temp)
+        response = [self.__am2315Cmd[0], self.__am2315Cmd[2]] + regs[:self.__am2315Cmd[2]] + [0, 0]
+        
+        return (response + [0] * byteCt)[:byteCt]
+    
+    def __mcp9808Read(self, addr, byteCt):
+        """
+        __mcp9808Read(addr, byteCt)
+        
+        The MCP9808's registers are 16 bits, except the resolution register. Ambient temperature is a 13 bit two's compliment number with a 0.0625 degree LSB.
+        """
+        
+        reg = self.__pointer.get(addr, 0)
+        written = self.__written.get(addr, {})
+        
+        if reg == 0x05:
+            value = self.__word(round(self.__noisy("sysTemp") / 0.0625) & 0x1fff)
+        
+        elif reg == 0x06:
+            value = self.__word(0x0054)
+        
+        elif reg == 0x07:
+            value = self.__word(0x0400)
+        
+        else:
+            # Writable registers read back what was written.
+            value = [written.get(reg, 0), written.get(reg + 1, 0)]
+        
+        return (value + [0] * byteCt)[:byteCt]
+    
+    def __mpl115a2Read(self, addr, byteCt):
+        """
+        __mpl115a2Read(addr, byteCt)
+        
+        The MPL115A2's coefficients are set so the compensated pressure is the pressure ADC reading, which makes the ADC easy to work backwards from the pressure we want.
+        Both ADC readings are 10 bits lined up with the top of a 16 bit register.
+        """
+        
+        pAdc = min(1023, max(0, round((self.__noisy("baro") - 50.0) * 1023.0 / 65.0)))
+        tAdc = min(1023, max(0, round((25.0 - self.__noisy("temp")) * 5.35 + 498.0)))
+        
+        # a0 = 0, b1 = 1.0, b2 = 0, c12 = 0
+        regs = self.__word(pAdc << 6) + self.__word(tAdc << 6) + [0x00, 0x00, 0x20, 0x00, 0x00, 0x00, 0x00, 0x00]
+        
+        return self.__registers(addr, regs, byteCt)
+    
+    def __hmc5883lRead(self, addr, byteCt):
+        """
+        __hmc5883lRead(addr, byteCt)
+        
+        The HMC5883L's field points the way the vein does, with X and Y laid out so the scanner's heading comes out as the wind direction when the magnetometer isn't calibrated.
+        The data is always ready.
+        """
+        
+        heading = math.radians(self.__noisy("windDir"))
+        field = 400.0
+        
+        x = round(field * math.sin(heading))
+        y = round(field * math.cos(heading))
+        z = round(self.__random.uniform(-100.0, -96.0))
+        
+        regs = [0x10, 0x20, 0x00] + self.__word(x) + self.__word(z) + self.__word(y) + [0x01, 0x48, 0x34, 0x33]
+        
+        return self.__registers(addr, regs, byteCt)
+    
+    def __cmpdRead(self, addr, byteCt):
+        """
+        __cmpdRead(addr, byteCt)
+        
+        The compound sensor is running firmware 0.7 with an anemometer, rain gauge, and light sensor, and always has data.
+        """
+        
+        windAvg = self.__windOffset + max(0.0, self.__noisy("windKph")) / 3.6 * 328.0 / 32.0
+        windMax = windAvg * 1.3
+        windNow = self.__windOffset + max(0.0, self.__noisy("windKph")) / 3.6 * 328.0 / 32.0
+        rain = int(self.weather['rain']) & 0xffffffff
+        light = min(255, max(0, round(self.__noisy("light"))))
+        
+        regs = [0, 7, 0x1e, (rain >> 24) & 0xff, (rain >> 16) & 0xff, (rain >> 8) & 0xff, rain & 0xff] + self.__word(round(windAvg)) + self.__word(round(windMax)) + \
+            [light] + self.__word(round(windNow))
+        
+        return self.__registers(addr, regs, byteCt)
@@ -0,0 +1,219 @@
+# OpenWeatherStn magnetometer calibration by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+# Add support for date and time processing
+import datetime
+
+# Calibration files are stored as JSON.
+import json
+
+# We need to do some trig.
+import math
+
+# Import support for timing
+import time
+
+# NumPy is only needed to fit calibrations and for batch processing.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+###################
+# owsMagCal class #
+###################
+
+class owsMagCal:
+    """
+    owsMagCal - hard and soft iron calibration for the wind vein's magnetometer. The calibration is a precomputed affine transform applied to the X and Y axis readings:
+    
+    [x', y'] = matrix * [x, y] + offset
+    
+    The constructor accepts one optional argument:
+    
+    calFile: path to a JSON calibration file to load. If it's None, the file doesn't exist, or it doesn't hold a calibration we use the identity transform, which is the same as no calibration.
+    """
+    
+    def __init__(self, calFile = None):
+        # Start with the identity transform.
+        self.matrix = [[1.0, 0.0], [0.0, 1.0]]
+        self.offset = [0.0, 0.0]
+        
+        # Center of the fitted ellipse (the hard iron offset) and the number of samples used to fit it.
+        self.center = [0.0, 0.0]
+        self.sampleCount = 0
+        
+        # Are we actually calibrated?
+        self.calibrated = False
+        
+        # Try to load our calibration.
+        if calFile is not None:
+            try:
+                self.load(calFile)
+            
+            except IOError:
+                print("owsMagCal: No calibration file at " + str(calFile) + ", wind direction is uncalibrated.")
+            
+            # A truncated or hand edited file shouldn't keep the scanner from starting.
+            except (ValueError, KeyError, TypeError) as e:
+                print("owsMagCal: Couldn't load the calibration in " + str(calFile) + " (" + repr(e) + "), wind direction is uncalibrated.")
+    
+    def collect(self, magSens, sampleCount = 600, interval = 0.05):
+        """
+        collect(magSens, [sampleCount = 600], [interval = 0.05])
+        
+        Collect a rotation sweep from a hmc5883l object. The vein should be turned through at least one full circle while this runs. Saturated readings are thrown out. Returns a list of [x, y] pairs.
+        """
+        
+        samples = []
+        
+        # Use the same settings the scanner uses so the calibration matches.
+        magSens.setReg(magSens.regCfgA, (magSens.avg1 | magSens.freq15 | magSens.biasNone))
+        magSens.setReg(magSens.regCfgB, magSens.gain230)
+        magSens.setReg(magSens.regMode, magSens.modeCont)
+        
+        while len(samples) < sampleCount:
+            try:
+                magData = magSens.getXZY()
+                
+                # Skip samples with a saturated axis.
+                if (magData[0] != 4096) and (magData[2] != 4096):
+                    samples.append([magData[0], magData[2]])
+            
+            except IOError:
+                # Data wasn't ready, just try again.
+                pass
+            
+            time.sleep(interval)
+        
+        return samples
+    
+    def fit(self, samples):
+        """
+        fit(samples)
+        
+        Fit hard and soft iron corrections to a rotation sweep given as a list of [x, y] pairs. The sweep is fit to an ellipse using least squares, and the transform that maps it back to a circle centered at the origin is stored. Requires NumPy.
+        """
+        
+        if np is None:
+            raise ImportError("owsMagCal: NumPy is required to fit a calibration.")
+        
+        pts = np.asarray(samples, dtype = np.float64)
+        
+        # We need at least five points to fit a conic, and a lot more for a good fit.
+        if pts.shape[0] < 5:
+            raise ValueError("owsMagCal: Need at least 5 samples to fit a calibration.")
+        
+        x = pts[:, 0]
+        y = pts[:, 1]
+        
+        # Fit a x^2 + b xy + c y^2 + d x + e y = 1.
+        design = np.column_stack((x * x, x * y, y * y, x, y))
+        a, b, c, d, e = np.linalg.lstsq(design, np.ones(pts.shape[0]), rcond = None)[0]
+        
+        # The center of the ellipse is the hard iron offset.
+        center = np.linalg.solve(np.array([[2.0 * a, b], [b, 2.0 * c]]), np.array([-d, -e]))
+        
+        # Shift the conic to the center, which gives us v' A v = 1 for the soft iron distortion.
+        k = 1.0 + a * center[0] ** 2 + b * center[0] * center[1] + c * center[1] ** 2
+        shape = np.array([[a, b / 2.0], [b / 2.0, c]]) / k
+        
+        # Both eigenvalues have to be positive or this isn't an ellipse.
+        evals, evecs = np.linalg.eigh(shape)
+        
+        if np.any(evals <= 0):
+            raise ValueError("owsMagCal: Samples don't fit an ellipse. Make sure the vein was turned through a full circle.")
+        
+        # The square root of the shape matrix maps the ellipse to the unit circle. Scale it back up
+        # by the geometric mean of the semi axes so corrected readings keep roughly the same magnitude.
+        radius = 1.0 / math.sqrt(math.sqrt(evals[0] * evals[1]))
+        matrix = radius * (evecs.dot(np.diag(np.sqrt(evals))).dot(evecs.T))
+        
+        # Precompute the offset so correcting a sample is one affine transform.
+        self.matrix = matrix.tolist()
+        self.offset = (-matrix.dot(center)).tolist()
+        self.center = center.tolist()
+        self.sampleCount = int(pts.shape[0])
+        self.calibrated = True
+    
+    def apply(self, x, y):
+        """
+        apply(x, y)
+        
+        Apply the calibration to a single X and Y reading. Returns a tuple with the corrected X and Y values.
+        """
+        
+        m = self.matrix
+        
+        return (m[0][0] * x + m[0][1] * y + self.offset[0], m[1][0] * x + m[1][1] * y + self.offset[1])
+    
+    def applyBatch(self, x, y):
+        """
+        applyBatch(x, y)
+        
+        Apply the calibration to arrays of X and Y readings at once. Returns a tuple with arrays of corrected X and Y values. Requires NumPy.
+        """
+        
+        x = np.asarray(x, dtype = np.float64)
+        y = np.asarray(y, dtype = np.float64)
+        m = self.matrix
+        
+        return (m[0][0] * x + m[0][1] * y + self.offset[0], m[1][0] * x + m[1][1] * y + self.offset[1])
+    
+    def getHeadingBatch(self, x, y, magOffset = 0):
+        """
+        getHeadingBatch(x, y, [magOffset = 0])
+        
+        Get calibrated headings for arrays of X and Y readings, in the same way owsScanner.getWindDir() does for a single reading. Returns an array of headings between 0 and 360 degrees rounded to one decimal place. Requires NumPy.
+        """
+        
+        cx, cy = self.applyBatch(x, y)
+        
+        # Compute heading, move it to 0 - 360 and add the station's offset.
+        heading = np.mod(np.degrees(np.arctan2(cx, cy)) + magOffset, 360.0)
+        
+        return np.round(heading, 1)
+    
+    def load(self, calFile):
+        """
+        load(calFile)
+        
+        Load a calibration from a JSON file. Raises ValueError if the file isn't JSON, KeyError if it's missing the matrix or offset, and TypeError or ValueError if they aren't numbers
+        in the right shape. The calibration we had is kept if loading fails.
+        """
+        
+        with open(calFile, "r") as f:
+            calData = json.load(f)
+        
+        # Check everything before we use any of it.
+        matrix = [[float(value) for value in row] for row in calData['matrix']]
+        offset = [float(value) for value in calData['offset']]
+        center = [float(value) for value in calData.get('center', [0.0, 0.0])]
+        
+        if (len(matrix) != 2) or (len(matrix[0]) != 2) or (len(matrix[1]) != 2) or (len(offset) != 2) or (len(center) != 2):
+            raise ValueError("owsMagCal: " + str(calFile) + " doesn't hold a 2x2 matrix and two value offset and center.")
+        
+        self.matrix = matrix
+        self.offset = offset
+        self.center = center
+        self.sampleCount = int(calData.get('samples', 0))
+        self.calibrated = True
+    
+    def save(self, calFile):
+        """
+        save(calFile)
+        
+        Save the calibration to a JSON file.
+        """
+        
+        calData = {"created": str(datetime.datetime.utcnow()), \
+            "samples": self.sampleCount, \
+            "center": self.center, \
+            "matrix": self.matrix, \
+            "offset": self.offset}
+        
+        with open(calFile, "w") as f:
+            json.dump(calData, f, indent = 4)
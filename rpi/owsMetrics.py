@@ -0,0 +1,305 @@
+# OpenWeatherStn performance counters by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+####################
+# owsMetrics class #
+####################
+
+class owsMetrics:
+    """
+    owsMetrics - counters, gauges, and histograms kept in memory and rendered in the Prometheus text format. Updating a metric only touches a dict, so it's cheap enough for every I2C transaction
+    and database call. Each process keeps its own metrics in registry, and the scanner saves a snapshot of its metrics to a file so weatherService can serve them along with its own.
+    Metrics are created the first time they're used, and describe() adds help text. Labels are a dict of label name to value.
+    """
+    
+    def __init__(self):
+        # Metrics by name, each a dict with the type, help text, histogram buckets, and values by label tuple.
+        self.__metrics = {}
+        
+        # Histogram buckets in seconds, from half a millisecond up.
+        self.defaultBuckets = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+        
+        # Several threads update metrics at once in the scanner.
+        self.__lock = threading.Lock()
+        
+        # Snapshots we've loaded by file name, with the file's modification time.
+        self.__snapshots = {}
+        
+        # When we were imported, for processes that can't tell us when they started.
+        self.__importTime = time.monotonic()
+    
+    def __getMetric(self, name, metricType, buckets = None):
+        """
+        __getMetric(name, metricType, [buckets = None])
+        
+        Get a metric by name, creating it if it doesn't exist. The caller holds the lock. Returns the metric's dict.
+        """
+        
+        if name not in self.__metrics:
+            self.__metrics[name] = {"type": metricType, "help": "", "buckets": self.defaultBuckets if buckets is None else sorted(buckets), "values": {}}
+        
+        return self.__metrics[name]
+    
+    def __getLabelKey(self, labels):
+        """
+        __getLabelKey(labels)
+        
+        Turn a dict of labels into something we can use as a dict key. Returns a tuple of (name, value) tuples.
+        """
+        
+        if labels is None:
+            return ()
+        
+        return tuple(sorted([(str(k), str(v)) for k, v in labels.items()]))
+    
+    def describe(self, name, metricType, helpText, buckets = None):
+        """
+        describe(name, metricType, helpText, [buckets = None])
+        
+        Set up a metric with a type ("counter", "gauge", or "histogram"), help text, and optionally histogram bucket upper bounds. Counter names should end in _total.
+        """
+        
+        with self.__lock:
+            metric = self.__getMetric(name, metricType, buckets)
+            metric['help'] = helpText
+    
+    def inc(self, name, labels = None, value = 1):
+        """
+        inc(name, [labels = None], [value = 1])
+        
+        Add value to a counter.
+        """
+        
+        labelKey = self.__getLabelKey(labels)
+        
+        with self.__lock:
+            values = self.__getMetric(name, "counter")['values']
+            values[labelKey] = values.get(labelKey, 0) + value
+    
+    def set(self, name, value, labels = None):
+        """
+        set(name, value, [labels = None])
+        
+        Set a gauge. A value of None removes the gauge's series, so readings we don't have aren't exported.
+        """
+        
+        labelKey = self.__getLabelKey(labels)
+        
+        with self.__lock:
+            values = self.__getMetric(name, "gauge")['values']
+            
+            if value is None:
+                values.pop(labelKey, None)
+            else:
+                values[labelKey] = value
+    
+    def observe(self, name, value, labels = None):
+        """
+        observe(name, value, [labels = None])
+        
+        Add an observation to a histogram.
+        """
+        
+        labelKey = self.__getLabelKey(labels)
+        
+        with self.__lock:
+            metric = self.__getMetric(name, "histogram")
+            
+            # Each series has a count for each bucket, the sum, and the count.
+            if labelKey not in metric['values']:
+                metric['values'][labelKey] = [0] * len(metric['buckets']) + [0.0, 0]
+            
+            series = metric['values'][labelKey]
+            
+            for i in range(len(metric['buckets'])):
+                if value <= metric['buckets'][i]:
+                    series[i] = series[i] + 1
+                    break
+            
+            series[-2] = series[-2] + value
+            series[-1] = series[-1] + 1
+    
+    @contextmanager
+    def timer(self, name, labels = None):
+        """
+        timer(name, [labels = None])
+        
+        Context manager that adds how long its block took in seconds to a histogram, even if the block raises an exception.
+        """
+        
+        start = time.perf_counter()
+        
+        try:
+            yield
+        
+        finally:
+            self.observe(name, time.perf_counter() - start, labels)
+    
+    def getUptime(self):
+        """
+        getUptime()
+        
+        Get how long this process has been running in seconds, counting the interpreter starting up and imports. Linux tells us when the process started, and anywhere else we count from
+        when owsMetrics was imported. Returns a float.
+        """
+        
+        try:
+            # The process start time is the 22nd field, after the command name which can have spaces in it.
+            with open("/proc/self/stat", "r") as statFile:
+                startTicks = int(statFile.read().rsplit(")", 1)[1].split()[19])
+            
+            with open("/proc/uptime", "r") as uptimeFile:
+                uptime = float(uptimeFile.read().split()[0])
+            
+            return max(uptime - (startTicks / float(os.sysconf("SC_CLK_TCK"))), 0.0)
+        
+        except (OSError, ValueError, IndexError):
+            return time.monotonic() - self.__importTime
+    
+    def getSnapshot(self, process):
+        """
+        getSnapshot(process)
+        
+        Get a copy of every metric that can be saved as JSON, tagged with the name of the process it came from. Returns a dict.
+        """
+        
+        with self.__lock:
+            metrics = {}
+            
+            for name, metric in self.__metrics.items():
+                metrics[name] = {"type": metric['type'], "help": metric['help'], "buckets": list(metric['buckets']), \
+                    "values": [[list(labelKey), list(value) if isinstance(value, list) else value] for labelKey, value in metric['values'].items()]}
+        
+        return {"process": process, "dts": time.time(), "metrics": metrics}
+    
+    def saveSnapshot(self, fileName, process):
+        """
+        saveSnapshot(fileName, process)
+        
+        Save a snapshot of every metric to a JSON file. The file is replaced all at once, so readers never see half of it.
+        """
+        
+        try:
+            with open(fileName + ".tmp", "w") as snapFile:
+                json.dump(self.getSnapshot(process), snapFile)
+            
+            os.replace(fileName + ".tmp", fileName)
+        
+        except Exception as e:
+            raise e
+    
+    def loadSnapshot(self, fileName):
+        """
+        loadSnapshot(fileName)
+        
+        Load a snapshot saved by saveSnapshot(). The file is only read again when it changes. Returns the snapshot dict, or None if there's no snapshot file.
+        """
+        
+        try:
+            modified = os.stat(fileName).st_mtime
+        
+        except OSError:
+            return None
+        
+        if (fileName not in self.__snapshots) or (self.__snapshots[fileName][0] != modified):
+            try:
+                with open(fileName, "r") as snapFile:
+                    self.__snapshots[fileName] = (modified, json.load(snapFile))
+            
+            except ValueError:
+                # The file was being replaced while we read it. We'll get it next time.
+                return self.__snapshots.get(fileName, (None, None))[1]
+        
+        return self.__snapshots[fileName][1]
+    
+    def __formatLabels(self, labels):
+        """
+        __formatLabels(labels)
+        
+        Format a list of (name, value) pairs as Prometheus labels. Returns a string.
+        """
+        
+        if len(labels) == 0:
+            return ""
+        
+        return "{" + ",".join([str(k) + "=\"" + str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") + "\"" for k, v in labels]) + "}"
+    
+    def __formatNumber(self, value):
+        """
+        __formatNumber(value)
+        
+        Format a number for Prometheus. Returns a string.
+        """
+        
+        if value != value:
+            return "NaN"
+        elif value == float("inf"):
+            return "+Inf"
+        elif value == float("-inf"):
+            return "-Inf"
+        
+        return repr(value)
+    
+    def render(self, snapshots):
+        """
+        render(snapshots)
+        
+        Render a list of snapshots from getSnapshot() or loadSnapshot() in the Prometheus text format. Every series gets a process label with the name of the process it came from. Returns a string.
+        """
+        
+        lines = []
+        
+        # Group each metric's series from every snapshot together.
+        names = []
+        
+        for snapshot in snapshots:
+            for name in snapshot['metrics']:
+                if name not in names:
+                    names.append(name)
+        
+        for name in sorted(names):
+            described = False
+            
+            for snapshot in snapshots:
+                if name not in snapshot['metrics']:
+                    continue
+                
+                metric = snapshot['metrics'][name]
+                
+                if not described:
+                    if metric['help'] != "":
+                        lines.append("# HELP " + name + " " + metric['help'].replace("\\", "\\\\").replace("\n", "\\n"))
+                    
+                    lines.append("# TYPE " + name + " " + metric['type'])
+                    described = True
+                
+                for labelKey, value in metric['values']:
+                    labels = [("process", snapshot['process'])] + [tuple(label) for label in labelKey]
+                    
+                    if metric['type'] == "histogram":
+                        # Buckets are cumulative.
+                        count = 0
+                        
+                        for i in range(len(metric['buckets'])):
+                            count = count + value[i]
+                            lines.append(name + "_bucket" + self.__formatLabels(labels + [("le", self.__formatNumber(float(metric['buckets'][i])))]) + " " + str(count))
+                        
+                        lines.append(name + "_bucket" + self.__formatLabels(labels + [("le", "+Inf")]) + " " + str(value[-1]))
+                        lines.append(name + "_sum" + self.__formatLabels(labels) + " " + self.__formatNumber(value[-2]))
+                        lines.append(name + "_count" + self.__formatLabels(labels) + " " + str(value[-1]))
+                    else:
+                        lines.append(name + self.__formatLabels(labels) + " " + self.__formatNumber(value))
+        
+        return "\n".join(lines) + "\n"
+
+# Metrics for this process.
+registry = owsMetrics()
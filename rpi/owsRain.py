@@ -0,0 +1,103 @@
+# OpenWeatherStn rain counter processing by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+########################
+# owsRainCounter class #
+########################
+
+class owsRainCounter:
+    """
+    owsRainCounter - turns the compound sensor's rain counter into per-interval deltas and rates. Compound sensor firmware 0.5 and newer reports a 32 bit counter that runs from power up, while older firmware reports the number of hits in the last one minute sample. The constructor accepts one optional argument:
+    
+    mmPerCount: calibration factor in millimeters of rain per count, used to compute mm/h. Defaults to 0.01.
+    """
+    
+    def __init__(self, mmPerCount = 0.01):
+        # Calibration factor.
+        self.__mmPerCount = mmPerCount
+        
+        # The counter is 32 bits wide.
+        self.__counterMod = 1 << 32
+        
+        # If the counter goes backwards from the top half of its range it wrapped, otherwise the sensor was reset.
+        self.__wrapThreshold = 1 << 31
+        
+        # Older firmware reports hits per one minute sample.
+        self.__sampleTime = 60.0
+        
+        # Last count and date time stamp.
+        self.__lastCount = None
+        self.__lastDts = None
+    
+    def prime(self, count, dts):
+        """
+        prime(count, dts)
+        
+        Set the last count and date time stamp we saw, so the first update after a restart has something to compare to. Typically this is the last record in the database.
+        """
+        
+        self.__lastCount = count
+        self.__lastDts = dts
+    
+    def getDelta(self, count, reset = False):
+        """
+        getDelta(count, [reset = False])
+        
+        Get the number of counts since the last count we saw for a cumulative counter. Reset should be True if we know the sensor restarted. Returns an integer, or None if we don't have a last count to compare to.
+        """
+        
+        retVal = None
+        
+        if reset:
+            # The counter started over, so everything it has counted is new.
+            retVal = count
+        elif self.__lastCount is None:
+            retVal = None
+        elif count >= self.__lastCount:
+            retVal = count - self.__lastCount
+        elif self.__lastCount >= self.__wrapThreshold:
+            # The counter wrapped around.
+            retVal = count + self.__counterMod - self.__lastCount
+        else:
+            # The counter went backwards without wrapping, so the sensor was reset and we missed it.
+            retVal = count
+        
+        return retVal
+    
+    def update(self, count, dts, reset = False, cumulative = True):
+        """
+        update(count, dts, [reset = False], [cumulative = True])
+        
+        Process a new counter reading taken at dts, a datetime. Reset should be True if the compound sensor reports its initial poll flag, and cumulative should be False for firmware older than 0.5.
+        Returns a list with the delta in counts [0], the rate in counts per minute [1], and the rate in mm/h [2]. Any of these can be None if they can't be computed.
+        """
+        
+        retVal = [None, None, None]
+        
+        # We can't do anything without a count.
+        if count is None:
+            return retVal
+        
+        if cumulative:
+            delta = self.getDelta(count, reset)
+            
+            # Figure out how long the delta covers.
+            elapsed = None
+            
+            if self.__lastDts is not None:
+                elapsed = (dts - self.__lastDts).total_seconds()
+            
+            self.__lastCount = count
+            self.__lastDts = dts
+        else:
+            # Older firmware gives us the counts for the last sample period.
+            delta = count
+            elapsed = self.__sampleTime
+        
+        retVal[0] = delta
+        
+        # Compute rates if we have a usable interval.
+        if (delta is not None) and (elapsed is not None) and (elapsed > 0):
+            retVal[1] = round(delta * 60.0 / elapsed, 2)
+            retVal[2] = round(delta * self.__mmPerCount * 3600.0 / elapsed, 2)
+        
+        return retVal
@@ -0,0 +1,222 @@
+# OpenWeatherStn memory mapped sample ring buffer by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+# File handling
+import mmap
+import os
+import struct
+
+# NumPy lets readers look at the buffer without copying it.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+#######################
+# owsRingBuffer class #
+#######################
+
+class owsRingBuffer:
+    """
+    owsRingBuffer - fixed size ring buffer of raw samples in a memory mapped file. The writer packs records straight into the mapping, so writing a sample doesn't take a system call,
+    and readers in other processes can look at the same file. Records are a float64 timestamp (seconds since the epoch) followed by a float32 per channel, little endian. The file layout is:
+    
+    Header: "OWSR", format version (uint16), channel count (uint16), record size (uint32), capacity in records (uint32), total records written (uint64)
+    Channel names: 16 bytes each, NUL padded
+    Records: capacity records, starting at a multiple of 8 bytes
+    
+    The constructor requires one argument and accepts three optional arguments:
+    
+    ringFile: path to the ring buffer file.
+    channels: list of channel names. Required when writing.
+    capacity: number of records to hold. Required when writing.
+    writer: set to True to open the buffer for writing. The file is created if it doesn't exist or doesn't match channels and capacity. Defaults to False.
+    """
+    
+    def __init__(self, ringFile, channels = None, capacity = None, writer = False):
+        self.ringFile = ringFile
+        
+        # File format settings.
+        self.__magic = b"OWSR"
+        self.__version = 1
+        self.__headerFmt = "<4sHHIIQ"
+        self.__headerSize = struct.calcsize(self.__headerFmt)
+        self.__nameSize = 16
+        
+        # Where the total record count lives in the header.
+        self.__writeIdxOffset = self.__headerSize - 8
+        
+        self.__writer = writer
+        
+        if writer:
+            if (channels is None) or (capacity is None):
+                raise ValueError("owsRingBuffer: channels and capacity are required to write a ring buffer.")
+            
+            self.__create(channels, capacity)
+        
+        self.__open()
+    
+    def __getLayout(self, channelCt):
+        """
+        __getLayout(channelCt)
+        
+        Get the record format, record size and data offset for a given number of channels. Returns a list.
+        """
+        
+        recordFmt = "<d" + ("f" * channelCt)
+        dataOffset = self.__headerSize + (self.__nameSize * channelCt)
+        
+        # Start records on an 8 byte boundary.
+        dataOffset = (dataOffset + 7) & ~7
+        
+        return [recordFmt, struct.calcsize(recordFmt), dataOffset]
+    
+    def __create(self, channels, capacity):
+        """
+        __create(channels, capacity)
+        
+        Create the ring buffer file, unless one with the same channels and capacity already exists in which case we pick up where it left off.
+        """
+        
+        recordFmt, recordSize, dataOffset = self.__getLayout(len(channels))
+        
+        # See if we can reuse what's there.
+        try:
+            existing = owsRingBuffer(self.ringFile)
+            
+            if (existing.channels == list(channels)) and (existing.capacity == capacity):
+                existing.close()
+                return
+            
+            existing.close()
+        
+        except (IOError, ValueError, struct.error):
+            pass
+        
+        ringDir = os.path.dirname(self.ringFile)
+        
+        if (ringDir != "") and (not os.path.isdir(ringDir)):
+            os.makedirs(ringDir)
+        
+        with open(self.ringFile, "wb") as f:
+            f.write(struct.pack(self.__headerFmt, self.__magic, self.__version, len(channels), recordSize, capacity, 0))
+            
+            for channel in channels:
+                f.write(channel.encode("ascii")[:self.__nameSize].ljust(self.__nameSize, b"\0"))
+            
+            # Size the file all at once.
+            f.truncate(dataOffset + (recordSize * capacity))
+    
+    def __open(self):
+        """
+        __open()
+        
+        Map the ring buffer file and read its layout.
+        """
+        
+        with open(self.ringFile, "r+b" if self.__writer else "rb") as f:
+            self.__mapped = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_WRITE if self.__writer else mmap.ACCESS_READ)
+        
+        magic, version, channelCt, recordSize, capacity, writeIdx = struct.unpack_from(self.__headerFmt, self.__mapped, 0)
+        
+        if (magic != self.__magic) or (version != self.__version):
+            raise ValueError("owsRingBuffer: " + self.ringFile + " isn't a version " + str(self.__version) + " ring buffer.")
+        
+        self.channels = []
+        
+        for i in range(channelCt):
+            offset = self.__headerSize + (i * self.__nameSize)
+            self.channels.append(self.__mapped[offset:offset + self.__nameSize].rstrip(b"\0").decode("ascii"))
+        
+        self.capacity = capacity
+        self.__recordFmt, self.__recordSize, self.__dataOffset = self.__getLayout(channelCt)
+        
+        # Precompile the record format, and keep track of where we write next.
+        self.__record = struct.Struct(self.__recordFmt)
+        self.__writeIdx = writeIdx
+    
+    def close(self):
+        """
+        close()
+        
+        Unmap the ring buffer file.
+        """
+        
+        self.__mapped.close()
+    
+    def getWriteIdx(self):
+        """
+        getWriteIdx()
+        
+        Get the total number of records ever written to the buffer. Returns an integer.
+        """
+        
+        return struct.unpack_from("<Q", self.__mapped, self.__writeIdxOffset)[0]
+    
+    def append(self, dts, values):
+        """
+        append(dts, values)
+        
+        Write a record with a timestamp in seconds since the epoch and a sequence of channel values. Missing values should be NaN.
+        """
+        
+        # Write the record, then publish it by bumping the record count so readers never see half a record.
+        self.__record.pack_into(self.__mapped, self.__dataOffset + ((self.__writeIdx % self.capacity) * self.__recordSize), dts, *values)
+        self.__writeIdx = self.__writeIdx + 1
+        struct.pack_into("<Q", self.__mapped, self.__writeIdxOffset, self.__writeIdx)
+    
+    def getView(self):
+        """
+        getView()
+        
+        Get the whole record area without copying it. With NumPy this is a structured array with a "dts" field and one field per channel, otherwise it's a memoryview. Records are in ring order, not time order.
+        """
+        
+        if np is not None:
+            dtype = np.dtype([("dts", "<f8")] + [(channel, "<f4") for channel in self.channels])
+            
+            return np.frombuffer(self.__mapped, dtype = dtype, count = self.capacity, offset = self.__dataOffset)
+        
+        return memoryview(self.__mapped)[self.__dataOffset:self.__dataOffset + (self.capacity * self.__recordSize)]
+    
+    def getRecent(self, count = None):
+        """
+        getRecent([count = None])
+        
+        Get the last count records in time order, or everything the buffer holds if count is None. With NumPy this is a structured array with a "dts" field and one field per channel, otherwise it's a list of tuples.
+        """
+        
+        writeIdx = self.getWriteIdx()
+        held = min(writeIdx, self.capacity)
+        
+        if (count is None) or (count > held):
+            count = held
+        
+        firstIdx = writeIdx - count
+        view = self.getView()
+        
+        # Pull the records out in time order.
+        start = firstIdx % self.capacity
+        
+        if np is not None:
+            if start + count <= self.capacity:
+                records = view[start:start + count].copy()
+            else:
+                records = np.concatenate((view[start:], view[:(start + count) - self.capacity]))
+        else:
+            records = []
+            
+            for i in range(count):
+                offset = ((start + i) % self.capacity) * self.__recordSize
+                records.append(self.__record.unpack_from(view, offset))
+        
+        # If the writer lapped us while we were copying, drop the records that were overwritten.
+        overwritten = (self.getWriteIdx() - self.capacity) - firstIdx
+        
+        if overwritten > 0:
+            records = records[overwritten:]
+        
+        return records
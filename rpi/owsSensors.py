@@ -0,0 +1,194 @@
+# OpenWeatherStn sensor registry by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import importlib
+import re
+
+####################
+# owsSensors class #
+####################
+
+class owsSensors:
+    """
+    owsSensors - the sensors the scanner knows how to read. Each sensor is registered with the channels it reads, how long a read takes, how often it needs reading, a function that loads its
+    driver, and a function that decodes a reading. The scanner reads whatever is registered and the data layer stores each channel in a column with the channel's name, so new sensors only need
+    a plugin module that registers them, listed in the config file's plugins setting. Plugins register with the module level sensorRegistry when they're imported:
+    
+    sensorRegistry.register("uv", [("uvIndex", "REAL")], loadUv, readUv, cost = 0.02, minInterval = 300, description = "UV sensor")
+    
+    loadUv(scanner) returns the driver object, and should import the driver so it's only loaded if the sensor is installed. readUv(scanner, driver) reads the sensor and returns a dict of channel
+    name to value, raising an exception if the read failed. Channels with a type of None are passed to the scanner but not stored. The built in sensors are registered when the registry is created.
+    """
+    
+    def __init__(self):
+        # Sensors by name, and their names in the order they were registered, which is the order they're read in.
+        self.__sensors = {}
+        self.__order = []
+        
+        # Measured read times in seconds by sensor, and how much each new measurement counts.
+        self.__measuredCost = {}
+        self.__costWeight = 0.2
+        
+        # Channels are stored in columns, so they need names SQLite takes as is and types the data layer understands.
+        self.__channelName = re.compile(r"^[A-Za-z][A-Za-z0-9_]*$")
+        self.__channelTypes = ["REAL", "INTEGER", None]
+        
+        # Built in sensors in the order the scanner has always read them. Channels with types are columns owsData already has. Costs are the bus transfers and sensor waits a read takes.
+        self.register("compound", [("windAvg", "REAL"), ("windMax", "REAL"), ("windAvgRaw", None), ("windMaxRaw", None), ("rain", "INTEGER"), ("rainReset", None), ("rainCumulative", None), \
+            ("lightLvl", "REAL")], lambda scanner: self.__loadDriver("compoundSensor", scanner.windOffset), lambda scanner, driver: scanner.readCompound(), 0.85, 0, "compound sensor", True)
+        self.register("windVane", [("windDir", "REAL")], lambda scanner: self.__loadDriver("hmc5883l"), lambda scanner, driver: scanner.readWindVane(), 0.36, 0, "wind vein", True)
+        self.register("tempHumid", [("temp", "REAL"), ("humid", "REAL")], lambda scanner: self.__loadDriver("am2315"), lambda scanner, driver: scanner.readTempHumid(), 0.1, 0, \
+            "temperature and humidity sensor", True)
+        self.register("baro", [("baro", "REAL")], lambda scanner: self.__loadDriver("mpl115a2"), lambda scanner, driver: scanner.readBaro(), 0.045, 0, "barometer", True)
+        self.register("sysTemp", [("sysTemp", "REAL")], lambda scanner: self.__loadDriver("mcp9808"), lambda scanner, driver: scanner.readSysTemp(), 0.001, 0, "system thermometer", True)
+        
+        # Sensors a station has if its config doesn't say.
+        self.defaultSensors = list(self.__order)
+    
+    def __loadDriver(self, moduleName, *args):
+        """
+        __loadDriver(moduleName, [args...])
+        
+        Import one of our sensor drivers, which are classes named after their modules, and create it with args. Returns the driver object.
+        """
+        
+        return getattr(importlib.import_module(moduleName), moduleName)(*args)
+    
+    def register(self, name, channels, load, read, cost = 0.01, minInterval = 0, description = None, builtIn = False):
+        """
+        register(name, channels, load, read, [cost = 0.01], [minInterval = 0], [description = None], [builtIn = False])
+        
+        Register a sensor. channels is a list of (name, type) tuples where type is "REAL" or "INTEGER" for channels that are stored, or None. load(scanner) returns the sensor's driver,
+        and read(scanner, driver) returns a dict of channel name to value. cost is how many seconds a read takes on the bus, including waiting for the sensor, until we've measured it.
+        minInterval is the fewest seconds between reads, and the sensor's channels are None in records taken in between. description names the sensor in messages and defaults to name.
+        builtIn is only for the sensors owsData has columns for. Raises ValueError if the sensor or one of its channels is already registered, or a channel's name or type isn't one we can store.
+        """
+        
+        if name in self.__sensors:
+            raise ValueError("owsSensors: Sensor " + repr(name) + " is already registered.")
+        
+        haveChannels = [channel for sensor in self.__sensors.values() for channel, chanType in sensor['channels']]
+        
+        for channel, chanType in channels:
+            if (not isinstance(channel, str)) or (self.__channelName.match(channel) is None):
+                raise ValueError("owsSensors: " + repr(channel) + " isn't a valid channel name.")
+            
+            if chanType not in self.__channelTypes:
+                raise ValueError("owsSensors: Channel " + channel + " has to be REAL, INTEGER, or None.")
+            
+            if channel in haveChannels:
+                raise ValueError("owsSensors: Channel " + channel + " is already read by another sensor.")
+        
+        self.__sensors[name] = {"name": name, "channels": list(channels), "load": load, "read": read, "cost": float(cost), "minInterval": float(minInterval), \
+            "description": name if description is None else description, "builtIn": builtIn}
+        self.__order.append(name)
+    
+    def loadPlugins(self, modules):
+        """
+        loadPlugins(modules)
+        
+        Import plugin modules by name so they register their sensors. Modules that were already imported aren't imported again.
+        """
+        
+        for module in modules:
+            importlib.import_module(module)
+    
+    def get(self, name):
+        """
+        get(name)
+        
+        Get a registered sensor. Raises ValueError for sensors that aren't registered. Returns a dict with the sensor's name, channels, load, read, cost, minInterval, description, and builtIn.
+        """
+        
+        if name not in self.__sensors:
+            raise ValueError("owsSensors: Unknown sensor " + repr(name) + ". Known sensors are " + ", ".join(self.__order) + ".")
+        
+        return self.__sensors[name]
+    
+    def getNames(self):
+        """
+        getNames()
+        
+        Get the names of the registered sensors in the order they're read. Returns a list.
+        """
+        
+        return list(self.__order)
+    
+    def getColumns(self, sensors):
+        """
+        getColumns(sensors)
+        
+        Get the stored channels of plugin sensors in a list of sensor names, which owsData adds columns for. Built in sensors' channels already have columns. Returns a list of (name, type) tuples.
+        """
+        
+        return [(channel, chanType) for name in self.__order if (name in sensors) and not self.__sensors[name]['builtIn'] for channel, chanType in self.__sensors[name]['channels'] \
+            if chanType is not None]
+    
+    def observeCost(self, name, seconds):
+        """
+        observeCost(name, seconds)
+        
+        Record how long reading a sensor took, retries and all. Recent reads count the most, so the plan follows a sensor that slows down.
+        """
+        
+        if name not in self.__measuredCost:
+            self.__measuredCost[name] = seconds
+        else:
+            self.__measuredCost[name] = self.__measuredCost[name] + (seconds - self.__measuredCost[name]) * self.__costWeight
+    
+    def getCost(self, name):
+        """
+        getCost(name)
+        
+        Get how long reading a sensor takes in seconds: what we've measured, or the registered cost if we haven't read it yet. Returns a float.
+        """
+        
+        return self.__measuredCost.get(name, self.get(name)['cost'])
+    
+    def plan(self, sensors, lastRead, now, budget = None):
+        """
+        plan(sensors, lastRead, now, [budget = None])
+        
+        Plan which of a list of sensors to read in a scan. A sensor is due once minInterval seconds have passed since its last read, where lastRead is a dict of sensor name to the time of its last
+        good read and now is the time in the same units. If budget is set, due sensors are added in order of how long they're overdue until the next one's cost would go over budget seconds,
+        and the rest wait for the next scan, when they'll be further overdue. The most overdue sensor is always read so a small budget can't starve the station. Returns a list of sensor names
+        in the order they're read.
+        """
+        
+        due = []
+        
+        for name in sensors:
+            sensor = self.get(name)
+            
+            # Sensors we've never read are as overdue as they get.
+            overdue = float("inf") if name not in lastRead else (now - lastRead[name]) - sensor['minInterval']
+            
+            if overdue >= 0:
+                due.append((overdue, name))
+        
+        if budget is not None:
+            # Sort by how overdue, keeping read order for ties so sensors read every scan are planned the same way each time.
+            due.sort(key = lambda item: -item[0])
+            planned = []
+            spent = 0.0
+            
+            for overdue, name in due:
+                cost = self.getCost(name)
+                
+                if (len(planned) > 0) and (spent + cost > budget):
+                    continue
+                
+                planned.append((overdue, name))
+                spent = spent + cost
+            
+            due = planned
+        
+        # Read in registration order so the bus sees the same sequence of transactions every scan.
+        plannedNames = [name for overdue, name in due]
+        
+        return [name for name in self.__order if name in plannedNames]
+
+sensorRegistry = owsSensors()
@@ -0,0 +1,312 @@
+# OpenWeatherStn synthetic weather by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import datetime
+import math
+
+# Derived metrics
+from owsDerived import owsDerived
+
+# NumPy generates whole columns at once.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+##################
+# owsSynth class #
+##################
+
+class owsSynth:
+    """
+    owsSynth - generates realistic looking weather records for load testing and seeding large databases. Temperature follows seasonal and daily cycles, humidity comes from a slowly wandering
+    dew point, pressure fronts drift through and bring clouds, wind, and rain with them, the wind vein wanders around a prevailing direction, and light follows the sun. Every value is a function
+    of the time it's for and the seed, built from hashed noise, so any stretch of time can be generated in any order and always comes out the same. The only exception is the rain counter,
+    which carries on from the last chunk generated. Requires NumPy. The constructor accepts six optional arguments:
+    
+    seed: seed for the weather. Defaults to 0.
+    latitude: the station's latitude in degrees, which sets the seasons and day length. Defaults to 45.5.
+    longitude: the station's longitude in degrees, which lines the days up with UTC. Defaults to -122.7.
+    elevation: the station's elevation in meters. Station pressure is lower than sea-level pressure by this much. Defaults to 0.
+    rainCal: rain sensor calibration in millimeters of rain per count. Defaults to 0.01.
+    meanTemp: the yearly average temperature in degrees C. Defaults to 11.
+    """
+    
+    def __init__(self, seed = 0, latitude = 45.5, longitude = -122.7, elevation = 0, rainCal = 0.01, meanTemp = 11.0):
+        if np is None:
+            raise RuntimeError("owsSynth: NumPy is required to generate weather.")
+        
+        self.seed = seed
+        self.latitude = latitude
+        self.longitude = longitude
+        self.elevation = elevation
+        self.rainCal = rainCal
+        self.meanTemp = meanTemp
+        
+        # Yearly and daily temperature swings in degrees C, and how far the weather wanders from them.
+        self.annualAmp = 8.0
+        self.diurnalAmp = 5.0
+        self.weatherAmp = 3.0
+        
+        # Average sea-level pressure in kPa, and how deep fronts get.
+        self.meanBaro = 101.6
+        self.frontAmp = 1.0
+        
+        # Average wind speed in kph and the prevailing wind direction in degrees.
+        self.meanWind = 10.0
+        self.prevailingDir = 225.0
+        
+        # Rain counter value before the next record we generate.
+        self.rainCount = 0
+        
+        # Derived metrics for the records, and column names in record order.
+        self.derived = owsDerived(elevation)
+        self.columns = ["dts", "temp", "humid", "baro", "rain", "windDir", "windAvg", "windMax", "lightLvl", "sysTemp", "quality", "rainDelta", "rainCpm", "rainRate", "windGust", \
+            "windGustDts", "windAvg2m", "windAvg10m"] + self.derived.columns
+        
+        # Each kind of noise gets its own stream so they don't move together.
+        self.__streams = {}
+    
+    def __stream(self, name):
+        """
+        __stream(name)
+        
+        Get the key for a named noise stream. Returns an integer.
+        """
+        
+        if name not in self.__streams:
+            key = (self.seed * 1000003) ^ sum([(ord(c) << (8 * (i % 7))) for i, c in enumerate(name)])
+            self.__streams[name] = int(self.__hash(np.array([key & 0xffffffffffffffff], dtype = np.uint64))[0])
+        
+        return self.__streams[name]
+    
+    def __hash(self, values):
+        """
+        __hash(values)
+        
+        Scramble an array of 64 bit unsigned integers with SplitMix64. Returns an array of 64 bit unsigned integers.
+        """
+        
+        z = values + np.uint64(0x9e3779b97f4a7c15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+        
+        return z ^ (z >> np.uint64(31))
+    
+    def __uniform(self, name, idx):
+        """
+        __uniform(name, idx)
+        
+        Uniform noise between 0 and 1 from a named stream for an array of integer indices. Returns an array.
+        """
+        
+        z = self.__hash(idx.astype(np.int64).view(np.uint64) ^ np.uint64(self.__stream(name)))
+        
+        return (z >> np.uint64(11)).astype(np.float64) / 9007199254740992.0
+    
+    def __normal(self, name, idx):
+        """
+        __normal(name, idx)
+        
+        Normally distributed noise with a standard deviation of 1 from a named stream for an array of integer indices. Returns an array.
+        """
+        
+        u1 = self.__uniform(name + ".a", idx)
+        u2 = self.__uniform(name + ".b", idx)
+        
+        return np.sqrt(-2.0 * np.log(1.0 - u1)) * np.cos(2.0 * math.pi * u2)
+    
+    def __smooth(self, name, seconds, period):
+        """
+        __smooth(name, seconds, period)
+        
+        Noise that wanders smoothly from one random value to the next every period seconds, for an array of times in seconds since the epoch. Returns an array.
+        """
+        
+        knot = np.floor(seconds / period)
+        frac = (seconds / period) - knot
+        knot = knot.astype(np.int64)
+        
+        first = self.__normal(name, knot)
+        last = self.__normal(name, knot + 1)
+        
+        return first + (last - first) * ((1.0 - np.cos(math.pi * frac)) / 2.0)
+    
+    def __trailingMean(self, values, window):
+        """
+        __trailingMean(values, window)
+        
+        Average each value with the window - 1 values before it. The first window - 1 values don't have enough history and are dropped. Returns an array.
+        """
+        
+        sums = np.cumsum(np.concatenate([[0.0], values]))
+        
+        return (sums[window:] - sums[:-window]) / window
+    
+    def __toEpoch(self, dts):
+        """
+        __toEpoch(dts)
+        
+        Convert a datetime to integer microseconds since the epoch. Integers are passed through. Returns an integer.
+        """
+        
+        if isinstance(dts, datetime.datetime):
+            return int(round((dts - datetime.datetime(1970, 1, 1)).total_seconds() * 1000000))
+        
+        return int(dts)
+    
+    def getColumns(self, startDts, count, interval = 60):
+        """
+        getColumns(startDts, count, [interval = 60])
+        
+        Generate count records interval seconds apart starting at startDts, which is a UTC datetime or epoch microseconds. Returns a dict of column name to NumPy array in owsData's format,
+        where dts and windGustDts are epoch microseconds and missing values are NaN. The rain counter picks up from rainCount and leaves it where the last record ended.
+        """
+        
+        # Sustained wind looks back 10 minutes, so start early enough to have that much history.
+        history = max(1, int(round(600.0 / interval))) - 1
+        
+        startEpoch = self.__toEpoch(startDts)
+        dts = startEpoch + (np.arange(-history, count, dtype = np.int64) * int(interval * 1000000))
+        seconds = dts / 1000000.0
+        
+        # White noise is keyed on the sample's time so it's the same no matter which chunk it lands in.
+        sampleIdx = dts // 1000000
+        
+        # Where we are in the year and the day. Days run on local solar time.
+        yearAngle = 2.0 * math.pi * (seconds / 86400.0 % 365.2422) / 365.2422
+        solarHour = (seconds / 3600.0 + self.longitude / 15.0) % 24.0
+        dayAngle = 2.0 * math.pi * (solarHour - 15.0) / 24.0
+        
+        # Pressure fronts roll through every few days, with the small twice daily atmospheric tide on top.
+        seaLevel = self.meanBaro + self.frontAmp * self.__smooth("front", seconds, 129600.0) + 0.4 * self.__smooth("frontFast", seconds, 36000.0) + \
+            0.05 * np.cos(2.0 * dayAngle)
+        lowness = np.clip(self.meanBaro - seaLevel, 0.0, None)
+        
+        # Rain comes in bursts that are much more likely when the pressure is low.
+        rainMmHr = np.clip(self.__smooth("rain", seconds, 7200.0) + 0.9 * lowness - 1.8, 0.0, None) * 3.0
+        raining = np.clip(rainMmHr / 2.0, 0.0, 1.0)
+        
+        # Clouds come with lows and rain.
+        cloud = np.clip(0.45 + 0.3 * self.__smooth("cloud", seconds, 21600.0) + 0.3 * lowness, 0.0, 1.0)
+        cloud = np.maximum(cloud, raining)
+        
+        # How high the sun is.
+        decl = math.radians(23.44) * np.sin(yearAngle - (2.0 * math.pi * 80.0 / 365.2422))
+        lat = math.radians(self.latitude)
+        hourAngle = 2.0 * math.pi * (solarHour - 12.0) / 24.0
+        sunUp = np.clip(math.sin(lat) * np.sin(decl) + math.cos(lat) * np.cos(decl) * np.cos(hourAngle), 0.0, 1.0)
+        
+        # Temperature: coldest in mid January up north, warmest mid afternoon, damped by clouds and cooled by rain.
+        hemisphere = 1.0 if self.latitude >= 0 else -1.0
+        seasonal = self.meanTemp - hemisphere * self.annualAmp * np.cos(yearAngle - (2.0 * math.pi * 15.0 / 365.2422))
+        weather = self.weatherAmp * self.__smooth("temp", seconds, 172800.0) + self.__smooth("tempFast", seconds, 21600.0)
+        temp = seasonal + weather + self.diurnalAmp * (1.0 - 0.6 * cloud) * np.cos(dayAngle) - 2.0 * raining + 0.1 * self.__normal("tempNoise", sampleIdx)
+        
+        # The dew point wanders slowly below the day's average temperature, and catches up to the temperature when it rains.
+        dewpoint = seasonal + weather - np.clip(4.0 + 2.5 * self.__smooth("dry", seconds, 86400.0), 0.5, 20.0)
+        dewpoint = np.minimum(dewpoint + raining * (temp - dewpoint), temp - 0.2)
+        humid = 100.0 * np.exp((17.62 * dewpoint / (243.12 + dewpoint)) - (17.62 * temp / (243.12 + temp)))
+        humid = np.clip(humid + 0.3 * self.__normal("humidNoise", sampleIdx), 3.0, 100.0)
+        
+        # Wind picks up in the afternoon and when fronts come through, and gusts on top of that.
+        windBase = self.meanWind * np.exp(0.45 * self.__smooth("wind", seconds, 28800.0)) * (1.0 + 0.3 * np.cos(dayAngle)) + 4.0 * lowness
+        windAvg = np.clip(windBase * (1.0 + 0.15 * self.__normal("windNoise", sampleIdx)), 0.0, None)
+        windMax = windAvg * (1.2 + 0.4 * self.__uniform("windMax", sampleIdx))
+        windGust = windMax * (1.0 + 0.1 * self.__uniform("windGust", sampleIdx))
+        
+        # The wind vein wanders around the prevailing direction, and twitches more in light wind.
+        windDir = self.prevailingDir + 90.0 * self.__smooth("dir", seconds, 64800.0) + 30.0 * self.__smooth("dirFast", seconds, 7200.0) + \
+            (8.0 + 20.0 / (1.0 + windAvg)) * self.__normal("dirNoise", sampleIdx)
+        
+        # Rain counts in each sample, dithered so fractional counts add up over time.
+        expected = rainMmHr * (interval / 3600.0) / self.rainCal
+        rainDelta = np.floor(expected + self.__uniform("rainDither", sampleIdx)).astype(np.int64)
+        
+        retVal = {}
+        retVal['dts'] = dts[history:]
+        retVal['temp'] = np.round(temp[history:], 1)
+        retVal['humid'] = np.round(humid[history:], 1)
+        retVal['baro'] = np.round(seaLevel[history:] * ((1.0 - 2.25577e-5 * self.elevation) ** 5.25588), 2)
+        
+        rainDelta = rainDelta[history:]
+        rain = self.rainCount + np.cumsum(rainDelta)
+        retVal['rain'] = rain & 0xffffffff
+        
+        if len(rain) > 0:
+            self.rainCount = int(rain[-1]) & 0xffffffff
+        
+        retVal['windDir'] = np.round(windDir[history:] % 360.0, 1)
+        retVal['windAvg'] = np.round(windAvg[history:], 2)
+        retVal['windMax'] = np.round(windMax[history:], 2)
+        retVal['lightLvl'] = np.clip(np.round(255.0 * (sunUp[history:] ** 0.8) * (1.0 - 0.7 * cloud[history:]) + 2.0 * self.__normal("lightNoise", sampleIdx[history:])), 0, 255).astype(np.int64)
+        
+        # The enclosure warms up in the sun. The MCP9808 reads in 1/16 degree steps.
+        sysTemp = temp[history:] + 10.0 + 15.0 * sunUp[history:] * (1.0 - 0.5 * cloud[history:]) + 0.1 * self.__normal("sysTempNoise", sampleIdx[history:])
+        retVal['sysTemp'] = np.round(sysTemp / 0.0625) * 0.0625
+        
+        retVal['quality'] = np.zeros(count, dtype = np.int64)
+        retVal['rainDelta'] = rainDelta
+        retVal['rainCpm'] = np.round(rainDelta * (60.0 / interval), 2)
+        retVal['rainRate'] = np.round(retVal['rainCpm'] * self.rainCal * 60.0, 2)
+        retVal['windGust'] = np.round(windGust[history:], 2)
+        retVal['windGustDts'] = retVal['dts']
+        
+        # Sustained wind over the last 2 and 10 minutes.
+        twoMin = max(1, int(round(120.0 / interval)))
+        retVal['windAvg2m'] = np.round(self.__trailingMean(windAvg, twoMin)[history - twoMin + 1:], 2)
+        retVal['windAvg10m'] = np.round(self.__trailingMean(windAvg, history + 1), 2)
+        
+        retVal.update(self.derived.getDerivedColumns(retVal['temp'], retVal['humid'], retVal['baro'], retVal['windAvg'], retVal['windDir']))
+        
+        return retVal
+    
+    def getRecords(self, startDts, count, interval = 60):
+        """
+        getRecords(startDts, count, [interval = 60])
+        
+        Generate count records like getColumns(), as a list of tuples that owsData.addRecords() takes. Timestamps are epoch microseconds and missing values are None.
+        """
+        
+        cols = self.getColumns(startDts, count, interval)
+        colLists = []
+        
+        for colName in self.columns:
+            col = cols[colName]
+            
+            if col.dtype.kind == "f":
+                colLists.append(np.where(np.isnan(col), None, col.astype(object)).tolist())
+            else:
+                colLists.append(col.tolist())
+        
+        return list(zip(*colLists))
+    
+    def getFrames(self, startDts, count, interval = 60):
+        """
+        getFrames(startDts, count, [interval = 60])
+        
+        Generate count sets of conditions like getColumns() in the format owsI2cSim's weather dict uses, so the simulated sensors can play them back with owsI2cSim.play(). Returns a list of dicts.
+        """
+        
+        cols = self.getColumns(startDts, count, interval)
+        names = [("temp", "temp"), ("humid", "humid"), ("baro", "baro"), ("windKph", "windAvg"), ("windDir", "windDir"), ("rain", "rain"), ("light", "lightLvl"), ("sysTemp", "sysTemp")]
+        
+        return [dict(zip([name for name, colName in names], values)) for values in zip(*[cols[colName].tolist() for name, colName in names])]
+    
+    def fill(self, dl, startDts, count, interval = 60, chunkSize = 50000):
+        """
+        fill(dl, startDts, count, [interval = 60], [chunkSize = 50000])
+        
+        Add count generated records starting at startDts to an owsData object, chunkSize records at a time. Records can't already exist for those times. Returns the number of records added.
+        """
+        
+        startEpoch = self.__toEpoch(startDts)
+        retVal = 0
+        
+        for chunkStart in range(0, count, chunkSize):
+            retVal = retVal + dl.addRecords(self.getRecords(startEpoch + int(chunkStart * interval * 1000000), min(chunkSize, count - chunkStart), interval))
+        
+        return retVal
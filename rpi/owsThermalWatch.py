@@ -0,0 +1,181 @@
+# OpenWeatherStn enclosure thermal watchdog by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+# Add support for date and time processing
+import datetime
+
+# Thereading support
+import threading
+
+# Import support for timing
+import time
+
+# Data layer
+from owsData import owsData
+
+# System thermometer
+from mcp9808 import mcp9808
+
+# Pretty print
+from pprint import pprint
+
+#########################
+# owsThermalWatch class #
+#########################
+
+class owsThermalWatch(threading.Thread):
+    """
+    owsThermalWatch - watches the enclosure temperature using the MCP9808's hardware alert limits. The limits are programmed into the sensor once, and after that we only look at the ALERT pin or the alert flag bits. Accepts the following optional arguments:
+    
+    upperTemp: upper limit of the temperature window in degrees C. Defaults to 55.
+    lowerTemp: lower limit of the temperature window in degrees C. Defaults to -20.
+    critTemp: critical temperature in degrees C. Defaults to 70.
+    alertPin: BCM GPIO pin number the MCP9808 ALERT output is wired to. If this is None or RPi.GPIO isn't available we poll the alert flags instead. Defaults to None.
+    pollInterval: number of seconds between alert flag checks when polling. Defaults to 2.
+    dbFile: path to the weather Sqlite3 database file events are logged to. Defaults to "db/weather.db".
+    """
+    
+    def __init__(self, upperTemp = 55.0, lowerTemp = -20.0, critTemp = 70.0, alertPin = None, pollInterval = 2.0, dbFile = "db/weather.db"):
+        threading.Thread.__init__(self)
+        
+        # Don't keep the scanner alive just because we're watching.
+        self.daemon = True
+        
+        # Limits
+        self.__upperTemp = upperTemp
+        self.__lowerTemp = lowerTemp
+        self.__critTemp = critTemp
+        
+        # Alert pin and polling settings.
+        self.__alertPin = alertPin
+        self.__pollInterval = pollInterval
+        self.__dbFile = dbFile
+        
+        # Event source name in the events table.
+        self.source = "sysTemp"
+        
+        # Last state we logged, so we only log changes.
+        self.__lastState = None
+        
+        # Set up our sensor.
+        self.sysThermo = mcp9808()
+    
+    def __programLimits(self):
+        """
+        __programLimits()
+        
+        Program the temperature window and critical temperature into the MCP9808, and turn on the alert output in comparator mode so the pin stays asserted as long as a limit is crossed.
+        """
+        
+        self.sysThermo.setTempWindow(self.__upperTemp, self.__lowerTemp)
+        self.sysThermo.setTempCritical(self.__critTemp)
+        
+        # 1.5 degree hysteresis keeps us from flapping right at a limit.
+        self.sysThermo.setConfig(self.sysThermo.tempHyst1_5 | self.sysThermo.alertOutputOn | self.sysThermo.alertSelAll | \
+            self.sysThermo.alertPinLow | self.sysThermo.alertModeComp)
+    
+    def getState(self, flags):
+        """
+        getState(flags)
+        
+        Convert MCP9808 alert flag bits to a state name. Returns "critical", "upper", "lower", or "normal".
+        """
+        
+        retVal = "normal"
+        
+        # The critical flag wins since it's also above the upper limit.
+        if flags & self.sysThermo.tempAlertCrit:
+            retVal = "critical"
+        elif flags & self.sysThermo.tempAlertUpper:
+            retVal = "upper"
+        elif flags & self.sysThermo.tempAlertLower:
+            retVal = "lower"
+        
+        return retVal
+    
+    def __check(self, dl):
+        """
+        __check(dl)
+        
+        Read the alert flags and temperature once, and log an event to the data layer if the state changed.
+        """
+        
+        # One register read gets us both the flags and the temperature.
+        temp, flags = self.sysThermo.getAmbientTempFlags()
+        state = self.getState(flags)
+        
+        # Only push changes into the pipeline.
+        if state != self.__lastState:
+            dl.addEvent((datetime.datetime.utcnow(), self.source, state, temp))
+            self.__lastState = state
+            
+            print("Enclosure thermal state: " + state + " (" + str(temp) + " C)")
+    
+    def __getGpio(self):
+        """
+        __getGpio()
+        
+        Set up the ALERT GPIO pin if we have one. Returns the RPi.GPIO module, or None if we should poll instead.
+        """
+        
+        retVal = None
+        
+        if self.__alertPin is not None:
+            try:
+                import RPi.GPIO as GPIO
+                
+                # The ALERT output is open drain and active low, so pull it up.
+                GPIO.setmode(GPIO.BCM)
+                GPIO.setup(self.__alertPin, GPIO.IN, pull_up_down = GPIO.PUD_UP)
+                
+                retVal = GPIO
+            
+            except Exception as e:
+                print("Can't use ALERT GPIO pin, polling alert flags instead:")
+                pprint(e)
+        
+        return retVal
+    
+    def run(self):
+        """
+        run(self)
+        
+        Principal method in thread. Programs the limits once, then waits on the ALERT pin or polls the alert flags.
+        """
+        
+        # The data layer needs to be created in our own thread.
+        dl = owsData(self.__dbFile)
+        
+        # Set limits. If this fails there's nothing to watch.
+        try:
+            self.__programLimits()
+            
+            # Log the state we start in.
+            self.__check(dl)
+        
+        except Exception as e:
+            print("Exception trying to program system thermometer limits:")
+            pprint(e)
+            return
+        
+        gpio = self.__getGpio()
+        
+        while(True):
+            try:
+                if gpio is not None:
+                    # Sleep until the pin changes, waking up now and then in case we miss an edge.
+                    gpio.wait_for_edge(self.__alertPin, gpio.BOTH, timeout = 60000)
+                else:
+                    time.sleep(self.__pollInterval)
+                
+                self.__check(dl)
+            
+            except Exception as e:
+                print("Exception trying to check system thermometer alerts:")
+                pprint(e)
+                
+                # Don't spin if the bus is down.
+                time.sleep(self.__pollInterval)
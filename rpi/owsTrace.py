@@ -0,0 +1,179 @@
+# OpenWeatherStn tracing by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import atexit
+import collections
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+##################
+# owsTrace class #
+##################
+
+class owsTrace:
+    """
+    owsTrace - timing spans written to a Chrome trace JSON file, which chrome://tracing and Perfetto can open. Wrap anything worth seeing in a span, like "with tracer.span("name", "category"):".
+    When tracing is off span() returns the same do-nothing context manager every time, so spans cost next to nothing. Each process has its own tracer in tracer, which turns itself on if the
+    OWS_TRACE environment variable is set to the file to write. The most recent events are kept in memory and written out by flush() and when the process exits.
+    """
+    
+    def __init__(self):
+        self.enabled = False
+        
+        # Where we write the trace, and the most recent events.
+        self.__fileName = None
+        self.__events = collections.deque()
+        
+        # Span start times are relative to when tracing was turned on.
+        self.__origin = 0.0
+        
+        # Names of the threads we've seen by thread ID.
+        self.__threads = {}
+        
+        # flush() writes the file at most this often, in seconds.
+        self.saveInterval = 10.0
+        self.__lastSave = 0.0
+        
+        # What span() gives back when tracing is off. It can be used any number of times.
+        self.__noSpan = nullcontext()
+        
+        # Several threads add events at once.
+        self.__lock = threading.Lock()
+        
+        self.__atexit = False
+    
+    def enable(self, fileName, maxEvents = 100000):
+        """
+        enable(fileName, [maxEvents = 100000])
+        
+        Start tracing, keeping the most recent maxEvents spans in memory to write to fileName.
+        """
+        
+        with self.__lock:
+            self.__fileName = fileName
+            self.__events = collections.deque(maxlen = maxEvents)
+            self.__threads = {}
+            self.__origin = time.perf_counter()
+            self.__lastSave = time.time()
+            self.enabled = True
+        
+        # Make sure we write what we have when we exit.
+        if not self.__atexit:
+            atexit.register(self.save)
+            self.__atexit = True
+    
+    def disable(self):
+        """
+        disable()
+        
+        Stop tracing and write what we have.
+        """
+        
+        self.save()
+        self.enabled = False
+    
+    def span(self, name, cat = "ows", args = None):
+        """
+        span(name, [cat = "ows"], [args = None])
+        
+        Context manager that records how long its block took as a span with a name, category, and optionally a dict of arguments that show up with it in the trace viewer.
+        """
+        
+        if not self.enabled:
+            return self.__noSpan
+        
+        return self.__span(name, cat, args)
+    
+    @contextmanager
+    def __span(self, name, cat, args):
+        """
+        __span(name, cat, args)
+        
+        Context manager that records a span when tracing is on.
+        """
+        
+        start = time.perf_counter()
+        
+        try:
+            yield
+        
+        finally:
+            self.__record(name, cat, start, time.perf_counter(), args)
+    
+    def __record(self, name, cat, start, stop, args):
+        """
+        __record(name, cat, start, stop, args)
+        
+        Add a complete event for a span that ran from start to stop, in perf_counter() seconds.
+        """
+        
+        thread = threading.current_thread()
+        event = {"name": name, "cat": cat, "ph": "X", "ts": round((start - self.__origin) * 1000000.0, 1), "dur": round((stop - start) * 1000000.0, 1), \
+            "pid": os.getpid(), "tid": thread.ident}
+        
+        if args is not None:
+            event['args'] = args
+        
+        with self.__lock:
+            self.__events.append(event)
+            self.__threads[thread.ident] = thread.name
+    
+    def sleep(self, seconds, name = "sleep"):
+        """
+        sleep(seconds, [name = "sleep"])
+        
+        Sleep for a number of seconds inside a span in the "sleep" category, so waits stand out from real work in the trace.
+        """
+        
+        with self.span(name, "sleep"):
+            time.sleep(seconds)
+    
+    def save(self):
+        """
+        save()
+        
+        Write the trace file if tracing is on. The file is replaced all at once.
+        """
+        
+        if not self.enabled:
+            return
+        
+        with self.__lock:
+            events = list(self.__events)
+            threads = dict(self.__threads)
+        
+        # Name the threads so the trace viewer can show them.
+        pid = os.getpid()
+        meta = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": threadName}} for tid, threadName in threads.items()]
+        
+        try:
+            with open(self.__fileName + ".tmp", "w") as traceFile:
+                json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, traceFile)
+            
+            os.replace(self.__fileName + ".tmp", self.__fileName)
+            self.__lastSave = time.time()
+        
+        except Exception as e:
+            raise e
+    
+    def flush(self):
+        """
+        flush()
+        
+        Write the trace file if tracing is on and it's been at least saveInterval seconds since it was last written. Long running loops should call this once in a while.
+        """
+        
+        if self.enabled and ((time.time() - self.__lastSave) >= self.saveInterval):
+            self.save()
+
+# Tracer for this process.
+tracer = owsTrace()
+
+if os.environ.get("OWS_TRACE"):
+    tracer.enable(os.environ["OWS_TRACE"])
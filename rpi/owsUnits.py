@@ -0,0 +1,165 @@
+# OpenWeatherStn unit conversion by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+# NumPy columns are converted as whole arrays if we have it.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+##################
+# owsUnits class #
+##################
+
+class owsUnits:
+    """
+    owsUnits - unit system registry. Weather data is stored in metric units (C, kph, kPa, mm/h), and clients can ask for any unit system, optionally overriding the unit for a quantity.
+    A unit system is compiled once into a conversion plan that lists, for each field that needs it, the scale, offset, unit name and rounding to apply, so converting a record or a column is
+    just arithmetic. The constructor accepts one optional argument:
+    
+    fields: a dict of field name to the quantity it measures ("temperature", "speed", "pressure", or "rainRate"). Defaults to the fields weatherService returns.
+    """
+    
+    def __init__(self, fields = None):
+        # Units by name: the quantity they measure, the scale and offset from the stored metric unit, and how many decimal places to round to.
+        self.units = {
+            "C": ("temperature", 1.0, 0.0, 1),
+            "F": ("temperature", 9.0 / 5.0, 32.0, 3),
+            "K": ("temperature", 1.0, 273.15, 2),
+            "kph": ("speed", 1.0, 0.0, 2),
+            "mph": ("speed", 0.621371, 0.0, 2),
+            "m/s": ("speed", 1.0 / 3.6, 0.0, 2),
+            "kt": ("speed", 0.539957, 0.0, 2),
+            "kPa": ("pressure", 1.0, 0.0, 3),
+            "hPa": ("pressure", 10.0, 0.0, 1),
+            "Pa": ("pressure", 1000.0, 0.0, 0),
+            "inHg": ("pressure", 0.295333727, 0.0, 2),
+            "mmHg": ("pressure", 7.50061683, 0.0, 1),
+            "mm/h": ("rainRate", 1.0, 0.0, 2),
+            "in/h": ("rainRate", 1.0 / 25.4, 0.0, 3)}
+        
+        # Unit systems by name, with the unit they use for each quantity.
+        self.systems = {
+            "metric": {"temperature": "C", "speed": "kph", "pressure": "kPa", "rainRate": "mm/h"},
+            "imperial": {"temperature": "F", "speed": "mph", "pressure": "inHg", "rainRate": "in/h"},
+            "si": {"temperature": "K", "speed": "m/s", "pressure": "Pa", "rainRate": "mm/h"},
+            "aviation": {"temperature": "C", "speed": "kt", "pressure": "hPa", "rainRate": "mm/h"}}
+        
+        # Other names clients use for unit systems.
+        self.aliases = {"standard": "imperial"}
+        
+        # Fields and the quantity they measure.
+        if fields is None:
+            fields = {"temp": "temperature", "dewpoint": "temperature", "heatIndex": "temperature", "windChill": "temperature", "sysTemp": "temperature", \
+                "baro": "pressure", "seaLevelBaro": "pressure", "rainRate": "rainRate", \
+                "windAvgSpd": "speed", "windMaxSpd": "speed", "windGust": "speed", "windAvg2m": "speed", "windAvg10m": "speed"}
+        
+        self.fields = fields
+        
+        # Compiled plans by system and overrides.
+        self.__plans = {}
+    
+    def __getUnits(self, system, overrides):
+        """
+        __getUnits(system, overrides)
+        
+        Get the unit a system uses for each quantity, with overrides applied. Raises KeyError for unknown systems or units, and ValueError if an override unit doesn't measure its quantity. Returns a dict of quantity to unit name.
+        """
+        
+        units = dict(self.systems[self.aliases.get(system, system)])
+        
+        if overrides is not None:
+            for quantity, unit in overrides.items():
+                if self.units[unit][0] != quantity:
+                    raise ValueError("owsUnits: " + str(unit) + " isn't a unit of " + str(quantity) + ".")
+                
+                units[quantity] = unit
+        
+        return units
+    
+    def getFieldUnits(self, system = "metric", overrides = None):
+        """
+        getFieldUnits([system = "metric"], [overrides = None])
+        
+        Get the unit each field is in after converting to a unit system, optionally overriding the unit for some quantities like getPlan(). Raises KeyError for unknown systems or units,
+        and ValueError if an override unit doesn't measure its quantity. Returns a dict of field name to unit name.
+        """
+        
+        units = self.__getUnits(system, overrides)
+        
+        return dict([(field, units[quantity]) for field, quantity in self.fields.items()])
+    
+    def getPlan(self, system = "metric", overrides = None):
+        """
+        getPlan([system = "metric"], [overrides = None])
+        
+        Get the conversion plan for a unit system, optionally overriding the unit for some quantities with a dict like {"pressure": "mmHg"}. Plans are compiled the first time they're asked for.
+        Raises KeyError for unknown systems or units, and ValueError if an override unit doesn't measure its quantity. Returns a list of (field, scale, offset, unit, digits) tuples for the fields that need converting.
+        """
+        
+        system = self.aliases.get(system, system)
+        
+        # Overrides have to be hashable to cache the plan.
+        planKey = (system, None if overrides is None else tuple(sorted(overrides.items())))
+        
+        if planKey not in self.__plans:
+            units = self.__getUnits(system, overrides)
+            
+            plan = []
+            
+            for field, quantity in self.fields.items():
+                unit = units[quantity]
+                unitQuantity, scale, offset, digits = self.units[unit]
+                
+                # Fields already in the right unit don't need anything done.
+                if (scale == 1.0) and (offset == 0.0):
+                    continue
+                
+                plan.append((field, scale, offset, unit, digits))
+            
+            self.__plans[planKey] = plan
+        
+        return self.__plans[planKey]
+    
+    def convertRecord(self, data, plan):
+        """
+        convertRecord(data, plan)
+        
+        Convert a record dict like the ones weatherService builds, with a {"value", "unit"} dict for each field, from metric units using a plan from getPlan(). The record is modified in place. Returns the record.
+        """
+        
+        for field, scale, offset, unit, digits in plan:
+            point = data.get(field)
+            
+            if point is not None:
+                point['unit'] = unit
+                
+                if point['value'] is not None:
+                    point['value'] = round(point['value'] * scale + offset, digits)
+        
+        return data
+    
+    def convertColumns(self, columns, plan):
+        """
+        convertColumns(columns, plan)
+        
+        Convert columns of data from metric units using a plan from getPlan(). columns is a dict of field name to a NumPy array (or list with None for missing values).
+        Returns a new dict with converted columns, and the unit of each converted field under "units".
+        """
+        
+        retVal = dict(columns)
+        retVal['units'] = {}
+        
+        for field, scale, offset, unit, digits in plan:
+            if field in columns:
+                if np is not None:
+                    retVal[field] = np.round(np.asarray(columns[field], dtype = np.float64) * scale + offset, digits)
+                else:
+                    retVal[field] = [None if v is None else round(v * scale + offset, digits) for v in columns[field]]
+                
+                retVal['units'][field] = unit
+        
+        return retVal
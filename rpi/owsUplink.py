@@ -0,0 +1,239 @@
+# OpenWeatherStn uplink by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import gzip
+import http.client
+import json
+import os
+import random
+import time
+import urllib.error
+import urllib.request
+from pprint import pprint
+
+# Performance counters
+from owsMetrics import registry
+
+# Tracing
+from owsTrace import tracer
+
+# zstd compresses our batches better than gzip if we have it.
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+###################
+# owsUplink class #
+###################
+
+class owsUplink:
+    """
+    owsUplink - store and forward uplink that ships a station's records to a central server's /ingest in compressed batches. The station's database is the queue: we keep the time of the last record
+    the server acknowledged in a small state file, and send everything after it. The state file is only moved forward after the server acknowledges a batch, so a dropped link or a crash means
+    the batch is sent again, and the server skips records it already has, so nothing is lost or stored twice. When sending fails we back off exponentially until the link comes back.
+    The constructor accepts three arguments and four optional arguments:
+    
+    dl: the station's owsData object.
+    url: the central server's ingest URL, like "http://central.local:8080/ingest".
+    station: this station's ID on the central server.
+    stateFile: path to the file holding the time of the last acknowledged record. Defaults to "db/uplink.json".
+    compression: "zstd", "gzip", None to not compress, or "auto" to use zstd if we have it and gzip if we don't. Defaults to "auto".
+    batchSize: the most records we send in one request. Defaults to 1000.
+    timeout: seconds to wait for the server to answer a batch. Defaults to 30.
+    """
+    
+    def __init__(self, dl, url, station, stateFile = "db/uplink.json", compression = "auto", batchSize = 1000, timeout = 30):
+        self.dl = dl
+        self.url = url
+        self.station = station
+        self.batchSize = batchSize
+        self.timeout = timeout
+        self.__stateFile = stateFile
+        
+        if compression == "auto":
+            compression = "gzip" if zstandard is None else "zstd"
+        
+        if (compression == "zstd") and (zstandard is None):
+            raise RuntimeError("owsUplink: The zstandard module is required for zstd compression.")
+        
+        if compression not in ("zstd", "gzip", None):
+            raise ValueError("owsUplink: Compression has to be zstd, gzip, or None.")
+        
+        self.compression = compression
+        
+        # Backoff between failed attempts in seconds, doubling from the first delay up to the longest.
+        self.minBackoff = 1.0
+        self.maxBackoff = 300.0
+        
+        # Time of the last record the server acknowledged.
+        self.lastDts = self.__loadState()
+        
+        registry.describe("ows_uplink_records_total", "counter", "Records the central server acknowledged.")
+        registry.describe("ows_uplink_bytes_total", "counter", "Compressed bytes sent to the central server.")
+        registry.describe("ows_uplink_errors_total", "counter", "Batches that couldn't be delivered.")
+    
+    def __loadState(self):
+        """
+        __loadState()
+        
+        Load the time of the last acknowledged record. Returns epoch microseconds, or None if nothing has been acknowledged yet.
+        """
+        
+        try:
+            with open(self.__stateFile, "r") as stateFile:
+                state = json.load(stateFile)
+        
+        except FileNotFoundError:
+            return None
+        
+        except Exception as e:
+            raise e
+        
+        # A state file for another station or server doesn't tell us anything about this one.
+        if (state.get('url') != self.url) or (state.get('station') != self.station):
+            return None
+        
+        return state.get('lastDts')
+    
+    def __saveState(self):
+        """
+        __saveState()
+        
+        Save the time of the last acknowledged record. The file is replaced all at once and synced, so a crash leaves the old state or the new one.
+        """
+        
+        try:
+            with open(self.__stateFile + ".tmp", "w") as stateFile:
+                json.dump({"url": self.url, "station": self.station, "lastDts": self.lastDts}, stateFile)
+                stateFile.flush()
+                os.fsync(stateFile.fileno())
+            
+            os.replace(self.__stateFile + ".tmp", self.__stateFile)
+        
+        except Exception as e:
+            raise e
+    
+    def __compress(self, body):
+        """
+        __compress(body)
+        
+        Compress a request body. Returns a tuple of the compressed bytes and the Content-Encoding, which is None if we don't compress.
+        """
+        
+        if self.compression == "zstd":
+            return (zstandard.ZstdCompressor(level = 9).compress(body), "zstd")
+        
+        if self.compression == "gzip":
+            return (gzip.compress(body, compresslevel = 9, mtime = 0), "gzip")
+        
+        return (body, None)
+    
+    def getPending(self):
+        """
+        getPending()
+        
+        Get the next batch of records the server hasn't acknowledged yet, oldest first and at most batchSize of them. Returns a list of tuples in owsData's record order.
+        """
+        
+        startEpoch = 0 if self.lastDts is None else self.lastDts + 1
+        
+        return self.dl.getNextRecords(startEpoch, self.batchSize)
+    
+    def sendBatch(self, records):
+        """
+        sendBatch(records)
+        
+        Send a batch of records in owsData's record order and wait for the server to acknowledge it. Once it does the batch's last record becomes the last acknowledged record.
+        Raises IOError if the server can't be reached or doesn't acknowledge the whole batch. Returns the number of bytes sent.
+        """
+        
+        # Leave out spaces, since every byte counts on a slow link.
+        body = json.dumps({"station": self.station, "columns": self.dl.columns, "records": records}, separators = (",", ":")).encode("utf-8")
+        body, encoding = self.__compress(body)
+        
+        headers = {"Content-Type": "application/json"}
+        
+        if encoding is not None:
+            headers['Content-Encoding'] = encoding
+        
+        request = urllib.request.Request(self.url, data = body, headers = headers, method = "POST")
+        
+        try:
+            with tracer.span("uplinkBatch", "http", {"records": len(records), "bytes": len(body)}):
+                with urllib.request.urlopen(request, timeout = self.timeout) as response:
+                    ack = json.loads(response.read().decode("utf-8"))
+        
+        # Anything that goes wrong on the way means the batch wasn't delivered.
+        except (urllib.error.URLError, http.client.HTTPException, OSError, ValueError) as e:
+            registry.inc("ows_uplink_errors_total")
+            raise IOError("owsUplink: Couldn't send a batch to " + self.url + ": " + str(e))
+        
+        if (not isinstance(ack, dict)) or ((ack.get('added', 0) + ack.get('duplicates', 0)) != len(records)):
+            registry.inc("ows_uplink_errors_total")
+            raise IOError("owsUplink: " + self.url + " didn't acknowledge the whole batch.")
+        
+        self.lastDts = records[-1][0]
+        self.__saveState()
+        
+        registry.inc("ows_uplink_records_total", None, len(records))
+        registry.inc("ows_uplink_bytes_total", None, len(body))
+        
+        return len(body)
+    
+    def flush(self):
+        """
+        flush()
+        
+        Send every record the server hasn't acknowledged, one batch at a time, so a long backlog is never all in memory. Raises IOError if a batch can't be delivered, after saving our progress
+        with the batches that were. Returns the number of records sent.
+        """
+        
+        sent = 0
+        
+        while True:
+            pending = self.getPending()
+            
+            if len(pending) == 0:
+                break
+            
+            self.sendBatch(pending)
+            sent = sent + len(pending)
+        
+        return sent
+    
+    def run(self, interval = 60):
+        """
+        run([interval = 60])
+        
+        Send new records every interval seconds, forever. When sending fails the next try waits twice as long as the last one, with some jitter so stations that lost the same link don't all come back at once.
+        """
+        
+        backoff = self.minBackoff
+        
+        while True:
+            try:
+                sent = self.flush()
+                backoff = self.minBackoff
+                delay = interval
+                
+                if sent > 0:
+                    print("owsUplink: Sent " + str(sent) + " records.")
+            
+            except IOError as e:
+                print(e)
+                delay = backoff * random.uniform(0.5, 1.0)
+                backoff = min(backoff * 2, self.maxBackoff)
+            
+            # Anything else, like a database error, shouldn't stop the uplink either. Back off the same way and try again.
+            except Exception as e:
+                print("Exception trying to send records:")
+                pprint(e)
+                registry.inc("ows_uplink_errors_total")
+                delay = backoff * random.uniform(0.5, 1.0)
+                backoff = min(backoff * 2, self.maxBackoff)
+            
+            time.sleep(delay)
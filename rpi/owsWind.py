@@ -0,0 +1,142 @@
+# OpenWeatherStn wind analytics by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+# Thereading support
+import threading
+
+####################
+# owsRingAvg class #
+####################
+
+class owsRingAvg:
+    """
+    owsRingAvg - fixed size ring buffer that keeps a running sum so the average of the last n samples is O(1). The constructor requires one argument:
+    
+    size: number of samples to average.
+    """
+    
+    def __init__(self, size):
+        self.__size = size
+        self.__buff = [0.0] * size
+        self.__idx = 0
+        self.__count = 0
+        self.__total = 0.0
+    
+    def push(self, value):
+        """
+        push(value)
+        
+        Add a sample, dropping the oldest one if we're full.
+        """
+        
+        # Take the oldest sample out of the running sum if we're about to overwrite it.
+        if self.__count == self.__size:
+            self.__total = self.__total - self.__buff[self.__idx]
+        else:
+            self.__count = self.__count + 1
+        
+        self.__buff[self.__idx] = value
+        self.__total = self.__total + value
+        self.__idx = (self.__idx + 1) % self.__size
+        
+        # Resum every time we wrap around so floating point error can't build up.
+        if self.__idx == 0:
+            self.__total = sum(self.__buff)
+    
+    def isFull(self):
+        """
+        isFull()
+        
+        Check to see if we have a full window of samples. Returns True or False.
+        """
+        
+        return self.__count == self.__size
+    
+    def getAvg(self):
+        """
+        getAvg()
+        
+        Get the average of the samples in the buffer. Returns a float, or None if the buffer is empty.
+        """
+        
+        if self.__count == 0:
+            return None
+        
+        return self.__total / self.__count
+
+######################
+# owsWindStats class #
+######################
+
+class owsWindStats:
+    """
+    owsWindStats - streaming wind analytics. Fed wind speed samples at a fixed rate, it computes WMO style 3 second gusts (the highest 3 second running average),
+    2 and 10 minute sustained averages, and the peak gust with the time it happened. All updates are O(1). The constructor accepts one optional argument:
+    
+    sampleInterval: the number of seconds between samples. Defaults to 1.
+    """
+    
+    def __init__(self, sampleInterval = 1.0):
+        # Window sizes in samples.
+        self.__gustAvg = owsRingAvg(max(1, int(round(3.0 / sampleInterval))))
+        self.__avg2m = owsRingAvg(max(1, int(round(120.0 / sampleInterval))))
+        self.__avg10m = owsRingAvg(max(1, int(round(600.0 / sampleInterval))))
+        
+        # Peak gust since the last report, and when it happened.
+        self.__peakGust = None
+        self.__peakGustDts = None
+        
+        # We're fed by one thread and read by another.
+        self.__lock = threading.Lock()
+    
+    def update(self, speed, dts):
+        """
+        update(speed, dts)
+        
+        Add a wind speed sample taken at dts, a datetime.
+        """
+        
+        with self.__lock:
+            self.__gustAvg.push(speed)
+            self.__avg2m.push(speed)
+            self.__avg10m.push(speed)
+            
+            # Only count gusts once we have a full 3 seconds of data.
+            if self.__gustAvg.isFull():
+                gust = self.__gustAvg.getAvg()
+                
+                if (self.__peakGust is None) or (gust > self.__peakGust):
+                    self.__peakGust = gust
+                    self.__peakGustDts = dts
+    
+    def getStats(self, resetPeak = True):
+        """
+        getStats([resetPeak = True])
+        
+        Get the wind stats. If resetPeak is True the peak gust starts over, so each report has the peak gust since the last one.
+        Returns a list with the peak 3 second gust [0] and the datetime it happened [1], and the 2 minute [2] and 10 minute [3] average wind speeds.
+        Speeds are rounded to two decimal places, and anything we don't have enough data for yet is None.
+        """
+        
+        retVal = [None, None, None, None]
+        
+        with self.__lock:
+            if self.__peakGust is not None:
+                retVal[0] = round(self.__peakGust, 2)
+                retVal[1] = self.__peakGustDts
+            
+            # Sustained averages need a full window.
+            if self.__avg2m.isFull():
+                retVal[2] = round(self.__avg2m.getAvg(), 2)
+            
+            if self.__avg10m.isFull():
+                retVal[3] = round(self.__avg10m.getAvg(), 2)
+            
+            if resetPeak:
+                self.__peakGust = None
+                self.__peakGustDts = None
+        
+        return retVal
@@ -13,18 +13,44 @@ import datetime
 # Thereading support
 import threading
 
+# Command line arguments
+import sys
+
 # Import support for timing
 import time
 
 # Data layer
 from owsData import owsData
 
-# Load sensor module support.
-from hmc5883l import hmc5883l
-from am2315 import am2315
-from mpl115a2 import mpl115a2
-from mcp9808 import mcp9808
-from compoundSensor import compoundSensor
+# Magnetometer calibration
+from owsMagCal import owsMagCal
+
+# Sample validation
+from owsFilter import owsSampleFilter
+
+# Rain counter processing
+from owsRain import owsRainCounter
+
+# Wind analytics
+from owsWind import owsWindStats
+
+# Derived metrics
+from owsDerived import owsDerived
+
+# Raw sample ring buffer
+from owsRing import owsRingBuffer
+
+# Performance counters
+from owsMetrics import registry
+
+# Tracing
+from owsTrace import tracer
+
+# Station settings
+from owsConfig import owsConfig
+
+# Sensors we can read
+from owsSensors import sensorRegistry
 
 # Pretty print
 from pprint import pprint
@@ -39,31 +65,145 @@ class owsScanner:
     
     magOffset: a number in degrees between 0 and 359 which represents the bearing of the sensor. This defaults to 0 (true north) if not set.
     windOffset: a number that specifies the DC offset (ADC reading as int) of the anemometer when standing still. This defaults to 79.
+    magCalFile: path to the wind vein's magnetometer calibration file created by magCalibrate.py. This defaults to "db/magCal.json".
+    rainCal: rain sensor calibration in millimeters of rain per count. This defaults to 0.01.
+    elevation: the station's elevation in meters, used for sea-level pressure. This defaults to 0.
+    sensors: a list of the installed sensors' names registered with sensorRegistry. Drivers for sensors that aren't installed are never loaded, and their readings are None. This defaults to None, which means the built in sensors.
+    scanBudget: the most seconds of bus time a scan should spend reading sensors. Sensors that don't fit wait for the next scan. This defaults to None, which reads every sensor that's due.
     """
     
-    def __init__(self, magOffset = 0, windOffset = 79):
+    def __init__(self, magOffset = 0, windOffset = 79, magCalFile = "db/magCal.json", rainCal = 0.01, elevation = 0, sensors = None, scanBudget = None):
         # Sensor heading offset to get accurate wind direction data.
         self.__magOffset = magOffset
         
-        # Set up our sensor objects
-        self.windDirSens = hmc5883l()
-        self.cmpdSens = compoundSensor(windOffset)
-        self.tempHumid = am2315()
-        self.baroSens = mpl115a2()
-        self.sysThermo = mcp9808()
+        # The anemometer's DC offset, for the compound sensor's driver.
+        self.windOffset = windOffset
+        
+        # Hard and soft iron calibration for the magnetometer.
+        self.magCal = owsMagCal(magCalFile)
+        
+        # Number of magnetometer samples we take for each wind direction reading, and how long to wait between them.
+        # The magnetometer updates at 15 Hz.
+        self.__magSampleCt = 5
+        self.__magSampleDelay = 0.07
+        
+        # Set up sample validation for each raw channel. The HMC5883L reports 4096 when an axis is saturated,
+        # and an axis that doesn't budge for a whole batch and then some is stuck. Each axis swings whenever the vein turns, so they aren't checked for spikes.
+        self.sampleFilter = owsSampleFilter()
+        
+        for axis in ["magX", "magZ", "magY"]:
+            self.sampleFilter.addChannel(axis, -2048, 2047, saturated = [4096, -4096], stuckCount = self.__magSampleCt * 3, spike = False)
+        
+        # The calibrated field strength stays the same no matter which way the vein points, so that's where we look for spikes.
+        self.sampleFilter.addChannel("magNorm", 0, 4096, noise = 5)
+        
+        # 10 bit wind ADC, which jumps with every gust so it's only range checked, and the MPL115A2's pressure range in kPa.
+        self.sampleFilter.addChannel("windRaw", 0, 1023, spike = False)
+        self.sampleFilter.addChannel("baro", 50, 115, noise = 0.05)
+        
+        # Each group of sensors gets its own byte in the record's quality flags.
+        self.qualShiftMag = 0
+        self.qualShiftWind = 8
+        self.qualShiftBaro = 16
+        
+        # Turns the rain counter into deltas and rates.
+        self.rainCounter = owsRainCounter(rainCal)
+        
+        # Gusts and sustained wind speeds, fed by a windSampler thread.
+        self.windStats = owsWindStats()
+        
+        # Dew point, heat index, and the rest get computed once when we store a record.
+        self.derived = owsDerived(elevation)
+        
+        # Quality flags for the current scan, and whether the compound sensor's last wind data was good.
+        self.__quality = 0
+        self.__windOk = True
+        
+        # Set up our sensor objects, only loading the drivers for sensors we have.
+        self.sensors = list(sensorRegistry.defaultSensors if sensors is None else sensors)
+        self.drivers = dict([(sensor, sensorRegistry.get(sensor)['load'](self)) for sensor in self.sensors])
+        
+        self.windDirSens = self.drivers.get("windVane")
+        self.cmpdSens = self.drivers.get("compound")
+        self.tempHumid = self.drivers.get("tempHumid")
+        self.baroSens = self.drivers.get("baro")
+        self.sysThermo = self.drivers.get("sysTemp")
+        
+        # Bus time each scan can spend, and when each sensor was last read by time.monotonic() for planning scans.
+        self.scanBudget = scanBudget
+        self.lastRead = {}
         
         # Track temp and humidity data from our am2315.
         self.__thData = []
     
+    def hasSensor(self, sensor):
+        """
+        hasSensor(sensor)
+        
+        Is a sensor installed? Readings from sensors that aren't are None. Returns a boolean.
+        """
+        
+        return sensor in self.sensors
+    
+    def readCompound(self):
+        """
+        readCompound()
+        
+        Poll the compound sensor and read its channels for sensorRegistry. Returns a dict of channel name to value.
+        """
+        
+        self.pollCmpdSens()
+        
+        return {"windAvg": self.getWindAvgSpeed(), "windMax": self.getWindMaxSpeed(), "windAvgRaw": self.getWindAvgRaw(), "windMaxRaw": self.getWindMaxRaw(), \
+            "rain": self.getRainCount(), "rainReset": self.getRainReset(), "rainCumulative": self.getRainCumulative(), "lightLvl": self.getAmbientLight()}
+    
+    def readWindVane(self):
+        """
+        readWindVane()
+        
+        Read the wind vein's channel for sensorRegistry. Returns a dict of channel name to value.
+        """
+        
+        return {"windDir": self.getWindDir()}
+    
+    def readTempHumid(self):
+        """
+        readTempHumid()
+        
+        Poll the temperature and humidity sensor and read its channels for sensorRegistry. Returns a dict of channel name to value.
+        """
+        
+        self.pollTempHumid()
+        
+        return {"temp": self.getTemp(), "humid": self.getHumid()}
+    
+    def readBaro(self):
+        """
+        readBaro()
+        
+        Read the barometer's channel for sensorRegistry. Returns a dict of channel name to value.
+        """
+        
+        return {"baro": self.getBaro()}
+    
+    def readSysTemp(self):
+        """
+        readSysTemp()
+        
+        Read the system thermometer's channel for sensorRegistry. Returns a dict of channel name to value.
+        """
+        
+        return {"sysTemp": self.getSysTemp()}
+    
     def getWindDir(self):
         """
         getWindDir()
         
-        Get the heading of the wind in degrees. Returns an integer rounded to one decimal place.
+        Get the heading of the wind in degrees. A small batch of samples is validated, and the good ones are averaged. Returns an integer rounded to one decimal place, or None if none of the samples were good.
         """
         
-        # Magnetic sensor data (X, Z, Y)
-        magData = [0, 0, 0]
+        # Magnetic sensor data (X, Z, Y) for each sample.
+        magData = []
         
         # Configure magnetometer - no sample averaging, default 15 updates per second, no biasing,
         #  the lowest gain supported (230mG/LSB keeps the sensor for saturating),
@@ -73,10 +213,48 @@ class owsScanner:
         self.windDirSens.setReg(self.windDirSens.regMode, self.windDirSens.modeCont)
         
         # Get data from the magentometer.
-        magData = self.windDirSens.getXZY()
+        for i in range(self.__magSampleCt):
+            try:
+                magData.append(self.windDirSens.getXZY())
+            
+            except IOError:
+                # Data wasn't ready in time. Count it as missing.
+                magData.append([None, None, None])
+            
+            self.windDirSens.sleep(self.__magSampleDelay)
+        
+        # Validate each axis, and keep track of the flags for each sample.
+        flags = [0] * len(magData)
+        
+        for axis, axisName in [(0, "magX"), (1, "magZ"), (2, "magY")]:
+            axisFlags = self.sampleFilter.validate(axisName, [sample[axis] for sample in magData])
+            flags = [flag | int(axisFlag) for flag, axisFlag in zip(flags, axisFlags)]
+        
+        # Correct the X and Y readings for hard and soft iron distortion on the samples that passed.
+        goodIdx = [i for i in range(len(magData)) if flags[i] == self.sampleFilter.qualOk]
+        corrected = [self.magCal.apply(magData[i][0], magData[i][2]) for i in goodIdx]
+        
+        # Look for spikes in the field strength.
+        normFlags = self.sampleFilter.validate("magNorm", [math.sqrt(cx * cx + cy * cy) for cx, cy in corrected])
+        
+        for i, normFlag in zip(goodIdx, normFlags):
+            flags[i] = flags[i] | int(normFlag)
+        
+        corrected = [corrected[j] for j in range(len(goodIdx)) if normFlags[j] == self.sampleFilter.qualOk]
+        
+        # Record what we found.
+        self.__quality = self.__quality | (self.sampleFilter.combine(flags) << self.qualShiftMag)
+        
+        # If nothing was good we don't know where the wind is coming from.
+        if len(corrected) == 0:
+            return None
+        
+        # Average the good samples as vectors so we don't have problems around north.
+        magX = sum([sample[0] for sample in corrected]) / len(corrected)
+        magY = sum([sample[1] for sample in corrected]) / len(corrected)
         
         # Compute heading as a cartesian value given data on the X, Y planes. Heading is relative to the sensor, not north.
-        heading = math.atan2(magData[0], magData[2]) * 180.0 / math.pi
+        heading = math.atan2(magX, magY) * 180.0 / math.pi
         
         # Since the heading is reported from -180 to +180 make sure we compensate for that fact
         # to return a normal heading from 0 - 359 degrees.
@@ -101,6 +279,16 @@ class owsScanner:
         """
         
         self.cmpdSens.pollAll()
+        
+        # Validate the raw wind readings if we have an anemometer.
+        self.__windOk = True
+        
+        if self.cmpdSens.checkStatusReg(self.cmpdSens.i2cStatus_wind):
+            windFlags = self.sampleFilter.validate("windRaw", [self.cmpdSens.getWindAvgRaw(), self.cmpdSens.getWindMaxRaw()])
+            windFlags = self.sampleFilter.combine(windFlags)
+            
+            self.__quality = self.__quality | (windFlags << self.qualShiftWind)
+            self.__windOk = (windFlags == self.sampleFilter.qualOk)
     
     def getWindAvgSpeed(self):
         """
@@ -111,8 +299,8 @@ class owsScanner:
         
         retVal = None
         
-        # If our sensor reports having an anemometer module installed get the value.
-        if self.cmpdSens.checkStatusReg(self.cmpdSens.i2cStatus_wind):
+        # If our sensor reports having an anemometer module installed and the data is good get the value.
+        if self.cmpdSens.checkStatusReg(self.cmpdSens.i2cStatus_wind) and self.__windOk:
             retVal = self.cmpdSens.getWindAvg()
         
         return retVal
@@ -141,8 +329,8 @@ class owsScanner:
         
         retVal = None
         
-        # If our sensor reports having an anemometer module installed get the value.
-        if self.cmpdSens.checkStatusReg(self.cmpdSens.i2cStatus_wind):
+        # If our sensor reports having an anemometer module installed and the data is good get the value.
+        if self.cmpdSens.checkStatusReg(self.cmpdSens.i2cStatus_wind) and self.__windOk:
             retVal = self.cmpdSens.getWindMax()
         
         return retVal
@@ -177,6 +365,42 @@ class owsScanner:
         
         return retVal
     
+    def getWindStats(self):
+        """
+        getWindStats()
+        
+        Gets the wind stats since the last call from our windSampler. Returns a list with the peak 3 second gust in kph [0] and the datetime it happened [1], and the 2 minute [2] and 10 minute [3] average wind speeds in kph. Any of these can be None.
+        """
+        
+        return self.windStats.getStats()
+    
+    def getRainReset(self):
+        """
+        getRainReset()
+        
+        Checks to see if the compound sensor is doing its initial poll, which means it was just restarted and its rain counter started over. Returns True or False.
+        """
+        
+        return self.cmpdSens.checkStatusReg(self.cmpdSens.i2cStatus_initpoll)
+    
+    def getRainCumulative(self):
+        """
+        getRainCumulative()
+        
+        Checks to see if the compound sensor's rain counter is cumulative, which it is starting with firmware version 0.5. Older firmware reports hits per minute. Returns True or False.
+        """
+        
+        return self.cmpdSens.getVersion() >= 0.5
+    
+    def getRainRates(self, rainCt, dts, reset, cumulative):
+        """
+        getRainRates(rainCt, dts, reset, cumulative)
+        
+        Turn a rain counter reading taken at dts into a delta and rates. See owsRainCounter.update(). Returns a list with the delta in counts [0], counts per minute [1], and mm/h [2].
+        """
+        
+        return self.rainCounter.update(rainCt, dts, reset, cumulative)
+    
     def getAmbientLight(self):
         """
         getAmbientLight()
@@ -222,11 +446,18 @@ class owsScanner:
         """
         getBaro()
         
-        Get barometirc pressure in kPa. Returns a number rounded to two decimal points.
+        Get barometirc pressure in kPa. Returns a number rounded to two decimal points, or None if the reading didn't pass validation.
         """
         
         retVal = self.baroSens.getPressTemp()
         
+        # Validate the reading.
+        baroFlags = self.sampleFilter.combine(self.sampleFilter.validate("baro", [retVal[0]]))
+        self.__quality = self.__quality | (baroFlags << self.qualShiftBaro)
+        
+        if baroFlags != self.sampleFilter.qualOk:
+            return None
+        
         return retVal[0]
     
     def getSysTemp(self):
@@ -237,6 +468,24 @@ class owsScanner:
         """
         
         return self.sysThermo.getAmbientTemp()
+    
+    def getQuality(self):
+        """
+        getQuality()
+        
+        Gets the quality flags for the samples validated since the last call to resetQuality(). Each group of sensors has its own byte - see qualShiftMag, qualShiftWind, and qualShiftBaro, and the flags in owsSampleFilter. Returns an integer where 0 means all samples were good.
+        """
+        
+        return self.__quality
+    
+    def resetQuality(self):
+        """
+        resetQuality()
+        
+        Clear the quality flags. This should be run at the start of each scan.
+        """
+        
+        self.__quality = 0
 
 ################
 # Worker class #
@@ -244,11 +493,14 @@ class owsScanner:
 
 class worker(threading.Thread):
     """
-    Worker class - main execution thread takes one optional argument:
+    Worker class - main execution thread takes two optional arguments:
     debugOn: set to True for debugging output, set to False for no debugging output. Defaults to False.
+    scanner: an owsScanner object to use. Sharing one between workers keeps sample validation history between scans. If this is None a new one is created.
+    metricsFile: where to save a snapshot of the scanner's metrics after each scan for weatherService's /metrics endpoint. Defaults to "db/metrics.json".
+    dbFile: path to the weather Sqlite3 database file. Defaults to "db/weather.db".
     """
     
-    def __init__(self, debugOn = False):
+    def __init__(self, debugOn = False, scanner = None, metricsFile = "db/metrics.json", dbFile = "db/weather.db"):
         print("Init worker thread.")
         threading.Thread.__init__(self)
         
@@ -257,8 +509,39 @@ class worker(threading.Thread):
         if debugOn: print("Debugging enabled.")
         
         # Pull in necessary objects.
-        self.dl = owsData()
-        self.scanner = owsScanner()
+        if scanner is None:
+            scanner = owsScanner()
+        
+        self.scanner = scanner
+        
+        # Plugin sensors' channels get columns of their own.
+        self.dl = owsData(dbFile, sensorCols = sensorRegistry.getColumns(scanner.sensors))
+        
+        # Metrics snapshot for weatherService.
+        self.metricsFile = metricsFile
+        
+        # Where scan times come from. Replaying a capture sets this to the capture's clock.
+        self.clock = datetime.datetime.utcnow
+        
+        # Whether a scan's readings should be stored once the sensors are read. Replaying a capture stops once the capture runs out partway through a scan.
+        self.shouldStore = lambda: True
+        
+        # Gauges we export for each reading: the record index, the metric name, and its labels.
+        self.readingMetrics = [(1, "ows_temperature_celsius", None), (2, "ows_humidity_percent", None), (3, "ows_pressure_kpa", {"kind": "station"}), \
+            (21, "ows_pressure_kpa", {"kind": "sea_level"}), (4, "ows_rain_counter", None), (13, "ows_rain_rate_mm_per_hour", None), (5, "ows_wind_direction_degrees", None), \
+            (6, "ows_wind_speed_kph", {"kind": "avg"}), (7, "ows_wind_speed_kph", {"kind": "max"}), (14, "ows_wind_speed_kph", {"kind": "gust"}), \
+            (16, "ows_wind_speed_kph", {"kind": "avg2m"}), (17, "ows_wind_speed_kph", {"kind": "avg10m"}), (8, "ows_light_level", None), \
+            (9, "ows_system_temperature_celsius", None), (10, "ows_quality_flags", None), (18, "ows_dewpoint_celsius", None), (19, "ows_heat_index_celsius", None), \
+            (20, "ows_wind_chill_celsius", None)]
+        
+        # Where our columns end in a record and plugin sensors' channels start.
+        self.readingsEnd = 23
+        
+        registry.describe("ows_scan_seconds", "histogram", "Time to read each sensor in a scan in seconds, including retries.")
+        registry.describe("ows_scan_errors_total", "counter", "Failed sensor reads by sensor.")
+        registry.describe("ows_scan_cycle_seconds", "histogram", "Time for a whole scan in seconds.")
+        registry.describe("ows_last_scan_timestamp_seconds", "gauge", "When the last scan was taken, in seconds since the epoch.")
+        registry.describe("ows_sensor_reading", "gauge", "Plugin sensor readings by channel.")
         
     def displayRecord(self, allData, rawWind):
         """
@@ -277,32 +560,69 @@ class worker(threading.Thread):
         
         print("-> Average wind speed (kph): " + str(allData[6]))
         print("-> Maximum wind speed (kph): " + str(allData[7]))
+        print("-> Peak 3 sec. gust (kph):   " + str(allData[14]) + " at " + str(allData[15]))
+        print("-> 2 min. avg. wind (kph):   " + str(allData[16]))
+        print("-> 10 min. avg. wind (kph):  " + str(allData[17]))
         print("-> Average wind raw value:   " + str(rawWind[0]))
         print("-> Maximum wind raw value:   " + str(rawWind[1]))
         
         print("-> Rain counter:             " + str(allData[4]))
+        print("-> Rain delta (counts):      " + str(allData[11]))
+        print("-> Rain rate (counts/min):   " + str(allData[12]))
+        print("-> Rain rate (mm/h):         " + str(allData[13]))
         print("-> Ambient light:            " + str(allData[8]))
         
         # Check the wind direciton.
         print("\nWind vein...")
         print("-> Wind direction (deg):     " + str(allData[5]))
+        print("-> Wind cardinal dir.:       " + str(self.scanner.derived.getCardinalName(allData[22])))
         
         # Check the temperature and humidity.
         print("\nTemperature and humdity...")
         
         print("-> Temperature (C):          " + str(allData[1]))
         print("-> Humidity (%RH):           " + str(allData[2]))
+        print("-> Dew point (C):            " + str(allData[18]))
+        print("-> Heat index (C):           " + str(allData[19]))
+        print("-> Wind chill (C):           " + str(allData[20]))
         
         # Check barometer.
         print("\nBarometer...")
         print("-> Barometirc press. (kPa):  " + str(allData[3]))
+        print("-> Sea-level press. (kPa):   " + str(allData[21]))
         
         # Check system temperature.
         print("\nSystem thermometer...")
         print("-> System temperature (C):   " + str(allData[9]))
         
+        # Check sample quality.
+        print("\nSample quality...")
+        print("-> Quality flags:            " + str(hex(allData[10])))
+        
+        # Check plugin sensors.
+        if len(allData) > self.readingsEnd:
+            print("\nPlugin sensors...")
+            
+            for i in range(self.readingsEnd, len(allData)):
+                print("-> " + (self.dl.columns[i] + ":").ljust(26) + str(allData[i]))
+        
         print("")
     
+    def exportReadings(self, allData):
+        """
+        exportReadings(allData)
+        
+        Set the reading gauges from a record. Readings we don't have are removed so they aren't exported.
+        """
+        
+        for idx, name, labels in self.readingMetrics:
+            registry.set(name, allData[idx], labels)
+        
+        for i in range(self.readingsEnd, len(allData)):
+            registry.set("ows_sensor_reading", allData[i], {"channel": self.dl.columns[i]})
+        
+        registry.set("ows_last_scan_timestamp_seconds", self.dl.dtsToEpoch(allData[0]) / 1000000.0)
+    
     def run(self):
         """
         run(self)
@@ -310,190 +630,330 @@ class worker(threading.Thread):
         Principal method in thread. The work is done here.
         """
         
-        # Set loop control var #1
-        noSuccess = True
+        with tracer.span("scan", "scanner"):
+            self.scan()
+    
+    def scan(self):
+        """
+        scan()
         
-        # Set loop control var #2
-        attemptCount = 0
+        Read every sensor once, store the record, and export metrics.
+        """
         
-        # Try to read the compound sensor until we have good data OR we fail twice.
-        while(noSuccess and attemptCount < 2):
-            try:
-                # Poll the compound sensor and grab data from it.
-                self.scanner.pollCmpdSens()
-                
-                # Grab sensor data.
-                windAvgSpd = self.scanner.getWindAvgSpeed()
-                windMaxSpd = self.scanner.getWindMaxSpeed()
-                windAvgRaw = self.scanner.getWindAvgRaw()
-                windMaxRaw = self.scanner.getWindMaxRaw()
-                rainCt = self.scanner.getRainCount()
-                lightAmb = self.scanner.getAmbientLight()
-                
-                # If nothing has blown up so far, flag the loop to exit.
-                noSuccess = False
+        # Time the whole scan.
+        cycleStart = time.perf_counter()
+        
+        # Start with clean quality flags.
+        self.scanner.resetQuality()
+        
+        # Readings by channel name. Channels of sensors we don't read or can't get good data from stay None.
+        readings = {}
+        
+        # Read the sensors that are due and fit in the scan's bus time.
+        planTime = time.monotonic()
+        
+        for sensorName in sensorRegistry.plan(self.scanner.sensors, self.scanner.lastRead, planTime, self.scanner.scanBudget):
+            sensor = sensorRegistry.get(sensorName)
             
-            except Exception as e:
-                # D'oh. Log the exception or something.
-                print("Exception trying to poll compound sensor:")
-                pprint(e)
+            # Set loop control vars
+            noSuccess = True
+            attemptCount = 0
+            
+            # Time each sensor, retries and all.
+            sensorStart = time.perf_counter()
+            
+            # Try to read the sensor until we have good data OR we fail twice.
+            while(noSuccess and attemptCount < 2):
+                try:
+                    with tracer.span(sensorName, "scanner", {"attempt": attemptCount}):
+                        # Grab sensor data.
+                        values = sensor['read'](self.scanner, self.scanner.drivers[sensorName])
+                        
+                        # If nothing has blown up so far, flag the loop to exit.
+                        noSuccess = False
                 
-                # Increment our attempt counter.
-                attemptCount = attemptCount + 1
+                except Exception as e:
+                    # D'oh. Log the exception or something.
+                    print("Exception trying to poll " + sensor['description'] + ":")
+                    pprint(e)
+                    registry.inc("ows_scan_errors_total", {"sensor": sensorName})
+                    
+                    # Increment our attempt counter.
+                    attemptCount = attemptCount + 1
             
-        # If we didn't get good data, set everything to None to keep the program from blowing up.
-        if noSuccess:
-            windAvgSpd, windMaxSpd, windAvgRaw, windMaxRaw, rainCt, lightAmb = None
-        else:
-            # If we failed reset noSuccess for the next sensor.
-            noSuccess = True
+            sensorSeconds = time.perf_counter() - sensorStart
+            registry.observe("ows_scan_seconds", sensorSeconds, {"sensor": sensorName})
+            sensorRegistry.observeCost(sensorName, sensorSeconds)
+            
+            # Only keep the channels the sensor said it has.
+            if not noSuccess:
+                readings.update([(channel, values.get(channel)) for channel, chanType in sensor['channels']])
+                self.scanner.lastRead[sensorName] = planTime
         
-        # Reset the attempt counter.
-        attemptCount = 0
+        windAvgSpd, windMaxSpd, windAvgRaw, windMaxRaw = [readings.get(channel) for channel in ["windAvg", "windMax", "windAvgRaw", "windMaxRaw"]]
+        rainCt, rainReset, rainCumulative, lightAmb = [readings.get(channel) for channel in ["rain", "rainReset", "rainCumulative", "lightLvl"]]
+        windDir, temperature, humidity, baroPressure, sysTemp = [readings.get(channel) for channel in ["windDir", "temp", "humid", "baro", "sysTemp"]]
         
-        # Try to read the wind vein sensor until we have good data OR we fail twice.
-        while(noSuccess and attemptCount < 2):
-            try:
-                # Grab sensor data.
-                windDir = self.scanner.getWindDir()
-                
-                # If nothing has blown up so far, flag the loop to exit.
-                noSuccess = False
-                
-            except Exception as e:
-                # D'oh. Log the exception or something.
-                print("Exception trying to poll wind vein:")
-                pprint(e)
-                
-                # Increment our attempt counter.
-                attemptCount = attemptCount + 1
-            
-        # If we didn't get good data, set everything to None to keep the program from blowing up.
-        if noSuccess:
-            windDir = None
-        else:
-            # If we failed reset noSuccess for the next sensor.
-            noSuccess = True
+        if not self.shouldStore():
+            return
         
-        # Reset the attempt counter.
-        attemptCount = 0
+        # When we took this reading.
+        scanDts = self.clock()
         
-        # Try to read the temp/humidity sensor until we have good data OR we fail twice.
-        while(noSuccess and attemptCount < 2):
-            try:
-                # Poll the compound sensor and grab data from it.
-                self.scanner.pollTempHumid()
-                
-                # Grab sensor data.
-                temperature = self.scanner.getTemp()
-                humidity = self.scanner.getHumid()
-                 
-                # If nothing has blown up so far, flag the loop to exit.
-                noSuccess = False
+        # Turn the rain counter into a delta and rates.
+        rainDelta, rainCpm, rainRate = self.scanner.getRainRates(rainCt, scanDts, rainReset, rainCumulative)
         
-            except Exception as e:
-                # D'oh. Log the exception or something.
-                print("Exception trying to poll temperature and humidity sensor:")
-                pprint(e)
-                
-                # Increment our attempt counter.
-                attemptCount = attemptCount + 1
-            
-        # If we didn't get good data, set everything to None to keep the program from blowing up.
-        if noSuccess:
-            temperature, humidity = None
-        else:
-            # If we failed reset noSuccess for the next sensor.
-            noSuccess = True
+        # Get gusts and sustained wind since the last scan.
+        windGust, windGustDts, windAvg2m, windAvg10m = self.scanner.getWindStats()
         
-        # Reset the attempt counter.
-        attemptCount = 0
+        # Compute derived metrics so readers don't have to.
+        derived = self.scanner.derived.getDerived(temperature, humidity, baroPressure, windAvgSpd, windDir)
         
-        # Try to read the barometer sensor until we have good data OR we fail twice.
-        while(noSuccess and attemptCount < 2):
-            try:
-                # Grab sensor data.
-                baroPressure = self.scanner.getBaro()
-                 
-                # If nothing has blown up so far, flag the loop to exit.
-                noSuccess = False
+        # Create a tuple containing our data.
+        allData = (scanDts, temperature, humidity, baroPressure, \
+                   rainCt, windDir, windAvgSpd, windMaxSpd, lightAmb, sysTemp, self.scanner.getQuality(), \
+                   rainDelta, rainCpm, rainRate, windGust, windGustDts, windAvg2m, windAvg10m) + tuple(derived)
+        
+        # Plugin sensors' channels go in the columns after ours.
+        allData = allData + tuple([readings.get(colName) for colName in self.dl.columns[self.readingsEnd:]])
+        
+        # Insert the tuple into the database.
+        self.dl.addRecord(allData)
+        
+        # Export the readings and how long the scan took, and save our metrics where weatherService can serve them.
+        self.exportReadings(allData)
+        registry.observe("ows_scan_cycle_seconds", time.perf_counter() - cycleStart)
+        
+        try:
+            registry.saveSnapshot(self.metricsFile, "scanner")
+        
+        except Exception as e:
+            print("Exception trying to save metrics:")
+            pprint(e)
+        
+        # If we're debugging dump the data we just got.
+        if self.debugOn: self.displayRecord(allData, [windAvgRaw, windMaxRaw])
+
+
+#####################
+# windSampler class #
+#####################
+
+class windSampler(threading.Thread):
+    """
+    windSampler class - samples the compound sensor's wind speed now registers and the wind vein's magnetometer once a second. Wind speed is fed to an owsWindStats object,
+    and every raw sample is written to a memory mapped ring buffer so only the one minute records have to go to the database. Wind speed requires compound sensor firmware 0.6 or newer.
+    Takes two arguments and two optional arguments:
+    windStats: the owsWindStats object to feed.
+    windOffset: a number that specifies the DC offset (ADC reading as int) of the anemometer when standing still.
+    ringFile: path to the raw sample ring buffer file. Defaults to "db/samples.ring".
+    ringHours: how many hours of raw samples the ring buffer holds. Defaults to 6.
+    sensors: a list of the installed sensors' names. Wind speed needs the compound sensor and the raw magnetometer samples need the wind vein, and channels we don't have are NaN. Defaults to None, which means the built in sensors.
+    """
+    
+    def __init__(self, windStats, windOffset, ringFile = "db/samples.ring", ringHours = 6, sensors = None):
+        threading.Thread.__init__(self)
+        
+        # Don't keep the scanner alive just because we're sampling.
+        self.daemon = True
+        
+        self.windStats = windStats
+        
+        # Match the rate owsWindStats expects.
+        self.__interval = 1.0
+        
+        # We get our own sensor objects so we don't step on the worker threads.
+        if sensors is None:
+            sensors = sensorRegistry.defaultSensors
+        
+        self.cmpdSens, self.windDirSens = None, None
+        
+        if "compound" in sensors:
+            from compoundSensor import compoundSensor
+            self.cmpdSens = compoundSensor(windOffset)
+        
+        if "windVane" in sensors:
+            from hmc5883l import hmc5883l
+            self.windDirSens = hmc5883l()
+        
+        # Raw samples go here.
+        self.__ringFile = ringFile
+        self.__ringCapacity = int(ringHours * 3600 / self.__interval)
+        self.ringChannels = ["windNowRaw", "windNow", "magX", "magZ", "magY"]
+    
+    def run(self):
+        """
+        run(self)
+        
+        Principal method in thread. The work is done here.
+        """
+        
+        # Missing values in the ring buffer.
+        nan = float("nan")
+        
+        # Make sure the compound sensor can give us data this fast.
+        try:
+            ring = owsRingBuffer(self.__ringFile, self.ringChannels, self.__ringCapacity, writer = True)
+            
+            sampleWind = False
+            
+            if self.cmpdSens is not None:
+                self.cmpdSens.pollAll()
+                sampleWind = self.cmpdSens.checkStatusReg(self.cmpdSens.i2cStatus_wind) and (self.cmpdSens.getVersion() >= 0.6)
+            
+            if not sampleWind:
+                print("No compound sensor, or it has no anemometer or firmware older than 0.6, not sampling wind speed.")
+            
+            # Same magnetometer settings owsScanner.getWindDir() uses.
+            if self.windDirSens is not None:
+                self.windDirSens.setReg(self.windDirSens.regCfgA, (self.windDirSens.avg1 | self.windDirSens.freq15 | self.windDirSens.biasNone))
+                self.windDirSens.setReg(self.windDirSens.regCfgB, self.windDirSens.gain230)
+                self.windDirSens.setReg(self.windDirSens.regMode, self.windDirSens.modeCont)
+        
+        except Exception as e:
+            print("Exception trying to set up wind sampler:")
+            pprint(e)
+            return
+        
+        # Keep a steady sample rate no matter how long the bus takes.
+        nextSample = time.time()
+        
+        while(True):
+            sample = [nan] * len(self.ringChannels)
+            sampleTime = time.time()
+            
+            if sampleWind:
+                try:
+                    self.cmpdSens.pollWindNow()
+                    windNowRaw = self.cmpdSens.getWindNowRaw()
+                    windNow = self.cmpdSens.getWindNow()
+                    
+                    if windNow is not None:
+                        self.windStats.update(windNow, datetime.datetime.utcfromtimestamp(sampleTime))
+                        sample[0] = windNowRaw
+                        sample[1] = windNow
                 
-            except Exception as e:
-                # D'oh. Log the exception or something.
-                print("Exception trying to poll barometer:")
-                pprint(e)
+                except Exception as e:
+                    print("Exception trying to sample wind:")
+                    pprint(e)
+            
+            if self.windDirSens is not None:
+                try:
+                    sample[2:5] = self.windDirSens.getXZY()
                 
-                # Increment our attempt counter.
-        attemptCount = attemptCount + 1
-        
-        # If we didn't get good data, set everything to None to keep the program from blowing up.
-        if noSuccess:
-            baroPressure = None
-        else:
-            # If we failed reset noSuccess for the next sensor.
-            noSuccess = True
+                except IOError:
+                    # The magnetometer wasn't ready, we'll get it next time.
+                    pass
+            
+            ring.append(sampleTime, sample)
+            
+            nextSample = nextSample + self.__interval
+            tracer.sleep(max(0, nextSample - time.time()), "windSampleWait")
+
+#############
+# Functions #
+#############
+
+def main(configFile = None):
+    """
+    main([configFile = None])
+    
+    Run the scanner until we're killed, with settings from an owsConfig config file. Only the installed sensors' drivers are loaded.
+    """
+    
+    config = owsConfig(configFile)
+    dbFile = config.get('dbFile')
+    
+    registry.describe("ows_startup_seconds", "gauge", "Seconds from the process starting to the first record being stored.")
+    
+    # Threading setup
+    threadLock = threading.Lock()
+    threadList = []
+    
+    # Start watching the enclosure temperature. This runs on its own using the MCP9808's alert limits.
+    if config.hasSensor("sysTemp"):
+        from owsThermalWatch import owsThermalWatch
         
-        # Reset the attempt counter.
-        attemptCount = 0
+        print("Spinning up enclosure thermal watchdog thread.")
+        thermalWatch = owsThermalWatch(dbFile = dbFile)
+        thermalWatch.start()
+    
+    # Use the same scanner for every scan so our sample validation has some history.
+    stnScanner = owsScanner(config.get('magOffset'), config.get('windOffset'), config.get('magCalFile'), config.get('rainCal'), config.get('elevation'), config.get('sensors'), \
+        config.get('scanBudget'))
+    
+    # Sample the anemometer for gusts.
+    if config.hasSensor("compound") or config.hasSensor("windVane"):
+        print("Spinning up wind sampler thread.")
+        gustThread = windSampler(stnScanner.windStats, config.get('windOffset'), config.get('ringFile'), sensors = config.get('sensors'))
+        gustThread.start()
+    
+    # Pick the rain counter up where we left off.
+    startData = owsData(dbFile, compressArchive = config.get('compressArchive'))
+    lastRecord = startData.getLastRecord()
+    
+    if lastRecord is not None:
+        stnScanner.rainCounter.prime(lastRecord[4], startData.epochToDts(lastRecord[0]))
+    
+    # The last day we ran database maintenance, and whether we've said how long starting took.
+    maintainedDay = None
+    started = False
+    
+    # Run 'till we're killed for some reason.
+    while(True):
+        # Once a day fill in missing derived metrics, move closed months to the archive, roll up and drop old data, and give the space back so the database stays small.
+        thisDay = datetime.datetime.utcnow().strftime("%Y-%m-%d")
         
-        # Try to read the system thermometer sensor until we have good data OR we fail twice.
-        while(noSuccess and attemptCount < 2):
+        if thisDay != maintainedDay:
             try:
-                # Grab sensor data.
-                sysTemp = self.scanner.getSysTemp()
+                maintData = owsData(dbFile, compressArchive = config.get('compressArchive'))
+                print("Computed derived metrics for " + str(maintData.backfillDerived(stnScanner.derived)) + " records.")
+                print("Archived " + str(maintData.archiveClosedMonths()) + " records from closed months.")
                 
-                # If nothing has blown up so far, flag the loop to exit.
-                noSuccess = False
-                    
-            except Exception as e:
-                # D'oh. Log the exception or something.
-                print("Exception trying to poll system thermometer:")
-                pprint(e)
+                retention = maintData.applyRetention()
+                print("Rolled up " + str(retention['hourlyRolled']) + " hours and " + str(retention['dailyRolled']) + " days, deleted " + str(retention['rawDeleted']) + " raw, " + \
+                    str(retention['hourlyDeleted']) + " hourly, and " + str(retention['dailyDeleted']) + " daily records, and " + str(retention['monthsDeleted']) + " archived months.")
+                
+                vacuumed = maintData.vacuum()
+                print("Vacuum reclaimed " + str(vacuumed['reclaimed']) + " bytes.")
                 
-                # Increment our attempt counter.
-                attemptCount = attemptCount + 1
+                maintainedDay = thisDay
             
-        # If we didn't get good data, set everything to None to keep the program from blowing up.
-        if noSuccess:
-            sysTemp = None
-        else:
-            # If we failed reset noSuccess for the next sensor.
-            noSuccess = True
+            except Exception as e:
+                print("Exception trying to maintain the database:")
+                pprint(e)
         
-        # Create a tuple containing our data.
-        allData = (datetime.datetime.utcnow(), temperature, humidity, baroPressure, \
-                   rainCt, windDir, windAvgSpd, windMaxSpd, lightAmb, sysTemp)
+        # Set up our thread.
+        print("Spinning up poller thread.")
+        scanThread = worker(config.get('debug'), stnScanner, config.get('metricsFile'), dbFile)
+        scanThread.start()
+        threadList.append(scanThread)
         
-        # Insert the tuple into the database.
-        self.dl.addRecord(allData)
+        # Shut the thread down when it's done.
+        for t in threadList:
+            t.join()
         
-        # If we're debugging dump the data we just got.
-        if self.debugOn: self.displayRecord(allData, [windAvgRaw, windMaxRaw])
-
+        print("Poller thread closed.")
+        
+        # We're up once the first record is stored, so that's how long starting took.
+        if not started:
+            registry.set("ows_startup_seconds", registry.getUptime())
+            print("Scanner started in " + str(round(registry.getUptime(), 2)) + " seconds.")
+            started = True
+        
+        # Write out the trace if we're tracing.
+        tracer.flush()
+        
+        # Sleeping is important because it enables us to quit with control + C, and makes sure our thread runs every scanInterval seconds.
+        time.sleep(config.get('scanInterval'))
+    
+    print("Exiting.")
 
 #######################
 # Main execution body #
 #######################
 
-# Threading setup
-threadLock = threading.Lock()
-threadList = []
-
-# Run 'till we're killed for some reason.
-while(True):
-    # Set up our thread.
-    print("Spinning up poller thread.")
-    scanThread = worker(True)
-    scanThread.start()
-    threadList.append(scanThread)
-    
-    # Shut the thread down when it's done.
-    for t in threadList:
-        t.join()
-    
-    print("Poller thread closed.")
-    
-    # Sleeping is important because it enables us to quit with control + C, and makes sure our thread runs every 60 seconds.
-    time.sleep(60)
-
-print("Exiting.")
+# Only run when started as a program, so the classes can be imported for testing and benchmarks.
+# Usage: scanner.py [configFile]
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
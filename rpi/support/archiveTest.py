@@ -0,0 +1,52 @@
+# OpenWeatherStn archive test by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+
+# We live in support/, next to the station's modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from owsData import owsData
+
+########################
+# Main execution body #
+########################
+
+# Archive a month, put its records back in the live database like a run that was interrupted between writing the archive and deleting the records would leave them,
+# archive it again, and make sure every record is archived exactly once.
+workDir = tempfile.mkdtemp()
+
+try:
+    dl = owsData(os.path.join(workDir, "weather.db"))
+    monthStart, monthEnd = dl.archive.getMonthRange(2020, 1)
+
+    # One record an hour for the first 10 hours of the month.
+    records = [(monthStart + (i * 3600 * 1000000), 20.0 + i, 50.0, 1013.0, i, 180.0, 5.0, 8.0, 100.0, 30.0) for i in range(10)]
+
+    dl.addRecords(records)
+    print("Archived " + str(dl.archiveMonth(2020, 1)) + " records.")
+
+    # The interrupted run, plus a record that arrived late.
+    dl.addRecords(records + [(monthStart + (10 * 3600 * 1000000), 30.0, 50.0, 1013.0, 10, 180.0, 5.0, 8.0, 100.0, 30.0)])
+    print("Archived " + str(dl.archiveMonth(2020, 1)) + " records again.")
+
+    archived = dl.getRange(datetime.datetime(2020, 1, 1), datetime.datetime(2020, 2, 1))
+    archivedDts = [record[0] for record in archived]
+
+    print("Got " + str(len(archived)) + " records back.")
+
+    if (len(archived) != 11) or (len(set(archivedDts)) != len(archivedDts)):
+        print("FAIL: The month should have 11 records, each archived once.")
+        sys.exit(1)
+
+    print("OK")
+
+finally:
+    shutil.rmtree(workDir)
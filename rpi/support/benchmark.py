@@ -0,0 +1,323 @@
+# OpenWeatherStn benchmark suite by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import datetime
+import io
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# We live in support/, next to the station's modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from owsI2c import owsI2c
+from owsI2cSim import owsI2cSim
+from owsData import owsData
+from owsSynth import owsSynth
+
+#############
+# Functions #
+#############
+
+def percentile(samples, pct):
+    """
+    percentile(samples, pct)
+    
+    Get the pct percentile of a list of samples using the nearest rank.
+    """
+    
+    ordered = sorted(samples)
+    
+    return ordered[max(0, min(len(ordered) - 1, int(math.ceil(pct / 100.0 * len(ordered))) - 1))]
+
+def summarize(latencies, itemCt = 1):
+    """
+    summarize(latencies, [itemCt = 1])
+    
+    Summarize a list of call times in seconds where each call handled itemCt items. Returns a dict with the call count, items per second, and the mean, p50, and p99 call times in milliseconds.
+    """
+    
+    total = sum(latencies)
+    
+    return {"calls": len(latencies), "perSec": round(len(latencies) * itemCt / total, 1), "meanMs": round(total / len(latencies) * 1000.0, 4), \
+        "p50Ms": round(percentile(latencies, 50) * 1000.0, 4), "p99Ms": round(percentile(latencies, 99) * 1000.0, 4)}
+
+def timeCalls(func, count):
+    """
+    timeCalls(func, count)
+    
+    Call func count times. Returns a list of how long each call took in seconds.
+    """
+    
+    latencies = []
+    
+    for i in range(count):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    
+    return latencies
+
+def makeDatabase(dbFile, rowCt):
+    """
+    makeDatabase(dbFile, rowCt)
+    
+    Create a database with rowCt generated records, the newest of which is from the current minute. Returns the owsSynth object that made them, and the dts after the last record.
+    """
+    
+    endDts = datetime.datetime.utcnow().replace(second = 0, microsecond = 0)
+    
+    synth = owsSynth(rowCt)
+    synth.fill(owsData(dbFile), endDts - datetime.timedelta(minutes = rowCt - 1), rowCt)
+    
+    return synth, endDts + datetime.timedelta(minutes = 1)
+
+def benchStorage(rowCt):
+    """
+    benchStorage(rowCt)
+    
+    Benchmark owsData against a table with rowCt records: getLastRecord() and range query latency, then single and batched insert throughput. Returns a dict of results.
+    """
+    
+    dbFile = "db/storage" + str(rowCt) + ".db"
+    
+    genStart = time.perf_counter()
+    synth, nextDts = makeDatabase(dbFile, rowCt)
+    genSeconds = time.perf_counter() - genStart
+    
+    dl = owsData(dbFile)
+    results = {"generateSec": round(genSeconds, 3)}
+    
+    results['getLastRecord'] = summarize(timeCalls(dl.getLastRecord, 500))
+    
+    # An hour and a day of records back from the newest one.
+    for name, minutes, count in [("getRangeHour", 60, 200), ("getRangeDay", 1440, 20)]:
+        startDts = nextDts - datetime.timedelta(minutes = minutes)
+        results[name] = summarize(timeCalls(lambda: dl.getRange(startDts, nextDts), count))
+    
+    # New records go after the newest one.
+    records = synth.getRecords(nextDts, 2200)
+    singles = iter(records[:200])
+    results['addRecord'] = summarize(timeCalls(lambda: dl.addRecord(next(singles)), 200))
+    
+    batchSize = 100
+    batches = iter([records[i:i + batchSize] for i in range(200, len(records), batchSize)])
+    results['addRecords'] = summarize(timeCalls(lambda: dl.addRecords(next(batches)), 20), batchSize)
+    results['addRecords']['batchSize'] = batchSize
+    
+    return results
+
+def benchService(rowCt):
+    """
+    benchService(rowCt)
+    
+    Benchmark weatherService.worker() with JSON, HTML, and standard unit requests against a database with rowCt records. Returns a dict of results.
+    """
+    
+    makeDatabase("db/weather.db", rowCt)
+    
+    from weatherService import weatherService
+    
+    service = weatherService()
+    
+    def startResponse(status, headers):
+        if status != "200 OK":
+            raise RuntimeError("Request failed: " + status)
+    
+    def request(method, path, body = b""):
+        env = {"REQUEST_METHOD": method, "PATH_INFO": path, "QUERY_STRING": "", "CONTENT_LENGTH": str(len(body)), "wsgi.input": io.BytesIO(body)}
+        
+        # Join the body so encoding it counts.
+        return b"".join(service.worker(env, startResponse))
+    
+    variants = [("json", "POST", "/", b"{}"), ("jsonStandard", "POST", "/", b'{"units": "standard"}'), ("html", "GET", "/", b""), ("htmlStandard", "GET", "/standard", b"")]
+    results = {"rows": rowCt}
+    
+    for name, method, path, body in variants:
+        # Warm up caches before we start timing.
+        request(method, path, body)
+        results[name] = summarize(timeCalls(lambda: request(method, path, body), 1000))
+    
+    return results
+
+def benchScanner(scanCt):
+    """
+    benchScanner(scanCt)
+    
+    Benchmark scanner worker scans on the simulated bus. Sensor waits are skipped, so perSec is how many scans a second the software can manage. busMsPerScan and waitMsPerScan are how long
+    the real bus transfers and sensor waits would add, and modeledScansPerSec puts it all together. Returns a dict of results.
+    """
+    
+    from scanner import owsScanner, worker
+    
+    # Each scan sees the next minute of generated weather.
+    bus = owsI2c.bus
+    bus.play(owsSynth().getFrames(datetime.datetime.utcnow(), scanCt + 1))
+    bus.advance()
+    
+    scanWorker = worker(False, owsScanner())
+    
+    # Warm up, then reset the counters.
+    scanWorker.scan()
+    transactions = bus.transactions
+    busSeconds = bus.busSeconds
+    sleepSeconds = bus.sleepSeconds
+    
+    def scan():
+        bus.advance()
+        scanWorker.scan()
+    
+    results = summarize(timeCalls(scan, scanCt))
+    
+    busMs = (bus.busSeconds - busSeconds) / scanCt * 1000.0
+    waitMs = (bus.sleepSeconds - sleepSeconds) / scanCt * 1000.0
+    
+    results['transactionsPerScan'] = (bus.transactions - transactions) / scanCt
+    results['busMsPerScan'] = round(busMs, 4)
+    results['waitMsPerScan'] = round(waitMs, 4)
+    results['modeledScansPerSec'] = round(1000.0 / (results['meanMs'] + busMs + waitMs), 3)
+    
+    return results
+
+def benchStartup(runCt):
+    """
+    benchStartup(runCt)
+    
+    Benchmark how long each program's modules take to import in a fresh interpreter, which is most of how long a program takes to start. The time a bare interpreter takes to start is
+    measured the same way and taken off, so the results are just our imports. Returns a dict of results by module.
+    """
+    
+    # Import from the station's directory the way the programs do.
+    modDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    
+    def run(code):
+        subprocess.run([sys.executable, "-c", code], cwd = modDir, check = True)
+    
+    interpreter = timeCalls(lambda: run("pass"), runCt)
+    interpreterMean = sum(interpreter) / len(interpreter)
+    results = {"interpreterMs": round(interpreterMean * 1000.0, 4)}
+    
+    for module in ["scanner", "weatherService", "centralService", "uplink"]:
+        latencies = timeCalls(lambda: run("import " + module), runCt)
+        results[module] = summarize([max(latency - interpreterMean, 1e-6) for latency in latencies])
+    
+    return results
+
+def flatten(results, prefix = ""):
+    """
+    flatten(results, [prefix = ""])
+    
+    Flatten nested results into a dict of dotted names to numbers.
+    """
+    
+    flat = {}
+    
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + "."))
+        elif isinstance(value, (int, float)):
+            flat[prefix + key] = value
+    
+    return flat
+
+def compare(results, baseline, threshold = 15.0):
+    """
+    compare(results, baseline, [threshold = 15.0])
+    
+    Print how each rate and time changed since a baseline run. Rates (PerSec) should go up and times (Ms) should go down, and changes for the worse by more than threshold percent
+    are flagged as regressions. p99 times are noisy, so they're only flagged when they're worse by more than twice the threshold. Returns the number of regressions.
+    """
+    
+    current = flatten(results['results'])
+    previous = flatten(baseline['results'])
+    regressions = 0
+    
+    for name in sorted(current):
+        if (name not in previous) or (previous[name] == 0):
+            continue
+        
+        if name.endswith("PerSec"):
+            change = (current[name] - previous[name]) / previous[name] * 100.0
+        elif name.endswith("Ms"):
+            change = (previous[name] - current[name]) / previous[name] * 100.0
+        else:
+            continue
+        
+        flag = ""
+        
+        if change < -(threshold * 2 if name.endswith("p99Ms") else threshold):
+            flag = "  REGRESSION"
+            regressions = regressions + 1
+        
+        print("%-48s %14s -> %-14s %+7.1f%%%s" % (name, previous[name], current[name], change, flag))
+    
+    return regressions
+
+#######################
+# Main execution body #
+#######################
+
+# Usage: benchmark.py [results.json] [baseline.json]
+outFile = os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else os.path.abspath("benchmark.json")
+baselineFile = os.path.abspath(sys.argv[2]) if len(sys.argv) > 2 else None
+
+# Table sizes for the storage benchmarks, the size of the service's table, and how many scans to time.
+tableSizes = [1000, 10000, 100000]
+serviceRows = 10000
+scanCt = 200
+startupRuns = 10
+
+# Everything runs in a scratch directory with its own db folder, and sensors talk to the simulated bus.
+workDir = tempfile.mkdtemp(prefix = "owsBench")
+startDir = os.getcwd()
+os.chdir(workDir)
+os.mkdir("db")
+
+owsI2c.bus = owsI2cSim()
+
+results = {"started": datetime.datetime.utcnow().isoformat(), "python": platform.python_version(), "platform": platform.platform(), "results": {}}
+
+try:
+    print("Startup...")
+    results['results']['startup'] = benchStartup(startupRuns)
+    
+    print("Scanner...")
+    results['results']['scanner'] = benchScanner(scanCt)
+    
+    results['results']['storage'] = {}
+    
+    for rowCt in tableSizes:
+        print("Storage with " + str(rowCt) + " rows...")
+        results['results']['storage'][str(rowCt)] = benchStorage(rowCt)
+    
+    print("Service...")
+    results['results']['service'] = benchService(serviceRows)
+
+finally:
+    os.chdir(startDir)
+    shutil.rmtree(workDir, ignore_errors = True)
+
+with open(outFile, "w") as resultFile:
+    json.dump(results, resultFile, indent = 2, sort_keys = True)
+
+print(json.dumps(results['results'], indent = 2, sort_keys = True))
+print("Saved results to " + outFile + ".")
+
+if baselineFile is not None:
+    with open(baselineFile, "r") as previousFile:
+        baseline = json.load(previousFile)
+    
+    print("\nCompared to " + baselineFile + " from " + str(baseline.get('started')) + ":")
+    regressions = compare(results, baseline)
+    print(str(regressions) + " regressions.")
+    
+    sys.exit(1 if regressions > 0 else 0)
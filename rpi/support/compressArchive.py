@@ -0,0 +1,47 @@
+# OpenWeatherStn archive compression by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import os
+import sys
+import time
+
+# We live in support/, next to the station's modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from owsArchive import owsArchive
+
+########################
+# Main execution body #
+########################
+
+# Rewrite every archived month in owsArchive's compressed format, or back to the uncompressed one with "expand". Months that are already in the format we want are rewritten the same way, which is harmless.
+# Start the scanner with compressArchive set afterwards so new months are compressed too.
+# Usage: compressArchive.py [archiveDir] [compress|expand]
+archiveDir = "db/archive"
+compress = True
+
+if len(sys.argv) > 1:
+    archiveDir = sys.argv[1]
+
+if len(sys.argv) > 2:
+    compress = (sys.argv[2] != "expand")
+
+archive = owsArchive(archiveDir, compress)
+totalBefore = 0
+totalAfter = 0
+
+for year, month in archive.getMonths():
+    start = time.perf_counter()
+    before, after = archive.convertMonth(year, month)
+    elapsed = time.perf_counter() - start
+    
+    totalBefore = totalBefore + before
+    totalAfter = totalAfter + after
+    
+    print("%04d-%02d: %d -> %d bytes in %.1f seconds." % (year, month, before, after, elapsed))
+
+if totalAfter > 0:
+    print("Archive went from " + str(totalBefore) + " to " + str(totalAfter) + " bytes (" + str(round(totalBefore / float(totalAfter), 1)) + "x).")
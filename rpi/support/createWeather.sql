@@ -1,12 +1,77 @@
+PRAGMA auto_vacuum = INCREMENTAL;
+PRAGMA user_version = 2;
+
 CREATE TABLE weather(
-    dts TIMESTAMP NOT NULL PRIMARY KEY,
-    temp NUMERIC,
-    humid NUMERIC,
-    baro NUMERIC,
-    rain NUMERIC,
-    windDir NUMERIC,
-    windAvg NUMERIC,
-    windMax NUMERIC,
-    lightLvl NUMERIC,
-    sysTemp NUMERIC
+    dts INTEGER PRIMARY KEY,
+    temp REAL,
+    humid REAL,
+    baro REAL,
+    rain INTEGER,
+    windDir REAL,
+    windAvg REAL,
+    windMax REAL,
+    lightLvl REAL,
+    sysTemp REAL,
+    quality INTEGER,
+    rainDelta INTEGER,
+    rainCpm REAL,
+    rainRate REAL,
+    windGust REAL,
+    windGustDts INTEGER,
+    windAvg2m REAL,
+    windAvg10m REAL,
+    dewpoint REAL,
+    heatIndex REAL,
+    windChill REAL,
+    seaLevelBaro REAL,
+    windDirCrd INTEGER
+);
+
+CREATE TABLE events(
+    dts INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    event TEXT NOT NULL,
+    value REAL
+);
+
+CREATE INDEX eventsSourceDts ON events(source, dts);
+
+CREATE TABLE weatherHourly(
+    dts INTEGER PRIMARY KEY,
+    samples INTEGER,
+    temp REAL,
+    tempMin REAL,
+    tempMax REAL,
+    humid REAL,
+    baro REAL,
+    rainDelta INTEGER,
+    rainRateMax REAL,
+    windDir REAL,
+    windAvg REAL,
+    windMax REAL,
+    windGust REAL,
+    lightLvl REAL,
+    sysTemp REAL,
+    sysTempMax REAL,
+    quality INTEGER
+);
+
+CREATE TABLE weatherDaily(
+    dts INTEGER PRIMARY KEY,
+    samples INTEGER,
+    temp REAL,
+    tempMin REAL,
+    tempMax REAL,
+    humid REAL,
+    baro REAL,
+    rainDelta INTEGER,
+    rainRateMax REAL,
+    windDir REAL,
+    windAvg REAL,
+    windMax REAL,
+    windGust REAL,
+    lightLvl REAL,
+    sysTemp REAL,
+    sysTempMax REAL,
+    quality INTEGER
 );
\ No newline at end of file
@@ -0,0 +1,29 @@
+# OpenWeatherStn database migration by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import sys
+from owsData import owsData
+
+########################
+# Main execution body #
+########################
+
+# owsData brings the database up to date when it's opened. Running this before starting the scanner and web service
+# keeps them from waiting on a large migration. If it's interrupted, run it again to pick up where it left off.
+dbFile = "db/weather.db"
+
+if len(sys.argv) > 1:
+    dbFile = sys.argv[1]
+
+print("Migrating " + dbFile + "...")
+dl = owsData(dbFile)
+
+lastRecord = dl.getLastRecord()
+
+if lastRecord is not None:
+    print("Done. Latest record is from " + str(dl.epochToDts(lastRecord[0])) + ".")
+else:
+    print("Done. The database is empty.")
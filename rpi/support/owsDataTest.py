@@ -16,5 +16,5 @@ dl = owsData()
 
 lastRecord = dl.getLastRecord()
 
-print("Got record from: " + str(lastRecord[0]))
+print("Got record from: " + str(dl.epochToDts(lastRecord[0])))
 pprint(lastRecord)
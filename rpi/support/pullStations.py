@@ -0,0 +1,76 @@
+# OpenWeatherStn central station puller by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import json
+import os
+import sys
+import time
+import urllib.request
+
+# We live in support/, next to the station's modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from owsCentral import owsCentral
+
+#############
+# Functions #
+#############
+
+def pullStation(central, station, url):
+    """
+    pullStation(central, station, url)
+    
+    Ask a station's weatherService for the raw records newer than the latest one we have from it, up to the day of history it keeps online, and store them. Returns the number of records added.
+    """
+    
+    lastDts = central.getLastDts(station)
+    hours = 24.0
+    
+    # Only ask for what we're missing, with a minute of overlap. Records we already have are skipped.
+    if lastDts is not None:
+        hours = min(hours, max((time.time() * 1000000 - lastDts) / 3600000000.0 + (1.0 / 60), 1.0 / 60))
+    
+    query = json.dumps({"queries": [{"type": "history", "period": "raw", "hours": hours}]}).encode("utf-8")
+    request = urllib.request.Request(url, data = query, headers = {"Content-Type": "application/json"})
+    
+    with urllib.request.urlopen(request, timeout = 30) as response:
+        history = json.loads(response.read().decode("utf-8"))['results'][0]
+    
+    columns = list(history['columns'].keys())
+    records = list(zip(*[history['columns'][name] for name in columns]))
+    
+    added, duplicates = central.addRecords(station, records, columns)
+    
+    return added
+
+########################
+# Main execution body #
+########################
+
+# Pull records from stations that can't push them, by asking each station's weatherService for its recent history. Stations are given as stationId=url, like roof=http://roof.local/.
+# Runs once, or every interval seconds if interval isn't 0. A station has to be pulled at least once a day or records fall out of what it serves.
+# Usage: pullStations.py centralDbFile interval stationId=url [stationId=url ...]
+if len(sys.argv) < 4:
+    print("Usage: pullStations.py centralDbFile interval stationId=url [stationId=url ...]")
+    sys.exit(1)
+
+central = owsCentral(sys.argv[1])
+interval = float(sys.argv[2])
+stations = [arg.split("=", 1) for arg in sys.argv[3:]]
+
+while True:
+    for station, url in stations:
+        try:
+            print(station + ": added " + str(pullStation(central, station, url)) + " records.")
+        
+        # Keep pulling the other stations when one is down.
+        except Exception as e:
+            print(station + ": " + str(e))
+    
+    if interval <= 0:
+        break
+    
+    time.sleep(interval)
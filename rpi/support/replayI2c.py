@@ -0,0 +1,62 @@
+# OpenWeatherStn I2C capture replay by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import os
+import sys
+import time
+
+# We live in support/, next to the station's modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from owsI2c import owsI2c
+from owsI2cReplay import owsI2cReplay
+
+########################
+# Main execution body #
+########################
+
+# Run the scanner over an I2C capture made with OWS_I2C_CAPTURE set, storing the records it makes in a separate database. Records get the times they were captured at.
+# Decoder changes and calibration fixes can be checked against real sensor data this way. Only the scanner's reads are replayed, so wind gusts and sustained wind are missing.
+# Usage: replayI2c.py captureFile [dbFile]
+if len(sys.argv) < 2:
+    print("Usage: replayI2c.py captureFile [dbFile]")
+    sys.exit(1)
+
+captureFile = sys.argv[1]
+dbFile = "db/replay.db"
+
+if len(sys.argv) > 2:
+    dbFile = sys.argv[2]
+
+# Sensors have to be created after the bus is set.
+replay = owsI2cReplay(captureFile)
+owsI2c.bus = replay
+
+from scanner import owsScanner, worker
+
+scanWorker = worker(False, owsScanner(), dbFile + ".metrics.json", dbFile = dbFile)
+scanWorker.clock = replay.getDts
+
+# The scan that runs out of capture is only partly read, so it isn't stored.
+scanWorker.shouldStore = lambda: not replay.exhausted
+
+print("Replaying " + captureFile + " into " + dbFile + "...")
+
+start = time.perf_counter()
+scanCt = 0
+
+while True:
+    scanWorker.scan()
+    
+    if replay.exhausted:
+        break
+    
+    scanCt = scanCt + 1
+
+elapsed = time.perf_counter() - start
+
+print("Replayed " + str(scanCt) + " scans from " + str(replay.transactions) + " transactions in " + str(round(elapsed, 1)) + " seconds, skipping " + \
+    str(replay.skipped) + " captured transactions nothing asked for.")
@@ -0,0 +1,52 @@
+# OpenWeatherStn synthetic database generator by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import datetime
+import os
+import sys
+import time
+
+# We live in support/, next to the station's modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from owsData import owsData
+from owsSynth import owsSynth
+
+########################
+# Main execution body #
+########################
+
+# Fill an empty database with days of generated one minute records ending now, for load testing or trying out the web service.
+# Usage: synthDb.py [dbFile] [days] [seed]
+dbFile = "db/weather.db"
+days = 365
+seed = 0
+
+if len(sys.argv) > 1:
+    dbFile = sys.argv[1]
+
+if len(sys.argv) > 2:
+    days = float(sys.argv[2])
+
+if len(sys.argv) > 3:
+    seed = int(sys.argv[3])
+
+dl = owsData(dbFile)
+
+if dl.getLastRecord() is not None:
+    print(dbFile + " already has records. Generated records go in an empty database.")
+    sys.exit(1)
+
+rowCt = int(days * 1440)
+endDts = datetime.datetime.utcnow().replace(second = 0, microsecond = 0)
+
+print("Generating " + str(rowCt) + " records in " + dbFile + "...")
+
+start = time.perf_counter()
+added = owsSynth(seed).fill(dl, endDts - datetime.timedelta(minutes = rowCt - 1), rowCt)
+elapsed = time.perf_counter() - start
+
+print("Added " + str(added) + " records in " + str(round(elapsed, 1)) + " seconds (" + str(int(added / elapsed)) + " records per second).")
@@ -0,0 +1,44 @@
+# OpenWeatherStn uplink utility by ThreeSixes (https://github.com/ThreeSixes/OpenWeatherStn)
+
+###########
+# Imports #
+###########
+
+import sys
+
+# Data layer
+from owsData import owsData
+
+# Store and forward uplink
+from owsUplink import owsUplink
+
+# Performance counters
+from owsMetrics import registry
+
+#############
+# Functions #
+#############
+
+def main(url, station, dbFile = "db/weather.db"):
+    """
+    main(url, station, [dbFile = "db/weather.db"])
+    
+    Send records to the central server until we're killed.
+    """
+    
+    stnUplink = owsUplink(owsData(dbFile), url, station)
+    print("Sending records to " + url + " as " + station + " using " + str(stnUplink.compression) + " compression, started in " + str(round(registry.getUptime(), 2)) + " seconds.")
+    stnUplink.run()
+
+#######################
+# Main execution body #
+#######################
+
+# Ship this station's records to a central server running centralService.py, picking up where the server last acknowledged. Run it next to scanner.py.
+# Usage: uplink.py ingestUrl stationId [dbFile]
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: uplink.py ingestUrl stationId [dbFile]")
+        sys.exit(1)
+    
+    main(*sys.argv[1:4])
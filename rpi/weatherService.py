@@ -7,10 +7,19 @@
 import json
 import datetime
 import struct
-import math
+import sys
 from owsData import owsData
+from owsDerived import owsDerived
+from owsCompass import owsCompass
+from owsUnits import owsUnits
+from owsHtml import owsHtml
+from owsEncoder import owsEncoder
+from owsRing import owsRingBuffer
+from owsMetrics import registry
+from owsTrace import tracer
+from owsConfig import owsConfig
 from pprint import pprint
-from wsgiref.simple_server import make_server
+from urllib.parse import parse_qs
 
 ########################
 # weatherService class #
@@ -21,156 +30,300 @@ class weatherService:
     Simple HTTP service for handling weather data requests.
     """
 
-    def __init__(self):
-        self.dl = owsData() # Data layer
+    def __init__(self, ringFile = "db/samples.ring", metricsFile = "db/metrics.json", dbFile = "db/weather.db"):
+        self.dl = owsData(dbFile) # Data layer
+        self.derived = owsDerived() # Derived metric names
+        
+        # Compass point lookups for clients that want more than the 8 points we store.
+        self.__compasses = dict([(points, owsCompass(points)) for points in [8, 16, 32]])
+        
+        # Unit systems clients can ask for.
+        self.units = owsUnits()
+        
+        # Live page templates
+        self.html = owsHtml()
+        
+        # Response encoder for JSON, MessagePack, and CBOR.
+        self.encoder = owsEncoder()
+        
+        # Unit conversions for history columns, which use the data layer's column names.
+        self.historyUnits = owsUnits({"temp": "temperature", "tempMin": "temperature", "tempMax": "temperature", "dewpoint": "temperature", "heatIndex": "temperature", \
+            "windChill": "temperature", "sysTemp": "temperature", "sysTempMax": "temperature", "baro": "pressure", "seaLevelBaro": "pressure", "rainRate": "rainRate", \
+            "rainRateMax": "rainRate", "windAvg": "speed", "windMax": "speed", "windGust": "speed", "windAvg2m": "speed", "windAvg10m": "speed"})
+        
+        # Most queries we answer in one batch request, and the most history we return for each period.
+        self.maxQueries = 16
+        self.maxHistoryHours = {"raw": 24.0, "hourly": 24.0 * 93, "daily": 24.0 * 3660}
         self.modeJson = False # Default to JSON mode.        
+        
+        # Raw sample ring buffer written by the scanner. We open it when we first need it.
+        self.__ringFile = ringFile
+        self.__ring = None
+        
+        # Metrics snapshot saved by the scanner after each scan.
+        self.__metricsFile = metricsFile
+        
+        registry.describe("ows_http_request_seconds", "histogram", "HTTP request time in seconds by route.")
     
-    def __getDewpoint(self, temp, rh):
+    def __getRecentSamples(self, count):
         """
-        __getDewpoint(temp, rh)
+        __getRecentSamples(count)
         
-        Estimates the dew point given a temperature in degrees celsius and relative humidity as a percentage. Returns an integer representing dew point in degrees celsius rounded to one decimal point.
+        Get the last count raw samples from the scanner's ring buffer. count is clamped to between 1 and what the buffer holds. Returns a dict with a list of values for each channel,
+        plus "dts" in seconds since the epoch.
         """
         
-        retVal = 243.04 * (math.log(rh / 100) + ((17.625 * temp) / (243.04 + temp))) / \
-            (17.625 - math.log(rh / 100) - ((17.625 * temp) / (243.04 + temp))) 
+        # Open the ring buffer the first time we're asked.
+        if self.__ring is None:
+            self.__ring = owsRingBuffer(self.__ringFile)
+        
+        count = max(1, min(count, self.__ring.capacity))
+        records = self.__ring.getRecent(count)
+        names = ["dts"] + self.__ring.channels
+        
+        retVal = {}
         
-        return round(retVal, 1)
+        # Turn the records into columns, and NaN into null.
+        for i in range(len(names)):
+            if hasattr(records, "dtype"):
+                column = records[names[i]].tolist()
+            else:
+                column = [record[i] for record in records]
+            
+            retVal[names[i]] = [None if v != v else v for v in column]
+        
+        return retVal
     
-    def __htmlify(self, weatherDict):
+    def __getLatestRecord(self):
         """
-        __htmlify(weatherDict)
+        __getLatestRecord()
         
-        Convert weather data to an HTML page. Returns a string.
+        Pull the most recent record and the latest enclosure thermal alert from the data layer. Returns a tuple of the record and the alert.
         """
-        # HTML header
-        body = "<HTML>\n<HEAD>\n<META http-equiv=\"refresh\" content=\"60\" />\n<TITLE>OpenWeatherStn live data</TITLE>\n</HEAD>\n"
-        body = body + "<BODY style=\"font-family: sans-serif; background-color: black; color: white;\">\n"
         
-        # Intro text
-        body = body + "<SPAN style=\"font-size: large; font-weight: bold;\">Open Weather Station live data</SPAN>\n<BR />\n<BR />\n"
+        # Pull the most recent record from the data layer.
+        record = self.dl.getLastRecord()
         
-        # Build page with data.
-        body = body + "Reading taken: " + weatherDict['dts'] + " UTC\n<BR />\n<BR />\n"
+        # Pull the latest enclosure thermal alert. We haven't had one if there's no event.
+        sysAlert = self.dl.getLastEvent("sysTemp")
         
-        # Start creating an output table.
-        body = body + "<TABLE style=\"border: 1px solid black;\">\n"
+        if sysAlert is None:
+            sysAlert = "normal"
+        else:
+            sysAlert = sysAlert[2]
         
-        # Get all the weathers!
-        for key in ["temp", "humid", "baro", "windAvgSpd", "windMaxSpd", "windDirCrd", "windDir", "rainCt", "dewpoint", "lightAmb", "sysTemp"]:
-            if key != 'dts':
-                body = body + "<TR><TD style=\"font-weight: bold;\">" + weatherDict[key]['name'] + "</TD><TD>" + str(weatherDict[key]['value'])
-                
-                # Inject (or not) additional data.
-                if weatherDict[key]['unit'] != None: body = body + " " + weatherDict[key]['unit']
-            
-            # End cell
-            body = body + "</TD></TR>\n"
-            
-        # HTML footer
-        body = body + "</TABLE>\n</BODY>\n</HTML>"
+        return (record, sysAlert)
+    
+    def __buildRecord(self, record, sysAlert):
+        """
+        __buildRecord(record, sysAlert)
         
-        # Return page
-        return body
+        Build the dicts we return for a record from the data layer. Returns a tuple of the measured fields and the computed fields.
+        """
+        
+        # Format the date time stamp, which is stored in epoch microseconds.
+        dts = self.dl.epochToDts(record[0]).strftime("%Y-%m-%d %H:%M:%S.%f")
+        
+        # Build dict for JSONification.
+        lastRecord = {"dts": dts, \
+            "temp": {"name": "Temperature", "value": record[1], "unit": "C"}, \
+            "humid": {"name": "Humidity", "value": record[2], "unit": "%RH"}, \
+            "baro": {"name": "Barometric pressure", "value": record[3], "unit": "kPa"}, \
+            "rainCt": {"name": "Rain counter", "value": record[4], "unit": "counts"}, \
+            "rainRate": {"name": "Rain rate", "value": record[13], "unit": "mm/h"}, \
+            "windDir": {"name": "Wind direction", "value": record[5], "unit": "degrees"}, \
+            "windAvgSpd": {"name": "Average wind speed", "value": record[6], "unit": "kph"}, \
+            "windMaxSpd": {"name": "Maximum wind speed", "value": record[7], "unit": "kph"}, \
+            "windGust": {"name": "Peak 3 sec. gust", "value": record[14], "unit": "kph"}, \
+            "windGustDts": {"name": "Peak gust time", "value": None if record[15] is None else self.dl.epochToDts(record[15]).strftime("%Y-%m-%d %H:%M:%S.%f"), "unit": "UTC"}, \
+            "windAvg2m": {"name": "2 min. average wind speed", "value": record[16], "unit": "kph"}, \
+            "windAvg10m": {"name": "10 min. average wind speed", "value": record[17], "unit": "kph"}, \
+            "lightAmb": {"name": "Ambient light", "value": record[8], "unit": None}, \
+            "sysTemp": {"name": "System temperature", "value": record[9], "unit": "C"}, \
+            "sysAlert": {"name": "System thermal alert", "value": sysAlert, "unit": None}}
+        
+        # Derived metrics were computed when the record was stored.
+        computed = {"dewpoint": {"name": "Dew point", "value": record[18], "unit": "C"}, \
+            "heatIndex": {"name": "Heat index", "value": record[19], "unit": "C"}, \
+            "windChill": {"name": "Wind chill", "value": record[20], "unit": "C"}, \
+            "seaLevelBaro": {"name": "Sea-level pressure", "value": record[21], "unit": "kPa"}, \
+            "windDirCrd": {"name": "Wind cardinal dir.", "value": self.derived.getCardinalName(record[22]), "unit": None}}
+        
+        return (lastRecord, computed)
     
-    def __toStandard(self, data):
+    def __runLatest(self, record, sysAlert, options, fmt):
         """
-        __toStandard(data)
+        __runLatest(record, sysAlert, options, fmt)
         
-        Converts all metric readings into standard/imperial units. Returns a dict.
+        Answer a query for the latest record with options like {"extra": "computed", "units": "imperial", "schema": "compact"}. Returns the encoded result.
         """
         
-        # Loop through our data, looking for C, kph, kPa
-        for point in data:
-            # Don't try to handle the timestamp here.
-            if point != 'dts':
-                # Convert a celcius temp to farenheit
-                if data[point]['unit'] == "C":
-                    data[point]['unit'] = "F"
-                    data[point]['value'] = round((data[point]['value'] * 9.0) / 5.0 + 32.0, 3)
+        lastRecord, computed = self.__buildRecord(record, sysAlert)
+        
+        # Do we want extra data?
+        if 'extra' in options:
+            # Are we asking for computed values?
+            if options['extra'] == "computed":
+                # Add some computed values
+                lastRecord.update(computed)
+                
+                # Give finer compass points if they were asked for.
+                try:
+                    points = int(options.get('compassPoints', 8))
                 
-                # Convert pressure in kilopascals to inches of mercury.
-                if data[point]['unit'] == "kPa":
-                    data[point]['unit'] = "inHg"
-                    data[point]['value'] = round(data[point]['value'] * 0.295333727, 2)
+                except (ValueError, TypeError):
+                    points = 8
                 
-                # Convert velocity from kph to mph.
-                if data[point]['unit'] == "kph":
-                    data[point]['unit'] = "mph"
-                    data[point]['value'] = round(data[point]['value'] * 0.621371, 2)
+                if points in self.__compasses:
+                    lastRecord['windDirCrd']['value'] = self.__compasses[points].getName(record[5])
         
-        return data
+        # Did we get a request to change units? Any unit system works, and units for a quantity can be overridden like {"pressure": "mmHg"}.
+        if ('units' in options) or ('unitOverrides' in options):
+            try:
+                plan = self.units.getPlan(str(options.get('units', "metric")).lower(), options.get('unitOverrides'))
+                lastRecord = self.units.convertRecord(lastRecord, plan)
+            
+            except (KeyError, ValueError, AttributeError, TypeError) as e:
+                pprint(e)
+        
+        # The compact schema only has values.
+        schema = str(options.get('schema', "full")).lower()
+        
+        if schema not in self.encoder.schemas: schema = "full"
+        
+        return self.encoder.encode(lastRecord, fmt, schema)
     
-    def __getCardinalDir(self, heading):
+    def __runHistory(self, options, fmt):
         """
-        __getCardinalDir(heading)
+        __runHistory(options, fmt)
         
-        Get the cardinal direction of a heading. Returns a string with directional information (N, NE, S, SW, etc.)
+        Answer a query for history with options like {"type": "history", "period": "hourly", "hours": 6, "units": "imperial"}. period is "raw", "hourly", or "daily", and defaults to hourly.
+        Returns the encoded result, which has the columns of data with timestamps in epoch microseconds, and the unit of each column that has one.
         """
         
-        retVal = None
-        
-        if (heading >= 351) or (heading <= 10):
-            retVal = "N"
-        elif (heading >= 11) and (heading <= 80):
-            retVal = "NE"
-        elif (heading >= 81) and (heading <= 100):
-            retVal = "E"
-        elif (heading >= 101) and (heading <= 170):
-            retVal = "SE"
-        elif (heading >= 171) and (heading <= 190):
-            retVal = "S"
-        elif (heading >= 191) and (heading <= 260):
-            retVal = "SW"
-        elif (heading >= 261) and (heading <= 280):
-            retVal = "W"
-        elif (heading >= 281) and (heading <= 350):
-            retVal = "NW"
+        period = str(options.get('period', "hourly")).lower()
         
-        return retVal
+        if period not in self.maxHistoryHours: period = "hourly"
+        
+        # How far back do we go?
+        try:
+            hours = min(max(float(options.get('hours', 6)), 0.0), self.maxHistoryHours[period])
+        
+        except (ValueError, TypeError):
+            hours = 6.0
+        
+        endEpoch = self.dl.dtsToEpoch(datetime.datetime.utcnow())
+        startEpoch = endEpoch - int(hours * 3600 * 1000000)
+        
+        # Get columns of data.
+        if period == "raw":
+            columns = self.dl.getRangeColumns(startEpoch, endEpoch)
+        else:
+            rows = self.dl.getRollupRange(period, startEpoch, endEpoch)
+            columns = dict([(self.dl.rollupColumns[i], [row[i] for row in rows]) for i in range(len(self.dl.rollupColumns))])
+        
+        # Convert units.
+        system = str(options.get('units', "metric")).lower()
+        overrides = options.get('unitOverrides')
+        
+        try:
+            columns = self.historyUnits.convertColumns(columns, self.historyUnits.getPlan(system, overrides))
+            units = self.historyUnits.getFieldUnits(system, overrides)
+        
+        except (KeyError, ValueError, AttributeError, TypeError) as e:
+            pprint(e)
+            units = self.historyUnits.getFieldUnits()
+        
+        retVal = {"type": "history", "period": period, "start": startEpoch, "end": endEpoch, \
+            "units": dict([(name, unit) for name, unit in units.items() if name in columns]), "columns": {}}
+        
+        # Make columns plain lists with null for missing values. Integer columns with missing values come back as floats, so make them integers again.
+        intCols = [name for name, colType in self.dl.columnTypes + [col[0:2] for col in self.dl.rollupColTypes] if colType in ("INTEGER", "TIMESTAMP")]
+        
+        for name in columns:
+            if name != 'units':
+                column = columns[name].tolist() if hasattr(columns[name], "tolist") else list(columns[name])
+                
+                if name in intCols:
+                    retVal['columns'][name] = [None if v != v else int(v) for v in column]
+                else:
+                    retVal['columns'][name] = [None if v != v else v for v in column]
+        
+        return self.encoder.encodeValue(retVal, fmt)
     
     def worker(self, env, startResponse):
         """
         worker(evn, startResponse)
         
-        Do all the things. Accepts two arguments: the environment data, and start_server from WSGI.
+        Do all the things, and time and trace how long they took. Accepts two arguments: the environment data, and start_server from WSGI.
         """
         
-        # Grab our enviornment data
-        checkEnv = env.copy()
+        # Label the request time with the kind of request.
+        path = env.get('PATH_INFO', '').lower()
         
-        # Dummy string to hold the text body.
-        body = ""
+        if path.startswith('/recent'):
+            route = "recent"
+        elif path.startswith('/metrics'):
+            route = "metrics"
+        elif env.get('REQUEST_METHOD') == 'POST':
+            route = "post"
+        else:
+            route = "html"
         
-        # Pull the most recent record from the data layer.
-        lastRecord = self.dl.getLastRecord()
+        try:
+            with registry.timer("ows_http_request_seconds", {"route": route}), tracer.span(route, "http", {"path": env.get('PATH_INFO', '')}):
+                return self.__route(env, startResponse)
+        
+        finally:
+            # Write out the trace if we're tracing.
+            tracer.flush()
+    
+    def __route(self, env, startResponse):
+        """
+        __route(env, startResponse)
+        
+        Answer a request. Accepts two arguments: the environment data, and start_server from WSGI.
+        """
         
-        # Grab the date time stamp for processing as a string.
-        dts = str(lastRecord[0])
+        # Grab our enviornment data
+        checkEnv = env.copy()
         
-        # Zero-fill the string in the event we don't have ms specified.
-        # For consistency.
-        if len(dts) == 19:
-            dts = dts + ".000000"
+        # Metrics come from counters in memory and the scanner's snapshot, not the database.
+        if checkEnv['PATH_INFO'].lower().startswith('/metrics'):
+            snapshots = [registry.getSnapshot("weatherService")]
+            scannerSnapshot = registry.loadSnapshot(self.__metricsFile)
             
-        # Build dict for JSONification.
-        lastRecord = {"dts": dts, \
-            "temp": {"name": "Temperature", "value": lastRecord[1], "unit": "C"}, \
-            "humid": {"name": "Humidity", "value": lastRecord[2], "unit": "%RH"}, \
-            "baro": {"name": "Barometric pressure", "value": lastRecord[3], "unit": "kPa"}, \
-            "rainCt": {"name": "Rain intensity", "value": lastRecord[4], "unit": "counts"}, \
-            "windDir": {"name": "Wind direction", "value": lastRecord[5], "unit": "degrees"}, \
-            "windAvgSpd": {"name": "Average wind speed", "value": lastRecord[6], "unit": "kph"}, \
-            "windMaxSpd": {"name": "Maximum wind speed", "value": lastRecord[7], "unit": "kph"}, \
-            "lightAmb": {"name": "Ambient light", "value": lastRecord[8], "unit": None}, \
-            "sysTemp": {"name": "System temperature", "value": lastRecord[9], "unit": "C"}}
+            if scannerSnapshot is not None:
+                snapshots.append(scannerSnapshot)
+            
+            startResponse("200 OK", [('Content-Type', "text/plain; version=0.0.4; charset=utf-8")])
+            
+            return [bytes(registry.render(snapshots), 'utf-8')]
+        
+        # Raw samples don't need anything from the database.
+        if checkEnv['PATH_INFO'].lower().startswith('/recent'):
+            # Default to the last 10 minutes at one sample per second.
+            try:
+                count = int(parse_qs(checkEnv.get('QUERY_STRING', '')).get('count', ['600'])[0])
+            except ValueError:
+                count = 600
+            
+            # The scanner's wind sampler creates the ring buffer, so there isn't one until it's run, or ever if there are no wind sensors.
+            try:
+                samples = self.__getRecentSamples(count)
+            
+            except FileNotFoundError:
+                startResponse("503 Service Unavailable", [('Content-Type', "application/javascript")])
+                
+                return [bytes(json.dumps({"error": "No raw samples yet. The scanner's wind sampler hasn't written " + self.__ringFile + "."}), 'utf-8')]
+            
+            startResponse("200 OK", [('Content-Type', "application/javascript")])
+            
+            return [bytes(json.dumps(samples), 'utf-8')]
         
         # Set default status to 200 OK.
         status = "200 OK"
         
-        # Dump JSON MIME type:
-        cntntType = "application/javascript"
-        
         # JSON or HTML mode?
         if checkEnv['REQUEST_METHOD'] == 'POST':
             # We'll use this to keep track of our post data.
@@ -195,38 +348,87 @@ class weatherService:
             except ValueError as e:
                 pprint(e)
             
-            # Do we want extra data?
-            if 'extra' in postData:
-                # Are we asking for computed values?
-                if postData['extra'] == "computed":
-                    # Add some computed values
-                    lastRecord.update({"dewpoint": {"name": "Dew point", "value": self.__getDewpoint(lastRecord['temp']['value'], lastRecord['humid']['value']), "unit": "C"}})
-                    lastRecord.update({"windDirCrd": {"name": "Wind cardinal dir.", "value": self.__getCardinalDir(lastRecord['windDir']['value']), "unit": None}})
-            
-            # Did we get a request to change units?
-            if 'units' in postData:
-                # Did they ask for standard?
-                if postData['units'].lower() == "standard":
-                    # If so, convert.
-                    lastRecord = self.__toStandard(lastRecord)
-            
-            # Build JSON string from dict.
-            body = json.dumps(lastRecord)
+            if not isinstance(postData, dict):
+                postData = {}
+            
+            # Pick the response format. Embedded clients can ask for MessagePack or CBOR.
+            fmt = str(postData.get('format', "json")).lower()
+            
+            if fmt not in self.encoder.mimeTypes: fmt = "json"
+            
+            # Dump JSON MIME type:
+            cntntType = self.encoder.mimeTypes[fmt]
+            
+            # A batch has a list of queries, and anything else is one query for the latest record.
+            queries = postData.get('queries')
+            
+            if not isinstance(queries, list):
+                queries = None
+            else:
+                queries = queries[:self.maxQueries]
+            
+            # Read everything from one snapshot so every query in a batch sees the same data.
+            self.dl.beginRead()
+            
+            try:
+                lastRecord, sysAlert = self.__getLatestRecord()
+                
+                # A new station has nothing to show until the scanner stores its first record.
+                if lastRecord is None:
+                    status = "503 Service Unavailable"
+                    body = [self.encoder.encodeValue({"error": "No weather records yet."}, fmt)]
+                
+                elif queries is None:
+                    body = [self.__runLatest(lastRecord, sysAlert, postData, fmt)]
+                else:
+                    results = []
+                    
+                    for query in queries:
+                        if not isinstance(query, dict):
+                            query = {}
+                        
+                        if query.get('type', "latest") == "history":
+                            results.append(self.__runHistory(query, fmt))
+                        else:
+                            results.append(self.__runLatest(lastRecord, sysAlert, query, fmt))
+                    
+                    body = [self.encoder.encodeBatch(results, fmt)]
+            
+            finally:
+                self.dl.endRead()
         else:
             # Default HTML MIME type.
             cntntType = "text/html"
             
+            lastRecord, sysAlert = self.__getLatestRecord()
+            
+            # A new station has nothing to show until the scanner stores its first record.
+            if lastRecord is None:
+                startResponse("503 Service Unavailable", [('Content-Type', "text/plain; charset=utf-8")])
+                
+                return [b"No weather records yet."]
+            
+            lastRecord, computed = self.__buildRecord(lastRecord, sysAlert)
+            
             # Add some computed fields to be displayed
-            lastRecord.update({"dewpoint": {"name": "Dew point", "value": self.__getDewpoint(lastRecord['temp']['value'], lastRecord['humid']['value']), "unit": "C"}})
-            lastRecord.update({"windDirCrd": {"name": "Wind cardinal dir.", "value": self.__getCardinalDir(lastRecord['windDir']['value']), "unit": None}})
+            lastRecord.update(computed)
+            
+            # See if we asked for different units with a path like /standard or /aviation.
+            system = checkEnv['PATH_INFO'].lower().strip('/')
+            
+            if (system in self.units.systems) or (system in self.units.aliases):
+                lastRecord = self.units.convertRecord(lastRecord, self.units.getPlan(system))
+            
+            # Pick the page theme and layout with a query string like ?theme=light&layout=mobile.
+            query = parse_qs(checkEnv.get('QUERY_STRING', ''))
+            theme = query.get('theme', ["dark"])[0].lower()
+            layout = query.get('layout', ["full"])[0].lower()
             
-            # See if we asked for different units.
-            if '/standard' in checkEnv['PATH_INFO'].lower():
-                lastRecord = self.__toStandard(lastRecord)
-                print(str(checkEnv['PATH_INFO']))
+            if theme not in self.html.themes: theme = "dark"
+            if layout not in self.html.layouts: layout = "full"
             
             # Gather HTML
-            body = self.__htmlify(lastRecord)
+            body = self.html.render(lastRecord, theme, layout)
         
         # Set content type header
         headers = [('Content-Type', cntntType)]
@@ -235,17 +437,42 @@ class weatherService:
         startResponse(status, headers)
         
         # Send the output back to our web server.
-        return [bytes(body, 'utf-8')]
+        return body
+
 
+#############
+# Functions #
+#############
+
+def main(configFile = None):
+    """
+    main([configFile = None])
+    
+    Serve weather data until we're killed, with settings from an owsConfig config file.
+    """
+    
+    # The HTTP server is only needed when we're serving, so importing weatherService for testing doesn't pay for it.
+    from wsgiref.simple_server import make_server
+    
+    config = owsConfig(configFile)
+    
+    # Utilize our worker class
+    hardWorker = weatherService(config.get('ringFile'), config.get('metricsFile'), config.get('dbFile'))
+    
+    # Set up HTTP server
+    httpSrv = make_server('', config.get('httpPort'), hardWorker.worker)
+    
+    registry.describe("ows_startup_seconds", "gauge", "Seconds from the process starting to being ready for requests.")
+    registry.set("ows_startup_seconds", registry.getUptime())
+    
+    print("weatherService HTTP server listening on port " + str(config.get('httpPort')) + ", started in " + str(round(registry.getUptime(), 2)) + " seconds.")
+    httpSrv.serve_forever()
 
 #######################
 # Main execution body #
 #######################
 
-# Utilize our worker class
-hardWorker = weatherService()
-
-# Set up HTTP server
-httpSrv = make_server('', 80, hardWorker.worker)
-print("weatherService HTTP server listening on port 80.")
-httpSrv.serve_forever()
\ No newline at end of file
+# Only run when started as a program, so the classes can be imported for testing and benchmarks.
+# Usage: weatherService.py [configFile]
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else None)